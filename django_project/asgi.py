@@ -2,6 +2,7 @@
 ASGI config for django_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The read-only views are served by their async versions unless ASYNC_VIEWS is set to 0.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -12,5 +13,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_project.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 from os import getenv
 from dotenv import load_dotenv
@@ -48,20 +49,24 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'main.replicas.ReplicaRoutingMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'django_project.urls'
+# ASGI serves the read-only views as coroutines (see django_project.urls_async); set ASYNC_VIEWS=0 to opt out.
+ROOT_URLCONF = 'django_project.urls_async' if getenv('ASYNC_VIEWS') == '1' else 'django_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'main.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -103,6 +108,84 @@ DATABASES = {
     }
 }
 
+# Read replicas: DB_REPLICAS=2 adds replica1 and replica2, read-only copies of the SQLite file
+# kept fresh by `manage.py sync_replicas --interval 5`. GET requests read from them (see main.replicas),
+# and a client that wrote reads from the primary for REPLICA_STICKY_SECONDS, longer than the sync interval.
+
+REPLICA_DATABASES = []
+for replica_number in range(1, int(getenv('DB_REPLICAS', '0')) + 1):
+    replica_alias = f'replica{replica_number}'
+    DATABASES[replica_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{BASE_DIR / f"db.{replica_alias}.sqlite3"}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(replica_alias)
+
+DATABASE_ROUTERS = ['main.replicas.PrimaryReplicaRouter']
+REPLICA_STICKY_SECONDS = int(getenv('REPLICA_STICKY_SECONDS', '10'))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The local-memory cache is per process; set CACHE_DIR to share the cache between processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+}
+
+if getenv('CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': getenv('CACHE_DIR'),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    }
+
+
+# Request metrics (see main.metrics), served to staff at /metrics. They are per process;
+# set METRICS_DIR to a directory shared by the workers to serve the totals of all of them.
+
+METRICS_DIR = getenv('METRICS_DIR')
+
+
+# Slow query log (see main.slow_queries), disabled unless SLOW_QUERY_LOG names a file: the queries slower
+# than SLOW_QUERY_MS are written to it as NDJSON, rotated at 10 MB; summarize them with
+# `manage.py summarize_slow_queries`.
+
+SLOW_QUERY_MS = float(getenv('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = getenv('SLOW_QUERY_LOG')
+SLOW_QUERY_HANDLER = {
+    'class': 'logging.handlers.RotatingFileHandler',
+    'filename': SLOW_QUERY_LOG,
+    'maxBytes': 10 * 1024 * 1024,
+    'backupCount': 5,
+    'encoding': 'utf-8',
+    'delay': True,
+    'formatter': 'message',
+} if SLOW_QUERY_LOG else {'class': 'logging.NullHandler'}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'slow_queries': SLOW_QUERY_HANDLER,
+    },
+    'loggers': {
+        'main.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -145,14 +228,34 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# JSON with orjson when it is installed, with the encoder of DRF otherwise.
+if find_spec('orjson'):
+    JSON_RENDERER = 'main.renderers.OrjsonRenderer'
+    JSON_PARSER = 'main.renderers.OrjsonParser'
+else:
+    JSON_RENDERER = 'rest_framework.renderers.JSONRenderer'
+    JSON_PARSER = 'rest_framework.parsers.JSONParser'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'main.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        JSON_RENDERER,
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'main.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
+
+# MessagePack for the internal services, when msgpack is installed.
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('main.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('main.renderers.MessagePackParser')
@@ -0,0 +1,23 @@
+"""
+This module defines the URL routes of the application served over ASGI.
+
+The routes are those of django_project.urls, with the read-only pages and the list and detail routes
+of the cached API viewsets answered by the async views of main.async_views and main.async_api.
+The async routes come first, so they shadow the sync routes with the same paths and names.
+"""
+
+from django.urls import include, path
+
+from django_project import urls
+from main import async_api, async_views
+
+urlpatterns = [
+    path('api/v1/', include(async_api.read_routes(urls.router.urls))),
+    path('tasks/', async_views.tasks_page, name='tasks_page'),
+    path('task/<str:task_id>/', async_views.task_page, name='task'),
+    path('students/', async_views.students_page, name='students_page'),
+    path('student/<str:student_id>/', async_views.student_page, name='student'),
+    path('comments/', async_views.comments_page, name='comments_page'),
+    path('comment/<str:comment_id>/', async_views.comment_page, name='comment'),
+    *urls.urlpatterns,
+]
@@ -25,8 +25,8 @@ class TaskAdmin(admin.ModelAdmin):
 class StudentAdmin(admin.ModelAdmin):
     """Student admin configuration."""
 
-    list_display = ('nickname', 'registration_date', 'rating')
-    readonly_fields = (ID_FIELD,)
+    list_display = ('nickname', 'registration_date', 'solved_count', 'rating')
+    readonly_fields = (ID_FIELD, 'solved_count', 'difficulty_sum', 'rating')
 
 
 @admin.register(TaskStudent)
@@ -18,3 +18,7 @@ class MainConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        """Connect the signal handlers of the app."""
+        from . import signals  # noqa: F401, WPS433
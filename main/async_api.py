@@ -0,0 +1,252 @@
+"""
+This module contains the async versions of the read-only API actions.
+
+When the project is served over ASGI (see django_project.urls_async), the list and retrieve actions
+of the cached API viewsets are coroutines built on the async ORM and render exactly what the viewsets render.
+They go through the same helpers as the sync mixins: the token cache, the sparse fieldsets, the row plans,
+the keyset pagination and the validators and entries of the response cache, under the same keys.
+Everything the serializers touch is fetched up front, so rendering never queries.
+Writes, the other API actions, the browsable API and MessagePack are passed to the sync viewsets.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.urls import URLPattern
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from .authentication import CachedTokenAuthentication
+from .caching import HIT, MISS, CachedRead, CachedResponseMixin, viewset_labels
+from .pagination import KeysetPagination
+from .renderers import MSGPACK, json_response
+from .rows import plan_rows, sparse_plan
+from .sparse import read_labels, sparse_options, sparse_queryset
+
+JSON = 'json'
+DETAIL = 'detail'
+READ_ACTIONS = ('list', 'retrieve')
+FORMAT_KWARG = 'format'
+
+
+async def authenticate(authentication, request):
+    """
+    Authenticate a request with the token cache of the sync viewsets.
+
+    Args:
+        authentication (CachedTokenAuthentication): The authentication.
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The 401 response with the authentication scheme, or None if the request is authenticated.
+    """
+    try:
+        credentials = await authentication.aauthenticate(request)
+    except exceptions.AuthenticationFailed as failed:
+        detail = failed.detail
+    else:
+        if credentials is not None:
+            return None
+        detail = exceptions.NotAuthenticated.default_detail
+    response = json_response({DETAIL: detail}, status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    return response
+
+
+class AsyncReader:
+    """
+    The list and retrieve actions of a cached API viewset as coroutines.
+
+    The permissions of the viewsets let any authenticated user read, so reading only needs authentication.
+    """
+
+    authentication = CachedTokenAuthentication()
+
+    def __init__(self, viewset):
+        """
+        Read the queryset, the serializer and the cache settings of a viewset.
+
+        Args:
+            viewset (type): A viewset with CachedResponseMixin.
+        """
+        self.queryset = viewset.queryset
+        self.serializer_class = viewset.serializer_class
+        self.row_list = getattr(viewset, 'row_list', False)
+        self.cache_timeout = viewset.cache_timeout
+        self.labels = viewset_labels(viewset)
+
+    async def list(self, request):
+        """
+        Return a page of the list.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The page.
+        """
+        return await self.respond(request, self.list_data)
+
+    async def retrieve(self, request, pk):
+        """
+        Return an object.
+
+        Args:
+            request (HttpRequest): The request object.
+            pk (str): The primary key of the object.
+
+        Returns:
+            HttpResponse: The object.
+        """
+        return await self.respond(request, self.retrieve_data, pk)
+
+    async def list_data(self, request, sparse):
+        """
+        Serialize a page of the list, from values_list() rows when the serializer allows it (see main.rows).
+
+        Args:
+            request (HttpRequest): The request object.
+            sparse (dict): The requested fields and expanded relations.
+
+        Returns:
+            dict: The rows with the links of the neighbour pages.
+        """
+        pagination = KeysetPagination()
+        plan = sparse_plan(self.serializer_class, sparse) if self.row_list else None
+        if plan is None:
+            queryset = sparse_queryset(self.queryset, self.serializer_class(**sparse))
+            instances = await pagination.apaginate_queryset(queryset, Request(request))
+            return pagination.get_paginated_response(self.serializer_class(instances, many=True, **sparse).data).data
+        rows = await pagination.apaginate_queryset(plan_rows(self.queryset, plan), Request(request))
+        related = await plan.arelated_ids([row.pk for row in rows]) if plan.many else ()
+        return pagination.get_paginated_response(plan.render(rows, related)).data
+
+    async def retrieve_data(self, request, sparse, pk):
+        """
+        Serialize an object.
+
+        Args:
+            request (HttpRequest): The request object.
+            sparse (dict): The requested fields and expanded relations.
+            pk (str): The primary key of the object.
+
+        Returns:
+            dict: The object.
+
+        Raises:
+            NotFound: If there is no such object.
+        """
+        model = self.queryset.model
+        try:
+            instance = await sparse_queryset(self.queryset, self.serializer_class(**sparse)).aget(pk=pk)
+        except (model.DoesNotExist, ValidationError, ValueError, TypeError):
+            raise exceptions.NotFound(f'No {model._meta.object_name} matches the given query.')  # noqa: WPS437
+        return self.serializer_class(instance, **sparse).data
+
+    async def respond(self, request, load, *args):
+        """
+        Authenticate and read the requested fields, then answer from the response cache.
+
+        Args:
+            request (HttpRequest): The request object.
+            load (callable): The coroutine function loading the data.
+            args (tuple): The arguments of load after the request and the requested fields and relations.
+
+        Returns:
+            HttpResponse: The response with the validators and the X-Cache header, or the error.
+        """
+        response = await authenticate(self.authentication, request)
+        if response is not None:
+            return response
+        try:
+            sparse = sparse_options(request.GET, self.serializer_class)
+        except exceptions.ValidationError as invalid:
+            return json_response(invalid.detail, invalid.status_code)
+        return await self.cached_response(request, sparse, load, args)
+
+    async def cached_response(self, request, sparse, load, args):
+        """
+        Answer a conditional request, return the cached data, or load the data and cache it.
+
+        Args:
+            request (HttpRequest): The request object.
+            sparse (dict): The requested fields and expanded relations.
+            load (callable): The coroutine function loading the data.
+            args (tuple): The arguments of load after the request and the requested fields and relations.
+
+        Returns:
+            HttpResponse: The response with the validators and the X-Cache header, or the error.
+        """
+        labels = read_labels(self.labels, self.queryset.model, self.serializer_class(**sparse))
+        read = CachedRead(request, labels, JSON)
+        response = read.not_modified()
+        if response is not None:
+            return response
+        cached = read.get()
+        if cached is not None:
+            return read.finish(json_response(cached), HIT)
+        try:
+            loaded = await load(request, sparse, *args)
+        except exceptions.APIException as error:
+            return read.finish(json_response({DETAIL: error.detail}, error.status_code), MISS)
+        read.set(loaded, self.cache_timeout)
+        return read.finish(json_response(loaded), MISS)
+
+
+def serves_json(request, kwargs):
+    """
+    Check whether an API request can be answered by the async reader.
+
+    Args:
+        request (HttpRequest): The request object.
+        kwargs (dict): The keyword arguments of the route.
+
+    Returns:
+        bool: True for a GET asking for JSON.
+    """
+    accept = request.headers.get('Accept', '')
+    html_or_msgpack = 'text/html' in accept or MSGPACK in accept
+    return request.method == 'GET' and FORMAT_KWARG not in kwargs and not html_or_msgpack
+
+
+def read_view(read, sync_view):
+    """
+    Build a view answering JSON reads with a coroutine and everything else with the sync viewset.
+
+    Args:
+        read (callable): The async action of an AsyncReader.
+        sync_view (callable): The view of the viewset routed at the same URL.
+
+    Returns:
+        callable: The async view.
+    """
+    run_sync = sync_to_async(sync_view)
+
+    async def wrapper(request, *args, **kwargs):
+        if serves_json(request, kwargs):
+            return await read(request, *args, **kwargs)
+        return await run_sync(request, *args, **kwargs)
+    return csrf_exempt(wrapper)
+
+
+def read_routes(patterns):
+    """
+    Build async routes for the list and detail routes of the cached viewsets of a router.
+
+    Args:
+        patterns (list): The URL patterns of the router.
+
+    Returns:
+        list: The async routes, to be placed before the router.
+    """
+    readers = {}
+    routes = []
+    for pattern in patterns:
+        viewset = getattr(pattern.callback, 'cls', None)
+        action = getattr(pattern.callback, 'actions', {}).get('get')
+        if viewset is None or not issubclass(viewset, CachedResponseMixin) or action not in READ_ACTIONS:
+            continue
+        reader = readers.setdefault(viewset, AsyncReader(viewset))
+        view = read_view(getattr(reader, action), pattern.callback)
+        routes.append(URLPattern(pattern.pattern, view, pattern.default_args, pattern.name))
+    return routes
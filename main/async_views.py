@@ -0,0 +1,160 @@
+"""
+This module contains the async versions of the read-only pages.
+
+When the project is served over ASGI (see django_project.urls_async), the HTML lists and entity pages
+are coroutines built on the async ORM and render exactly what their sync counterparts render:
+they share the templates, the fragment cache and the conditional GET validators.
+Everything the templates touch is fetched up front, so rendering never queries.
+The list and retrieve actions of the cached API viewsets are in main.async_api.
+"""
+
+from functools import wraps
+
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.shortcuts import render
+
+from . import views
+from .conditional import page_condition
+from .fragments import STUDENT_ITEM, TASK_ITEM, acache_items
+from .models import Comment, Student, Task, TaskStudent
+from .pagination import INVALID_CURSOR, Keyset
+
+
+def with_user(view):
+    """
+    Resolve the user of the session before an async view runs.
+
+    The context processors and the page validators read request.user synchronously,
+    so it is loaded with the async ORM first.
+
+    Args:
+        view (callable): The async view.
+
+    Returns:
+        callable: The wrapped view.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def paginate_list(request, queryset):
+    """
+    Fetch the page of a list selected by the cursor query parameter.
+
+    Args:
+        request (HttpRequest): The request object.
+        queryset (QuerySet): The list to paginate.
+
+    Returns:
+        Page: The page.
+
+    Raises:
+        Http404: If the cursor is malformed.
+    """
+    try:
+        return await Keyset(queryset.model).apaginate(queryset, request.GET.get(views.CURSOR), views.HTML_PAGE_SIZE)
+    except ValueError:
+        raise Http404(INVALID_CURSOR)
+
+
+@with_user
+async def tasks_page(request):
+    """
+    Render the tasks page.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The tasks page.
+    """
+    page = await paginate_list(request, views.list_tasks())
+    tasks = await acache_items(page.rows, TASK_ITEM, *views.task_item_lookups())
+    return render(request, 'tasks.html', context={'tasks': tasks, views.PAGE: page, views.TITLE: 'Задачи'})
+
+
+@with_user
+@page_condition(Task, User, TaskStudent, Student, Comment)
+async def task_page(request, task_id):
+    """
+    Render the task page.
+
+    Args:
+        request (HttpRequest): The request object.
+        task_id (str): The id of the task.
+
+    Returns:
+        HttpResponse: The task page.
+    """
+    task = await Task.objects.select_related('user').prefetch_related('students', 'related_comments').aget(id=task_id)
+    return render(request, 'entities/task.html', context={views.TASK: task, views.TITLE: 'Задача'})
+
+
+@with_user
+async def students_page(request):
+    """
+    Render the students page.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The students page.
+    """
+    page = await paginate_list(request, views.list_students())
+    students = await acache_items(page.rows, STUDENT_ITEM, *views.student_item_lookups())
+    return render(request, 'students.html', context={'students': students, views.PAGE: page, views.TITLE: 'Студенты'})
+
+
+@with_user
+@page_condition(Student, User, TaskStudent, Task)
+async def student_page(request, student_id):
+    """
+    Render the student page.
+
+    Args:
+        request (HttpRequest): The request object.
+        student_id (str): The id of the student.
+
+    Returns:
+        HttpResponse: The student page.
+    """
+    student = await Student.objects.select_related('user').prefetch_related('tasks').aget(id=student_id)
+    return render(request, 'entities/student.html', context={views.STUDENT: student, views.TITLE: 'Студент'})
+
+
+@with_user
+async def comments_page(request):
+    """
+    Render the comments page.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The comments page.
+    """
+    page = await paginate_list(request, views.list_comments())
+    context = {'comments': page.rows, views.PAGE: page, views.TITLE: 'Комментарии'}
+    return render(request, 'comments.html', context=context)
+
+
+@with_user
+@page_condition(Comment, User, Task, Student)
+async def comment_page(request, comment_id):
+    """
+    Render the comment page.
+
+    Args:
+        request (HttpRequest): The request object.
+        comment_id (str): The id of the comment.
+
+    Returns:
+        HttpResponse: The comment page.
+    """
+    comment = await Comment.objects.select_related('task_id', 'student__user').aget(id=comment_id)
+    return render(request, 'entities/comment.html', context={views.COMMENT: comment, views.TITLE: 'Комментарий'})
@@ -0,0 +1,225 @@
+"""
+This module contains the cached token authentication of the API.
+
+CachedTokenAuthentication keeps the users of recently seen tokens in a bounded in-process LRU cache,
+so a polling client costs no query per request. Entries expire after TOKEN_CACHE_TTL seconds.
+The signal handlers drop the entries of a deleted (or rotated) token and of a changed or deactivated user,
+and bump the shared auth version, which invalidates the entries of the other processes
+when the Django cache is shared between them.
+The async views authenticate with aauthenticate(), which reads the token through the sync path on a miss.
+"""
+
+import threading
+from collections import OrderedDict
+from copy import copy
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from rest_framework.authentication import TokenAuthentication
+
+from . import versions
+
+AUTH_LABEL = 'authtoken'
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TTL = 60
+
+
+class TokenCache:
+    """A thread-safe LRU cache of token keys to users with a time to live."""
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        """
+        Create an empty cache.
+
+        Args:
+            max_size (int): The maximum number of tokens.
+            ttl (float): The lifetime of an entry in seconds.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """
+        Return the cached credentials of a token.
+
+        Args:
+            key (str): The token key.
+            version (int): The current auth version; entries of other versions are stale.
+
+        Returns:
+            tuple: The user and the token, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < monotonic():
+                self.misses += 1
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, credentials, version):
+        """
+        Cache the credentials of a token, evicting the least recently used token if the cache is full.
+
+        Args:
+            key (str): The token key.
+            credentials (tuple): The user and the token.
+            version (int): The auth version the credentials were read at.
+        """
+        with self._lock:
+            self._entries[key] = (version, monotonic() + self.ttl, credentials)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """
+        Drop a token.
+
+        Args:
+            key (str): The token key.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_user(self, user_id):
+        """
+        Drop every token of a user.
+
+        Args:
+            user_id (int): The id of the user.
+        """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[2][0].pk == user_id:
+                    del self._entries[key]  # noqa: WPS420
+
+    def clear(self):
+        """Drop every token and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Read the counters of the cache.
+
+        Returns:
+            dict: The hits, the misses, the hit ratio and the number of cached tokens.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'ratio': self.hits / total if total else 0,
+                'size': len(self._entries),
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that reads the user of a token from the token cache."""
+
+    def authenticate_credentials(self, key):
+        """
+        Return the user of a token, from the cache or from the database.
+
+        Every request gets its own copy of the cached user, so views may change it freely.
+
+        Args:
+            key (str): The token key.
+
+        Returns:
+            tuple: The user and the token.
+        """
+        version = versions.get_version(AUTH_LABEL)
+        credentials = token_cache.get(key, version)
+        if credentials is None:
+            credentials = self.fetch_credentials(key, version)
+        user, token = credentials
+        return copy(user), token
+
+    async def aauthenticate(self, request):
+        """
+        Authenticate a request of an async view.
+
+        A hit is answered without leaving the event loop; a miss reads the token like a sync request.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            tuple: The user and the token, or None if the request has no token header.
+        """
+        key = TokenHeader().authenticate(request)
+        if key is None:
+            return None
+        version = versions.get_version(AUTH_LABEL)
+        credentials = token_cache.get(key, version)
+        if credentials is None:
+            credentials = await sync_to_async(self.fetch_credentials)(key, version)
+        user, token = credentials
+        return copy(user), token
+
+    def fetch_credentials(self, key, version):
+        """
+        Read the user of a token from the database and cache it.
+
+        Args:
+            key (str): The token key.
+            version (int): The auth version the credentials are read at.
+
+        Returns:
+            tuple: The user and the token.
+        """
+        credentials = TokenAuthentication.authenticate_credentials(self, key)
+        token_cache.set(key, credentials, version)
+        return credentials
+
+
+class TokenHeader(TokenAuthentication):
+    """Parse and check the token header of a request without reading the token."""
+
+    def authenticate_credentials(self, key):
+        """
+        Return the key of the token.
+
+        Args:
+            key (str): The token key.
+
+        Returns:
+            str: The same key.
+        """
+        return key
+
+
+def invalidate_user(user_id):
+    """
+    Drop the cached tokens of a user in every process.
+
+    Args:
+        user_id (int): The id of the user.
+    """
+    token_cache.discard_user(user_id)
+    versions.bump_on_commit(AUTH_LABEL)
+
+
+def invalidate_token(key):
+    """
+    Drop a cached token in every process.
+
+    Args:
+        key (str): The token key.
+    """
+    token_cache.discard(key)
+    versions.bump_on_commit(AUTH_LABEL)
@@ -0,0 +1,223 @@
+"""
+This module contains the helpers shared by the benchmark management commands.
+
+The helpers time callables, summarize the samples as latency percentiles in milliseconds,
+create the throwaway test databases of the benchmarks and fill them with synthetic rows, walk the routes of the project
+and compare results with a baseline.
+"""
+
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+from typing import NamedTuple
+
+from django.contrib.auth.models import User
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import URLResolver, reverse
+
+from django_project.urls import urlpatterns
+
+from .models import Comment, Student, Task, TaskStudent
+
+MILLISECONDS = 1000
+PERCENTILES = (50, 95, 99)
+SOLUTIONS_PER_STUDENT = 5
+COMMENTS_PER_TASK = 3
+LATENCY_METRIC = 'p95'
+QUERIES = 'queries'
+
+
+class Regression(NamedTuple):
+    """A metric of a route that got worse than in the baseline."""
+
+    route: str
+    metric: str
+    baseline: float
+    current: float
+
+
+def percentile(samples, rank):
+    """
+    Return a percentile of sorted samples using the nearest-rank method.
+
+    Args:
+        samples (list): The sorted samples.
+        rank (int): The percentile, from 0 to 100.
+
+    Returns:
+        float: The sample at the percentile.
+    """
+    nearest = round(rank / 100 * len(samples)) - 1
+    return samples[max(0, min(len(samples) - 1, nearest))]
+
+
+def summarize(samples):
+    """
+    Summarize latency samples.
+
+    Args:
+        samples (list): The durations in seconds.
+
+    Returns:
+        dict: The mean and the percentiles in milliseconds.
+    """
+    ordered = sorted(samples)
+    summary = {'mean': sum(ordered) / len(ordered) * MILLISECONDS}
+    for rank in PERCENTILES:
+        summary[f'p{rank}'] = percentile(ordered, rank) * MILLISECONDS
+    return summary
+
+
+def measure(func, arguments):
+    """
+    Call a function once per argument and time every call.
+
+    Args:
+        func (callable): The function to time.
+        arguments (Iterable): The argument of every call.
+
+    Returns:
+        dict: The latency summary of the calls.
+    """
+    samples = []
+    for argument in arguments:
+        started = perf_counter()
+        func(argument)
+        samples.append(perf_counter() - started)
+    return summarize(samples)
+
+
+def best_time(operation, argument, number, repeat):
+    """
+    Time an operation.
+
+    Args:
+        operation (callable): The operation.
+        argument (object): The argument of the operation.
+        number (int): The calls per round.
+        repeat (int): The rounds.
+
+    Returns:
+        float: The seconds per call of the fastest round.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(number):  # noqa: WPS122
+            operation(argument)
+        timings.append((perf_counter() - started) / number)
+    return min(timings)
+
+
+@contextmanager
+def scratch_databases():
+    """
+    Create the test databases for the duration of a benchmark and destroy them afterwards.
+
+    Yields:
+        None: Control to the benchmark.
+    """
+    with ExitStack() as stack:
+        stack.callback(teardown_databases, setup_databases(verbosity=0, interactive=False), verbosity=0)
+        yield
+
+
+def populate(rng, tasks, students):
+    """
+    Fill the test database with synthetic tasks, students, solutions and comments.
+
+    Args:
+        rng (Random): The random generator.
+        tasks (int): The number of tasks.
+        students (int): The number of students.
+
+    Returns:
+        User: The user owning every row.
+    """
+    user = User.objects.create(username='bench')
+    task_rows = Task.objects.bulk_create(
+        Task(name=f'Task {index:06}', description='Description', difficulty=rng.randrange(6), user=user)
+        for index in range(tasks)
+    )
+    student_rows = Student.objects.bulk_create(
+        Student(nickname=f'Student {index:06}', user=user) for index in range(students)
+    )
+    TaskStudent.objects.bulk_create(
+        TaskStudent(task=task, student=student, solution='Solution')
+        for student in student_rows
+        for task in rng.sample(task_rows, min(SOLUTIONS_PER_STUDENT, tasks))
+    )
+    Comment.objects.bulk_create(
+        Comment(task_id=task, student=rng.choice(student_rows), text_comment='Comment')
+        for task in task_rows
+        for _ in range(COMMENTS_PER_TASK)
+    )
+    return user
+
+
+def iter_routes(patterns=urlpatterns):
+    """
+    Yield every named URL pattern of the project, skipping the admin site.
+
+    Args:
+        patterns (list): The URL patterns to walk.
+
+    Yields:
+        URLPattern: The named URL pattern.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace != 'admin':
+                yield from iter_routes(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern
+
+
+def route_url(pattern, url_kwargs, detail_pks):
+    """
+    Build the URL of a pattern with the ids of existing objects.
+
+    Args:
+        pattern (URLPattern): The URL pattern.
+        url_kwargs (dict): The values of the named arguments of the HTML routes, such as task_id.
+        detail_pks (dict): The primary keys of the API detail routes by basename, such as task.
+
+    Returns:
+        str: The URL, or None for the format suffix variants of the API routes.
+    """
+    arguments = pattern.pattern.regex.groupindex
+    if 'format' in arguments:
+        return None
+    kwargs = {name: url_kwargs.get(name) for name in arguments}
+    if 'pk' in arguments:
+        kwargs['pk'] = detail_pks[pattern.name.split('-')[0]]
+    return reverse(pattern.name, kwargs=kwargs)
+
+
+def regressions(routes, baseline, threshold, min_delta):
+    """
+    Compare the results of the routes with a baseline.
+
+    A route regresses when its LATENCY_METRIC grows by more than the threshold and by more than min_delta,
+    so the jitter of fast routes is not reported, or when it runs more queries.
+    Routes missing from the baseline are skipped.
+
+    Args:
+        routes (dict): The results by route name.
+        baseline (dict): The baseline results by route name.
+        threshold (float): The allowed relative growth of the latency, 0.2 for 20%.
+        min_delta (float): The allowed absolute growth of the latency in milliseconds.
+
+    Returns:
+        list: The regressions.
+    """
+    found = []
+    for route, current in routes.items():
+        before = baseline.get(route)
+        if before is None:
+            continue
+        latency, previous = current[LATENCY_METRIC], before[LATENCY_METRIC]
+        if latency > previous * (1 + threshold) and latency - previous > min_delta:
+            found.append(Regression(route, LATENCY_METRIC, previous, latency))
+        if current[QUERIES] > before[QUERIES]:
+            found.append(Regression(route, QUERIES, before[QUERIES], current[QUERIES]))
+    return found
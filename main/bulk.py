@@ -0,0 +1,394 @@
+"""
+This module contains the bulk create, update and delete support of the API viewsets.
+
+A viewset with BulkModelMixin accepts a JSON list on POST to its list route,
+and the BulkRouter maps PATCH (bulk update) and DELETE (bulk delete) of the list route to it.
+Payloads are processed in batches: every batch is validated with a fixed number of queries
+and written with bulk_create/bulk_update, and the whole payload is written in one transaction.
+The per-row signal handlers are suspended during the write; the counters of the touched students
+are rebuilt and the data versions bumped once at the end.
+Invalid items are skipped and reported by their index in the payload.
+"""
+
+from contextlib import contextmanager
+from operator import itemgetter
+from uuid import UUID
+
+from django.db import models, transaction
+from rest_framework import routers, status
+from rest_framework.response import Response
+
+from . import leaderboard, versions
+from .fragments import bump_generation
+from .models import Comment, Student, Task, TaskStudent
+from .ratings import rebuild_ratings
+from .signals import suspend_handlers
+
+BULK_BATCH_SIZE = 500
+ERRORS = 'errors'
+OWNER = 'bulk_owner_id'
+EXPECTED_LIST = 'Expected a list of items'
+NOT_FOUND = 'Not found.'
+FORBIDDEN = 'You do not have permission to perform this action.'
+NOT_UPDATABLE = 'This field cannot be updated in bulk.'
+
+
+class BulkRouter(routers.DefaultRouter):
+    """Default router that also maps PATCH and DELETE of the list route to the bulk actions."""
+
+    routes = [
+        route._replace(mapping={**route.mapping, 'patch': 'bulk_update', 'delete': 'bulk_destroy'})  # noqa: WPS437
+        if route.name == '{basename}-list' else route
+        for route in routers.DefaultRouter.routes
+    ]
+
+
+def batches(payload, size=BULK_BATCH_SIZE):
+    """
+    Split a payload into batches.
+
+    Args:
+        payload (list): The payload.
+        size (int): The batch size.
+
+    Returns:
+        Iterator: The index of the first item of every batch and the batch.
+    """
+    starts = range(0, len(payload), size)
+    return ((start, payload[start:start + size]) for start in starts)
+
+
+def parse_id(entry):
+    """
+    Read the object id out of a bulk item.
+
+    Args:
+        entry (dict or str): The item, either an object with an id or the id itself.
+
+    Returns:
+        UUID: The id, or None if the item has no valid id.
+    """
+    object_id = entry.get('id') if isinstance(entry, dict) else entry
+    try:
+        return UUID(str(object_id))
+    except ValueError:
+        return None
+
+
+@contextmanager
+def bulk_write():
+    """
+    Write in one transaction with the per-row signal handlers suspended.
+
+    Yields:
+        None: Once the transaction is open.
+    """
+    with transaction.atomic():
+        with suspend_handlers():
+            yield
+
+
+class BulkResult:
+    """The ids written by a bulk action and the errors of the skipped items."""
+
+    def __init__(self, action):
+        """
+        Start an empty result.
+
+        Args:
+            action (str): The name of the action, used as the key of the written ids.
+        """
+        self.action = action
+        self.ids = []
+        self.errors = []
+
+    def fail(self, index, errors):
+        """
+        Record the errors of a skipped item.
+
+        Args:
+            index (int): The index of the item in the payload.
+            errors (dict or list): The errors of the item.
+        """
+        self.errors.append({'index': index, ERRORS: errors})
+
+    def response(self, success_status=status.HTTP_200_OK):
+        """
+        Build the response of the action.
+
+        Args:
+            success_status (int): The status when every item was written.
+
+        Returns:
+            Response: The written ids and the errors, with 207 if only some items were written.
+        """
+        if self.errors and self.ids:
+            response_status = status.HTTP_207_MULTI_STATUS
+        elif self.errors:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = success_status
+        self.errors.sort(key=itemgetter('index'))
+        return Response({self.action: self.ids, ERRORS: self.errors}, status=response_status)
+
+
+class BulkHooks:
+    """The steps of the bulk actions a viewset overrides for its model."""
+
+    def validate_batch(self, valid, outcome):
+        """
+        Validate the items of a batch against each other and the database.
+
+        Args:
+            valid (dict): The validated data by the index of the item.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            dict: The data of the items that passed, ready to build the objects from.
+        """
+        return valid
+
+    def build_instance(self, validated):
+        """
+        Build an unsaved object from validated data.
+
+        Args:
+            validated (dict): The validated data.
+
+        Returns:
+            Model: The object.
+        """
+        return self.get_queryset().model(**validated)
+
+    def touched_students(self, instances):
+        """
+        Return the ids of the students whose counters a bulk write of the objects may change.
+
+        Args:
+            instances (list): The written objects.
+
+        Returns:
+            Iterable: The student ids.
+        """
+        return ()
+
+    def written(self, instances):
+        """
+        Update what derives from the objects written by a batch, in place of the suspended per-row handlers.
+
+        Args:
+            instances (list): The created or updated objects.
+        """
+
+
+class BulkSteps(BulkHooks):
+    """The steps shared by the bulk actions."""
+
+    def validate_items(self, batch, offset, outcome):
+        """
+        Validate every item of a batch on its own.
+
+        Args:
+            batch (list): The items.
+            offset (int): The index of the first item in the payload.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            dict: The validated data by the index of the item.
+        """
+        valid = {}
+        for index, entry in enumerate(batch, start=offset):
+            serializer = self.bulk_serializer_class(data=entry)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                outcome.fail(index, serializer.errors)
+        return valid
+
+    def update_instance(self, instance, entry, index, outcome):
+        """
+        Apply the fields of an item to its object.
+
+        Args:
+            instance (Model): The object.
+            entry (dict): The item.
+            index (int): The index of the item in the payload.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            bool: True if the item was valid and applied.
+        """
+        serializer = self.bulk_serializer_class(instance, data=entry, partial=True)
+        if not serializer.is_valid():
+            outcome.fail(index, serializer.errors)
+            return False
+        readonly = set(serializer.validated_data) - set(self.bulk_update_fields)
+        if readonly:
+            outcome.fail(index, {field: [NOT_UPDATABLE] for field in sorted(readonly)})
+            return False
+        for field, field_value in serializer.validated_data.items():
+            setattr(instance, field, field_value)
+        return True
+
+    def fetch_owned(self, batch, offset, outcome):
+        """
+        Fetch the objects of a batch the user may change, in one query.
+
+        Args:
+            batch (list): The items.
+            offset (int): The index of the first item in the payload.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            dict: The objects by the index of their item.
+        """
+        ids = {index: parse_id(entry) for index, entry in enumerate(batch, start=offset)}
+        queryset = self.get_queryset().model.objects.filter(pk__in=[pk for pk in ids.values() if pk])
+        found = {instance.pk: instance for instance in queryset.annotate(**{OWNER: models.F(self.owner_field)})}
+        owned = {}
+        for index, object_id in ids.items():
+            instance = found.get(object_id)
+            if instance is None:
+                outcome.fail(index, {'id': [NOT_FOUND]})
+            elif not self.request.user.is_staff and getattr(instance, OWNER) != self.request.user.id:
+                outcome.fail(index, [FORBIDDEN])
+            else:
+                owned[index] = instance
+        return owned
+
+    def finish_bulk_write(self, student_ids):
+        """
+        Rebuild the counters of the touched students and mark the cached data as stale.
+
+        Deletes cascade to the solutions and the comments, so the versions of all models are bumped.
+
+        Args:
+            student_ids (set): The ids of the touched students.
+        """
+        for _, chunk in batches(sorted(student_ids)):
+            rebuild_ratings(chunk)
+        leaderboard.invalidate()
+        versions.bump_on_commit(*(versions.label_of(model) for model in (Task, Student, TaskStudent, Comment)))
+        bump_generation()
+
+
+class BulkModelMixin(BulkSteps):
+    """
+    Bulk actions for a ModelViewSet.
+
+    Attributes:
+        bulk_serializer_class: The serializer validating one item without database queries.
+        bulk_update_fields: The fields a bulk update may change.
+        owner_field: The lookup of the id of the user owning an object. Staff may change any object.
+    """
+
+    bulk_serializer_class = None
+    bulk_update_fields = ()
+    owner_field = 'user_id'
+
+    def create(self, request, *args, **kwargs):
+        """
+        Create one object, or many if the payload is a list.
+
+        Args:
+            request (Request): The request object.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+
+        Returns:
+            Response: The created object or the bulk result.
+        """
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+        return super().create(request, *args, **kwargs)
+
+    def bulk_create(self, request):
+        """
+        Create the valid items of a list payload.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The ids of the created objects and the errors of the skipped items.
+        """
+        outcome = BulkResult('created')
+        model = self.get_queryset().model
+        touched = set()
+        with bulk_write():
+            for offset, batch in batches(request.data):
+                valid = self.validate_batch(self.validate_items(batch, offset, outcome), outcome)
+                instances = model.objects.bulk_create([self.build_instance(fields) for fields in valid.values()])
+                outcome.ids.extend(instance.pk for instance in instances)
+                touched.update(self.touched_students(instances))
+                self.written(instances)
+            self.finish_bulk_write(touched)
+        return outcome.response(status.HTTP_201_CREATED)
+
+    def bulk_update(self, request):
+        """
+        Update the valid items of a list payload, every item carrying the id of its object.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The ids of the updated objects and the errors of the skipped items.
+        """
+        if not isinstance(request.data, list):
+            return Response({ERRORS: EXPECTED_LIST}, status=status.HTTP_400_BAD_REQUEST)
+        outcome = BulkResult('updated')
+        model = self.get_queryset().model
+        touched = set()
+        with bulk_write():
+            for offset, batch in batches(request.data):
+                updated = self.update_batch(batch, offset, outcome)
+                model.objects.bulk_update(updated, self.bulk_update_fields)
+                outcome.ids.extend(instance.pk for instance in updated)
+                touched.update(self.touched_students(updated))
+                self.written(updated)
+            self.finish_bulk_write(touched)
+        return outcome.response()
+
+    def bulk_destroy(self, request):
+        """
+        Delete the objects listed in the payload, every item being an id or an object with an id.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The ids of the deleted objects and the errors of the skipped items.
+        """
+        if not isinstance(request.data, list):
+            return Response({ERRORS: EXPECTED_LIST}, status=status.HTTP_400_BAD_REQUEST)
+        outcome = BulkResult('deleted')
+        model = self.get_queryset().model
+        touched = set()
+        with bulk_write():
+            for offset, batch in batches(request.data):
+                instances = list(self.fetch_owned(batch, offset, outcome).values())
+                touched.update(self.touched_students(instances))
+                model.objects.filter(pk__in=[instance.pk for instance in instances]).delete()
+                outcome.ids.extend(instance.pk for instance in instances)
+            self.finish_bulk_write(touched)
+        return outcome.response()
+
+    def update_batch(self, batch, offset, outcome):
+        """
+        Apply the valid items of a batch to the objects the user may change.
+
+        Args:
+            batch (list): The items.
+            offset (int): The index of the first item in the payload.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            list: The changed objects.
+        """
+        owned = self.fetch_owned(batch, offset, outcome)
+        return [
+            instance
+            for index, instance in owned.items()
+            if self.update_instance(instance, batch[index - offset], index, outcome)
+        ]
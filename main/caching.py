@@ -0,0 +1,229 @@
+"""
+This module contains the response cache of the read-only API actions.
+
+The serialized data of list and detail responses is stored in the Django cache under its ETag,
+a hash of the absolute URL and the versions of every model the response is built from (see main.conditional).
+A write bumps the version of its model, so the next read misses and older entries simply expire.
+Requests with matching validators get 304 Not Modified before the cache or the database is read.
+Hits and misses are counted per model in the cache, so the counters are shared by all processes.
+"""
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import replicas, versions
+from .conditional import conditional_response, data_etag, set_validators
+
+API_CACHE_TIMEOUT = 300
+CACHE_HEADER = 'X-Cache'
+HIT = 'hit'
+MISS = 'miss'
+
+cached_labels = set()
+
+
+def count(label, outcome):
+    """
+    Count a cache hit or miss.
+
+    Args:
+        label (str): The label of the cached model.
+        outcome (str): HIT or MISS.
+    """
+    key = f'api-cache:{outcome}:{label}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """
+    Read the hit and miss counters of every cached model.
+
+    Returns:
+        dict: The hits, the misses and the hit ratio by model label.
+    """
+    keys = {
+        (label, outcome): f'api-cache:{outcome}:{label}'
+        for label in sorted(cached_labels)
+        for outcome in (HIT, MISS)
+    }
+    found = cache.get_many(keys.values())
+    stats = {}
+    for label in sorted(cached_labels):
+        hits = found.get(keys[label, HIT], 0)
+        misses = found.get(keys[label, MISS], 0)
+        total = hits + misses
+        stats[label] = {'hits': hits, 'misses': misses, 'ratio': hits / total if total else 0}
+    return stats
+
+
+def viewset_labels(viewset):
+    """
+    Return the version labels of the models the responses of a cached viewset are built from.
+
+    Args:
+        viewset (ViewSet): The viewset or its class, with CachedResponseMixin.
+
+    Returns:
+        list: The labels, starting with the model of the viewset.
+    """
+    return [versions.label_of(model) for model in (viewset.queryset.model, *viewset.cache_models)]
+
+
+class CachedRead:
+    """The validators and the cache entry of a read of versioned data, shared by the sync and the async views."""
+
+    def __init__(self, request, labels, representation):
+        """
+        Compute the validators of the current data.
+
+        Args:
+            request (HttpRequest): The request object.
+            labels (list): The version labels of the data, starting with the model of the viewset.
+            representation (str): The format of the response.
+        """
+        self.request = request
+        self.label = labels[0]
+        # The absolute URL, since the pagination links of the cached data carry the scheme and the host.
+        self.etag = data_etag(labels, request.build_absolute_uri(), representation)
+        self.last_modified = versions.last_modified(labels)
+        self.key = f'api:{self.label}:{self.etag}'
+
+    def not_modified(self):
+        """
+        Evaluate the conditional headers of the request.
+
+        Returns:
+            HttpResponse: The 304 or 412 response, or None if the request must be answered in full.
+        """
+        return conditional_response(self.request, self.etag, self.last_modified)
+
+    def get(self):
+        """
+        Read the cached data and count the hit or the miss.
+
+        Returns:
+            object: The data, or None on a miss.
+        """
+        cached = cache.get(self.key)
+        count(self.label, MISS if cached is None else HIT)
+        return cached
+
+    def set(self, payload, timeout):
+        """
+        Cache the data of a successful response, unless it was read from a replica that may lag behind the versions.
+
+        Args:
+            payload (object): The serialized data.
+            timeout (int): The lifetime of the entry in seconds.
+        """
+        if not replicas.read_replica():
+            cache.set(self.key, payload, timeout)
+
+    def finish(self, response, outcome):
+        """
+        Set the X-Cache header and, on success, the validators of a response.
+
+        Args:
+            response (HttpResponse): The response.
+            outcome (str): HIT or MISS.
+
+        Returns:
+            HttpResponse: The same response.
+        """
+        response[CACHE_HEADER] = outcome
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, self.etag, self.last_modified)
+        return response
+
+
+class CachedResponseMixin:
+    """
+    Cache the responses of the list and retrieve actions of a ModelViewSet.
+
+    The cache is checked after authentication and permissions, and only successful responses are stored.
+
+    Attributes:
+        cache_models: The models the serialized data depends on, besides the model of the viewset.
+        cache_timeout: The lifetime of a cached response in seconds.
+    """
+
+    cache_models = ()
+    cache_timeout = API_CACHE_TIMEOUT
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Register the model of the viewset for the cache statistics.
+
+        Args:
+            kwargs (dict): The class arguments.
+        """
+        super().__init_subclass__(**kwargs)
+        if getattr(cls, 'queryset', None) is not None:
+            cached_labels.add(versions.label_of(cls.queryset.model))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return the cached page of the list, rendering it on a miss.
+
+        Args:
+            request (Request): The request object.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+
+        Returns:
+            Response: The page.
+        """
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Return the cached object, rendering it on a miss.
+
+        Args:
+            request (Request): The request object.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+
+        Returns:
+            Response: The object.
+        """
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
+    def cache_labels(self):
+        """
+        Return the version labels of the models the responses are built from.
+
+        Returns:
+            list: The labels, starting with the model of the viewset.
+        """
+        return viewset_labels(self)
+
+    def cached_response(self, request, action, *args, **kwargs):
+        """
+        Answer a conditional request, return the cached data, or run the action and cache its data.
+
+        Args:
+            request (Request): The request object.
+            action (callable): The action rendering the response.
+            args (tuple): The positional arguments of the action.
+            kwargs (dict): The keyword arguments of the action.
+
+        Returns:
+            Response: The response with the validators and the X-Cache header.
+        """
+        read = CachedRead(request, self.cache_labels(), request.accepted_renderer.format)
+        response = read.not_modified()
+        if response is not None:
+            return response
+        cached = read.get()
+        if cached is not None:
+            return read.finish(Response(cached), HIT)
+        response = action(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            read.set(response.data, self.cache_timeout)
+        return read.finish(response, MISS)
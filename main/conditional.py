@@ -0,0 +1,137 @@
+"""
+This module contains the conditional GET support of the API and the HTML entity pages.
+
+The ETag of a response is a hash of the URL, the representation and the versions of the models it is built from
+(see main.versions), and Last-Modified is the time of the last change of those models.
+Both are known before the body is rendered, so a request whose validators match is answered with
+304 Not Modified without touching the database rows.
+"""
+
+from datetime import datetime, timezone
+from hashlib import sha256
+
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from . import versions
+
+ETAG_LENGTH = 32
+
+
+def data_etag(labels, *parts):
+    """
+    Build a strong ETag from the versions of the data and the other parts of the representation.
+
+    Args:
+        labels (Iterable): The version labels of the data.
+        parts (str): The other parts the representation depends on, e.g. the URL.
+
+    Returns:
+        str: The unquoted ETag.
+    """
+    tag = ':'.join(str(version) for version in versions.get_versions(labels))
+    digest = sha256('|'.join((tag, *map(str, parts))).encode())
+    return digest.hexdigest()[:ETAG_LENGTH]
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    Evaluate the conditional headers of a request.
+
+    Args:
+        request (HttpRequest): The request object.
+        etag (str): The unquoted ETag of the current representation.
+        last_modified (float): The Unix time of the last change.
+
+    Returns:
+        HttpResponse: 304 Not Modified (or 412 Precondition Failed) with the validators,
+        or None if the body has to be sent.
+    """
+    response = get_conditional_response(request, etag=quote_etag(etag), last_modified=int(last_modified))
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Set the ETag and Last-Modified headers of a response.
+
+    Args:
+        response (HttpResponse): The response.
+        etag (str): The unquoted ETag.
+        last_modified (float): The Unix time of the last change.
+    """
+    response.headers['ETag'] = quote_etag(etag)
+    response.headers['Last-Modified'] = http_date(last_modified)
+
+
+class PageValidators:
+    """
+    The validators of an HTML page built from some models.
+
+    The page shows the current user and whether they may edit the object, so the user is part of the ETag,
+    and Last-Modified includes the login time. Pages with pending flash messages get no validators.
+    """
+
+    def __init__(self, models):
+        """
+        Remember the version labels of the models.
+
+        Args:
+            models (Iterable): The models the page reads.
+        """
+        self.labels = [versions.label_of(model) for model in models]
+
+    def etag(self, request, *args, **kwargs):
+        """
+        Build the ETag of the page.
+
+        Args:
+            request (HttpRequest): The request object.
+            args (tuple): The positional arguments of the view.
+            kwargs (dict): The keyword arguments of the view.
+
+        Returns:
+            str: The unquoted ETag, or None if the page shows flash messages.
+        """
+        if get_messages(request):
+            return None
+        user = getattr(request, 'user', None)
+        return data_etag(self.labels, request.get_full_path(), user and user.pk)
+
+    def last_modified(self, request, *args, **kwargs):
+        """
+        Return the time of the last change of the page.
+
+        Args:
+            request (HttpRequest): The request object.
+            args (tuple): The positional arguments of the view.
+            kwargs (dict): The keyword arguments of the view.
+
+        Returns:
+            datetime: The time, or None for anonymous users and pages with flash messages.
+        """
+        user = getattr(request, 'user', None)
+        if len(get_messages(request)) or user is None or not user.is_authenticated:
+            return None
+        stamp = versions.last_modified(self.labels)
+        if user.last_login is not None:
+            stamp = max(stamp, user.last_login.timestamp())
+        return datetime.fromtimestamp(int(stamp), tz=timezone.utc)
+
+
+def page_condition(*models):
+    """
+    Build a conditional GET decorator for an HTML page built from the given models.
+
+    Args:
+        models (type): The models the page reads.
+
+    Returns:
+        callable: The view decorator.
+    """
+    validators = PageValidators(models)
+    return condition(etag_func=validators.etag, last_modified_func=validators.last_modified)
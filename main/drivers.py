@@ -0,0 +1,222 @@
+"""
+This module sends requests through the WSGI and ASGI handlers of the project in this process.
+
+No server is involved: the WSGI handler is called from a thread pool, one thread per connection,
+and the ASGI handler from the event loop, one task per connection, so the timings of the bench_async command
+compare the two request paths, not HTTP servers. The requests are GETs without a body.
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+from time import perf_counter
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+
+HOST = 'testserver'
+HTTP_PORT = 80
+MESSAGE_TYPE = 'type'
+
+
+class Exchange:
+    """The ASGI receive and send channels of one request without a body."""
+
+    def __init__(self):
+        """Start the exchange before the request is read."""
+        self.status = None
+        self.requested = False
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        """
+        Hand the empty body to the application, then wait for a disconnect that never comes.
+
+        Returns:
+            dict: The ASGI message.
+        """
+        if self.requested:
+            await self.disconnected.wait()
+            return {MESSAGE_TYPE: 'http.disconnect'}
+        self.requested = True
+        return {MESSAGE_TYPE: 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(self, message):
+        """
+        Record the status of the response and drop the body.
+
+        Args:
+            message (dict): The ASGI message.
+        """
+        if message[MESSAGE_TYPE] == 'http.response.start':
+            self.status = message['status']
+
+
+def wsgi_header(name):
+    """
+    Return the WSGI environ key of a request header.
+
+    Args:
+        name (str): The header name.
+
+    Returns:
+        str: The key.
+    """
+    return 'HTTP_{0}'.format(name.upper().replace('-', '_'))
+
+
+def wsgi_environ(path, headers):
+    """
+    Build the WSGI environ of a GET request.
+
+    Args:
+        path (str): The path.
+        headers (dict): The request headers.
+
+    Returns:
+        dict: The environ.
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': str(HTTP_PORT),
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    environ.update((wsgi_header(name), header) for name, header in headers.items())
+    return environ
+
+
+def asgi_scope(path, headers):
+    """
+    Build the ASGI scope of a GET request.
+
+    Args:
+        path (str): The path.
+        headers (dict): The request headers.
+
+    Returns:
+        dict: The scope.
+    """
+    raw_headers = [(name.lower().encode(), header.encode()) for name, header in headers.items()]
+    return {
+        MESSAGE_TYPE: 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())] + raw_headers,
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, HTTP_PORT),
+    }
+
+
+def record_status(statuses, status_line, headers, exc_info=None):
+    """
+    Record the status of a WSGI response, as its start_response.
+
+    Args:
+        statuses (list): The statuses to append to.
+        status_line (str): The status line.
+        headers (list): The response headers.
+        exc_info (tuple): The exception information.
+    """
+    statuses.append(status_line)
+
+
+def call_wsgi(application, request):
+    """
+    Send one request through the WSGI handler.
+
+    Args:
+        application (WSGIHandler): The handler.
+        request (tuple): The path and the headers.
+
+    Returns:
+        tuple: The duration in seconds and the status code.
+    """
+    statuses = []
+    started = perf_counter()
+    body = application(wsgi_environ(*request), partial(record_status, statuses))
+    b''.join(body)
+    body.close()
+    return perf_counter() - started, int(statuses[0].split()[0])
+
+
+def run_wsgi(requests, concurrency):
+    """
+    Send the requests through the WSGI handler, one thread per connection.
+
+    Args:
+        requests (list): The paths with their headers.
+        concurrency (int): The number of concurrent connections.
+
+    Returns:
+        list: The durations and the status codes.
+    """
+    application = WSGIHandler()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(partial(call_wsgi, application), requests))
+
+
+async def call_asgi(application, connections, request):
+    """
+    Send one request through the ASGI handler.
+
+    Args:
+        application (ASGIHandler): The handler.
+        connections (Semaphore): The free connections.
+        request (tuple): The path and the headers.
+
+    Returns:
+        tuple: The duration in seconds and the status code.
+    """
+    async with connections:
+        exchange = Exchange()
+        started = perf_counter()
+        await application(asgi_scope(*request), exchange.receive, exchange.send)
+        return perf_counter() - started, exchange.status
+
+
+async def gather_asgi(requests, concurrency):
+    """
+    Send the requests through the ASGI handler, at most concurrency at a time.
+
+    Args:
+        requests (list): The paths with their headers.
+        concurrency (int): The number of concurrent connections.
+
+    Returns:
+        list: The durations and the status codes.
+    """
+    application = ASGIHandler()
+    connections = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(call_asgi(application, connections, request) for request in requests))
+
+
+def run_asgi(requests, concurrency):
+    """
+    Send the requests through the ASGI handler, one task per connection.
+
+    Args:
+        requests (list): The paths with their headers.
+        concurrency (int): The number of concurrent connections.
+
+    Returns:
+        list: The durations and the status codes.
+    """
+    return asyncio.run(gather_asgi(requests, concurrency))
@@ -0,0 +1,128 @@
+"""
+This module contains the streaming export of the task solutions.
+
+The rows are read with a server-side cursor in chunks and encoded one by one as the response is sent,
+so the memory used does not depend on the size of the export,
+and the header reaches the client before the first row is read from the database.
+"""
+
+import csv
+import json
+from types import MappingProxyType
+
+from django.http import StreamingHttpResponse
+
+from .models import TaskStudent
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('id', 'task_id', 'task__name', 'student_id', 'student__nickname', 'solution')
+COLUMNS = ('id', 'task', 'task_name', 'student', 'student_nickname', 'solution')
+CONTENT_TYPES = MappingProxyType({
+    CSV: 'text/csv; charset=utf-8',
+    NDJSON: 'application/x-ndjson',
+})
+
+
+class Echo:
+    """A file-like object that returns what is written to it instead of buffering it."""
+
+    def write(self, line_value):
+        """
+        Return the written value.
+
+        Args:
+            line_value (str): The value to write.
+
+        Returns:
+            str: The same value.
+        """
+        return line_value
+
+
+def export_rows(solutions):
+    """
+    Read the exported columns of the solutions in chunks.
+
+    Args:
+        solutions (QuerySet): The solutions to export.
+
+    Returns:
+        Iterator: The rows as tuples in the order of COLUMNS.
+    """
+    return solutions.order_by('task_id', 'id').values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(rows):
+    """
+    Encode the rows as CSV lines, starting with the header.
+
+    Args:
+        rows (Iterable): The rows.
+
+    Yields:
+        str: The next line.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    yield from map(writer.writerow, rows)
+
+
+def ndjson_line(row):
+    """
+    Encode a row as a JSON object on its own line.
+
+    Args:
+        row (tuple): The row.
+
+    Returns:
+        str: The line.
+    """
+    line = json.dumps(dict(zip(COLUMNS, row)), default=str, ensure_ascii=False)
+    return f'{line}\n'
+
+
+def ndjson_lines(rows):
+    """
+    Encode the rows as newline-delimited JSON objects.
+
+    Args:
+        rows (Iterable): The rows.
+
+    Returns:
+        Iterator: The lines.
+    """
+    return map(ndjson_line, rows)
+
+
+ENCODERS = MappingProxyType({
+    CSV: csv_lines,
+    NDJSON: ndjson_lines,
+})
+
+
+def export_solutions(export_format, task_id=None, student_id=None):
+    """
+    Stream the solutions, optionally only of one task or one student.
+
+    Args:
+        export_format (str): CSV or NDJSON.
+        task_id (UUID, optional): The task to export the solutions of.
+        student_id (UUID, optional): The student to export the solutions of.
+
+    Returns:
+        StreamingHttpResponse: The export as an attachment.
+    """
+    solutions = TaskStudent.objects.all()
+    if task_id is not None:
+        solutions = solutions.filter(task_id=task_id)
+    if student_id is not None:
+        solutions = solutions.filter(student_id=student_id)
+    response = StreamingHttpResponse(
+        ENCODERS[export_format](export_rows(solutions)),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="solutions.{export_format}"'
+    return response
@@ -0,0 +1,99 @@
+"""
+This module contains the template fragment cache of the list items.
+
+Every task and student item of the HTML lists is rendered inside a {% cache %} tag keyed by the id of the object
+and its fragment version: the version of the object (bumped by the signal handlers when the object,
+its comments or its solutions change) and the generation of all fragments (bumped by bulk writes).
+Before rendering, the related rows are prefetched only for the items whose fragments are not cached,
+so a warm page costs the query of the page itself and nothing per item.
+The fragments of items read from a replica, which may be older than their versions, are rendered but not cached.
+"""
+
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import models
+
+from . import replicas, versions
+
+GENERATION_LABEL = 'fragments'
+TASK_ITEM = 'task_item'
+STUDENT_ITEM = 'student_item'
+FRAGMENT_TIMEOUT = 3600
+
+
+def fragment_keys(instances, fragment_name):
+    """
+    Attach the fragment versions and timeouts to the items and build their cache keys.
+
+    Args:
+        instances (list): The model instances of the page.
+        fragment_name (str): The name of the {% cache %} fragment of an item.
+
+    Returns:
+        dict: The items by the cache key of their fragment.
+    """
+    model = type(instances[0])
+    labels = [versions.object_label(model, instance.pk) for instance in instances]
+    generation, *item_versions = versions.get_versions([GENERATION_LABEL] + labels)
+    timeout = 0 if replicas.read_replica() else FRAGMENT_TIMEOUT
+    keys = {}
+    for page_item, version in zip(instances, item_versions):
+        page_item.fragment_version = f'{generation}.{version}'
+        page_item.fragment_timeout = timeout
+        keys[make_template_fragment_key(fragment_name, (page_item.pk, page_item.fragment_version))] = page_item
+    return keys
+
+
+def uncached_items(instances, fragment_name):
+    """
+    Attach the fragment versions to the items and return the items whose fragments are not cached.
+
+    Args:
+        instances (list): The model instances of the page.
+        fragment_name (str): The name of the {% cache %} fragment of an item.
+
+    Returns:
+        list: The items to prefetch the relations of.
+    """
+    if not instances:
+        return []
+    keys = fragment_keys(instances, fragment_name)
+    cached = cache.get_many(keys)
+    return [uncached for key, uncached in keys.items() if key not in cached]
+
+
+def cache_items(instances, fragment_name, *lookups):
+    """
+    Attach the fragment versions to the items and prefetch the relations of the items that are not cached.
+
+    Args:
+        instances (list): The model instances of the page.
+        fragment_name (str): The name of the {% cache %} fragment of an item.
+        lookups (str or Prefetch): The relations the fragment renders.
+
+    Returns:
+        list: The same items.
+    """
+    models.prefetch_related_objects(uncached_items(instances, fragment_name), *lookups)
+    return instances
+
+
+async def acache_items(instances, fragment_name, *lookups):
+    """
+    Prepare the items like cache_items(), prefetching with the async ORM.
+
+    Args:
+        instances (list): The model instances of the page.
+        fragment_name (str): The name of the {% cache %} fragment of an item.
+        lookups (str or Prefetch): The relations the fragment renders.
+
+    Returns:
+        list: The same items.
+    """
+    await models.aprefetch_related_objects(uncached_items(instances, fragment_name), *lookups)
+    return instances
+
+
+def bump_generation():
+    """Re-render all fragments, after a write that changed many objects without the per-row signal handlers."""
+    versions.bump_on_commit(GENERATION_LABEL)
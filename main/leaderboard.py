@@ -0,0 +1,162 @@
+"""
+This module contains the student leaderboard.
+
+The ranks are computed by the database with RANK() window functions over the denormalized
+Student.rating (average difficulty) and Student.difficulty_sum (total difficulty) columns.
+Every process keeps the last computed ranking in memory as a snapshot, tagged with a version counter
+from main.versions. The signal handlers bump the version when a solution, a student or a task changes,
+and the next read rebuilds the snapshot, so reading the top or the rank of a student is a dictionary lookup.
+The snapshot is built from the primary, since a replica may hold rows older than the version.
+"""
+
+import threading
+from typing import NamedTuple
+
+from django.db import models
+from django.db.models.functions import Rank
+
+from . import versions
+from .models import Student
+from .replicas import PRIMARY
+
+VERSION_LABEL = 'leaderboard'
+AVERAGE = 'average'
+TOTAL = 'total'
+ORDERS = (AVERAGE, TOTAL)
+RESPONSE_FIELDS = ('id', 'nickname', 'rating', 'difficulty_sum', 'solved_count')
+ROW_FIELDS = (*RESPONSE_FIELDS, 'user_id')
+
+
+class Snapshot(NamedTuple):
+    """The ranking of all students at one version."""
+
+    version: int
+    rankings: dict
+    users: dict
+
+
+def current_version():
+    """
+    Read the version of the leaderboard data.
+
+    Returns:
+        int: The version.
+    """
+    return versions.get_version(VERSION_LABEL)
+
+
+def invalidate():
+    """Mark the snapshots of all processes as stale."""
+    versions.bump_on_commit(VERSION_LABEL)
+
+
+def total_order(row):
+    """
+    Sort key of the ranking by total difficulty.
+
+    Args:
+        row (dict): The snapshot row.
+
+    Returns:
+        tuple: The total rank and the id of the student.
+    """
+    return row['total_rank'], row['id']
+
+
+def build_snapshot(version):
+    """
+    Rank all students in the primary database.
+
+    Args:
+        version (int): The version of the data being ranked.
+
+    Returns:
+        Snapshot: The ranking.
+    """
+    rows = Student.objects.using(PRIMARY).annotate(
+        average_rank=models.Window(Rank(), order_by=[models.F('rating').desc()]),
+        total_rank=models.Window(Rank(), order_by=[models.F('difficulty_sum').desc()]),
+    ).order_by('-rating', 'id').values(*ROW_FIELDS, 'average_rank', 'total_rank')
+    by_average = list(rows)
+    by_total = sorted(by_average, key=total_order)
+    users = {}
+    for student in by_average:
+        users.setdefault(student['user_id'], student)
+    return Snapshot(
+        version=version,
+        rankings={AVERAGE: by_average, TOTAL: by_total},
+        users=users,
+    )
+
+
+class SnapshotCache:
+    """The snapshot of the process, rebuilt by one thread at a time."""
+
+    def __init__(self):
+        """Start without a snapshot."""
+        self._lock = threading.Lock()
+        self.snapshot = None
+
+    def get(self):
+        """
+        Return the snapshot of the current version, rebuilding it if the data changed.
+
+        Returns:
+            Snapshot: The ranking.
+        """
+        version = current_version()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = build_snapshot(version)
+            return self.snapshot
+
+
+snapshots = SnapshotCache()
+
+
+def get_snapshot():
+    """
+    Return the snapshot of the current version, rebuilding it if the data changed.
+
+    Returns:
+        Snapshot: The ranking.
+    """
+    return snapshots.get()
+
+
+def format_row(row, order):
+    """
+    Convert a snapshot row into the response format.
+
+    Args:
+        row (dict): The snapshot row.
+        order (str): The ranking order, AVERAGE or TOTAL.
+
+    Returns:
+        dict: The rank and the counters of the student.
+    """
+    return {'rank': row[f'{order}_rank'], **{field: row[field] for field in RESPONSE_FIELDS}}
+
+
+def leaderboard(order, top, user_id=None):
+    """
+    Read the top of the leaderboard and the rank of the student of a user.
+
+    Args:
+        order (str): The ranking order, AVERAGE or TOTAL.
+        top (int): The number of students to return.
+        user_id (int, optional): The user whose student rank is returned.
+
+    Returns:
+        dict: The top students and the rank of the user's student, if any.
+    """
+    snapshot = get_snapshot()
+    mine = snapshot.users.get(user_id)
+    return {
+        'order': order,
+        'top': [format_row(row, order) for row in snapshot.rankings[order][:top]],
+        'me': format_row(mine, order) if mine else None,
+    }
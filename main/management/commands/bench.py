@@ -0,0 +1,285 @@
+"""
+This module contains the bench management command.
+
+The command seeds a throwaway test database, then requests every named route of django_project.urls
+(the HTML pages, the forms, the API views and every endpoint of the API router) through the test client,
+logged in as a staff user with a token. Every request runs in a transaction that is rolled back,
+so the routes that delete or update see the same data on every request.
+For every route it records the latency percentiles, the queries per request and the bytes of the response,
+writes the results as JSON and, given a baseline written by an earlier run, exits with an error
+when a route got slower beyond the threshold or runs more queries.
+The configured database is never touched.
+"""
+
+import json
+import random
+from pathlib import Path
+from time import perf_counter
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from main import benchmarks
+from main.models import Comment, Student, Task, TaskStudent
+
+HOST = 'testserver'
+DUMMY = 'django.core.cache.backends.dummy.DummyCache'
+ROUTES = 'routes'
+DEFAULT_TASKS = 2000
+DEFAULT_STUDENTS = 500
+DEFAULT_REQUESTS = 30
+DEFAULT_WARMUP = 3
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA = 1.0
+# The integer options: the flag, the default and the help.
+COUNT_OPTIONS = (
+    ('--tasks', DEFAULT_TASKS, 'Tasks to generate.'),
+    ('--students', DEFAULT_STUDENTS, 'Students to generate.'),
+    ('--requests', DEFAULT_REQUESTS, 'Measured requests per route.'),
+    ('--warmup', DEFAULT_WARMUP, 'Unmeasured requests per route before those.'),
+    ('--seed', 0, 'Seed of the random generator.'),
+)
+# Query parameters of the routes that need them to do their work.
+ROUTE_PARAMS = MappingProxyType({
+    'search': {'q': 'Task'},
+    'taskstudent-similar': {'threshold': '0.5'},
+})
+
+
+class QueryCounter:
+    """A database execute wrapper counting the queries."""
+
+    def __init__(self):
+        """Start counting from zero."""
+        self.count = 0
+
+    def __call__(self, execute, *query):
+        """
+        Count a query and run it.
+
+        Args:
+            execute (callable): The next wrapper or the cursor method.
+            query (tuple): The SQL, its parameters, whether it is an executemany call and the context.
+
+        Returns:
+            object: The result of the query.
+        """
+        self.count += 1
+        return execute(*query)
+
+
+def first_object(model):
+    """
+    Return the object of a model with the smallest primary key.
+
+    Args:
+        model (type): The model.
+
+    Returns:
+        Model: The object.
+    """
+    return model.objects.order_by('pk').first()
+
+
+def timed_get(client, user, url, query_params, headers):
+    """
+    Send one GET request and roll back everything it changed.
+
+    The client logs in again before the request, since some routes (logout) drop the session.
+    Streaming responses are read to the end, so their generators are measured too.
+
+    Args:
+        client (Client): The test client.
+        user (User): The user to log in.
+        url (str): The URL.
+        query_params (dict): The query parameters.
+        headers (dict): The request headers.
+
+    Returns:
+        tuple: The duration in seconds, the number of queries, the size of the body and the status code.
+    """
+    client.force_login(user)
+    counter = QueryCounter()
+    with transaction.atomic():
+        with connection.execute_wrapper(counter):
+            started = perf_counter()
+            response = client.get(url, query_params, headers=headers)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            elapsed = perf_counter() - started
+        transaction.set_rollback(True)
+    return elapsed, counter.count, len(body), response.status_code
+
+
+class Command(BaseCommand):
+    """Benchmark every route of the project."""
+
+    help = 'Measure the latency, the queries and the response size of every route, and compare them with a baseline.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        for flag, default, help_text in COUNT_OPTIONS:
+            parser.add_argument(flag, type=int, default=default, help=help_text)
+        parser.add_argument('--route', action='append', dest=ROUTES, help='Only bench this route; may be repeated.')
+        parser.add_argument('--no-cache', action='store_true', help='Disable the fragment and response caches.')
+        parser.add_argument('--json', help='Write the results to this file.')
+        parser.add_argument('--baseline', help='Compare with the results written to this file by an earlier run.')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help=f'Allowed relative growth of the {benchmarks.LATENCY_METRIC} latency.',
+        )
+        parser.add_argument(
+            '--min-delta',
+            type=float,
+            default=DEFAULT_MIN_DELTA,
+            help='Allowed absolute growth of the latency in milliseconds.',
+        )
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command, failing with a CommandError when a route is unknown or regressed.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        baseline = json.loads(Path(options['baseline']).read_text()) if options['baseline'] else None
+        overrides = {'DEBUG': False, 'ALLOWED_HOSTS': [HOST]}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': DUMMY}}
+        with benchmarks.scratch_databases():
+            with override_settings(**overrides):
+                cache.clear()
+                self.seed(random.Random(options['seed']), options['tasks'], options['students'])
+                routes = self.run_routes(self.select_routes(options[ROUTES]), options)
+        summary = {
+            'dataset': {'tasks': options['tasks'], 'students': options['students'], 'seed': options['seed']},
+            'requests': options['requests'],
+            'cached': not options['no_cache'],
+            ROUTES: routes,
+        }
+        self.report(routes)
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(summary, indent=2))
+        if baseline is not None:
+            self.compare(routes, baseline[ROUTES], options['threshold'], options['min_delta'])
+
+    def seed(self, rng, tasks, students):
+        """
+        Fill the test database and remember the objects the routes are requested with.
+
+        Args:
+            rng (Random): The random generator.
+            tasks (int): The number of tasks.
+            students (int): The number of students.
+        """
+        self.user = benchmarks.populate(rng, tasks, students)
+        self.user.is_staff = True
+        self.user.is_superuser = True
+        self.user.save()
+        self.token = Token.objects.create(user=self.user)
+        task, student, comment, solution = map(first_object, (Task, Student, Comment, TaskStudent))
+        self.url_kwargs = {
+            'task_id': task.id, 'student_id': student.id, 'comment_id': comment.id, 'export_format': 'csv',
+        }
+        self.detail_pks = {'task': task.id, 'student': student.id, 'taskstudent': solution.id, 'comment': comment.id}
+
+    def select_routes(self, names):
+        """
+        Build the URLs of the routes to bench.
+
+        Args:
+            names (list): The route names, or None for every route.
+
+        Returns:
+            dict: The URLs by route name.
+
+        Raises:
+            CommandError: If a route name is unknown.
+        """
+        urls = {}
+        for pattern in benchmarks.iter_routes():
+            url = benchmarks.route_url(pattern, self.url_kwargs, self.detail_pks)
+            if url is not None:
+                urls[pattern.name] = url
+        if names:
+            unknown = set(names) - urls.keys()
+            if unknown:
+                raise CommandError(f'Unknown routes: {", ".join(sorted(unknown))}')
+            urls = {name: urls[name] for name in names}
+        return urls
+
+    def run_routes(self, urls, options):
+        """
+        Bench every route in turn.
+
+        Args:
+            urls (dict): The URLs by route name.
+            options (dict): The command options.
+
+        Returns:
+            dict: The results by route name.
+        """
+        client = Client()
+        headers = {'Authorization': f'Token {self.token.key}'}
+        routes = {}
+        for name, url in urls.items():
+            request = (client, self.user, url, ROUTE_PARAMS.get(name, {}), headers)
+            for _ in range(options['warmup']):
+                timed_get(*request)
+            outcomes = [timed_get(*request) for _ in range(options['requests'])]
+            routes[name] = {
+                'url': url,
+                **benchmarks.summarize([outcome[0] for outcome in outcomes]),
+                'queries': max(outcome[1] for outcome in outcomes),
+                'bytes': max(outcome[2] for outcome in outcomes),
+                'status': outcomes[-1][3],
+            }
+        return routes
+
+    def report(self, routes):
+        """
+        Print the results of the routes.
+
+        Args:
+            routes (dict): The results by route name.
+        """
+        for name, summary in routes.items():
+            columns = [f'{name:24}', f'{summary["status"]:4}']
+            for rank in benchmarks.PERCENTILES:
+                metric = f'p{rank}'
+                columns.append(f'{metric} {summary[metric]:8.2f} ms')
+            columns.append(f'{summary[benchmarks.QUERIES]:3} queries')
+            columns.append(f'{summary["bytes"]:8} bytes')
+            self.stdout.write('  '.join(columns))
+
+    def compare(self, routes, baseline, threshold, min_delta):
+        """
+        Report the routes that regressed against the baseline.
+
+        Args:
+            routes (dict): The results by route name.
+            baseline (dict): The baseline results by route name.
+            threshold (float): The allowed relative growth of the latency.
+            min_delta (float): The allowed absolute growth of the latency in milliseconds.
+
+        Raises:
+            CommandError: If a route regressed.
+        """
+        found = benchmarks.regressions(routes, baseline, threshold, min_delta)
+        for regression in found:
+            change = f'{regression.baseline:.2f} -> {regression.current:.2f}'
+            self.stderr.write(f'{regression.route}: {regression.metric} {change}')
+        if found:
+            raise CommandError(f'{len(found)} regressions against the baseline')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,167 @@
+"""
+This module contains the bench_async management command.
+
+The command seeds a throwaway test database and sends the same random mix of read requests
+(the HTML lists and entity pages, the task list and task detail of the API) through the WSGI handler
+with the sync views, one thread per connection, and through the ASGI handler with the async views,
+one task per connection, keeping the given number of connections busy. It reports the requests per second
+and the latency percentiles of both. The handlers are called in this process without a server,
+so the numbers compare the two request paths, not HTTP servers. The fragment and response caches
+are disabled unless --cache is given, so every request reaches the database.
+The configured database and cache are never touched.
+"""
+
+import json
+import random
+from pathlib import Path
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from main.benchmarks import populate, scratch_databases, summarize
+from main.drivers import HOST, run_asgi, run_wsgi
+from main.models import Comment, Student, Task
+
+DUMMY = 'django.core.cache.backends.dummy.DummyCache'
+SAMPLE_SIZE = 1000
+DEFAULT_TASKS = 2000
+DEFAULT_STUDENTS = 500
+DEFAULT_REQUESTS = 2000
+DEFAULT_CONCURRENCY = 500
+HTTP_OK = 200
+TARGETS = (
+    ('tasks_page', None, False),
+    ('students_page', None, False),
+    ('comments_page', None, False),
+    ('task', Task, False),
+    ('student', Student, False),
+    ('comment', Comment, False),
+    ('task-list', None, True),
+    ('task-detail', Task, True),
+)
+STACKS = (
+    ('wsgi', 'django_project.urls', run_wsgi),
+    ('asgi', 'django_project.urls_async', run_asgi),
+)
+
+
+class Command(BaseCommand):
+    """Benchmark the async read-only views against the sync views."""
+
+    help = 'Compare the requests per second and the latency of the read-only views over WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--tasks', type=int, default=DEFAULT_TASKS, help='Tasks to generate.')
+        parser.add_argument('--students', type=int, default=DEFAULT_STUDENTS, help='Students to generate.')
+        parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS, help='Requests sent to each stack.')
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='Concurrent connections.')
+        parser.add_argument('--cache', action='store_true', help='Keep the fragment and response caches.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+        parser.add_argument('--json', help='Write the results to this file.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        rng = random.Random(options['seed'])
+        caches = {} if options['cache'] else {'CACHES': {'default': {'BACKEND': DUMMY}}}
+        with scratch_databases():
+            token = Token.objects.create(user=populate(rng, options['tasks'], options['students']))
+            requests = self.build_requests(rng, options['requests'], token)
+            with override_settings(ALLOWED_HOSTS=[HOST], **caches):
+                timings = self.run_stacks(requests, options['concurrency'])
+        self.report(timings)
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(timings, indent=2))
+
+    def build_requests(self, rng, count, token):
+        """
+        Draw the paths and headers of the requests.
+
+        Args:
+            rng (Random): The random generator.
+            count (int): The number of requests.
+            token (Token): The token of the API requests.
+
+        Returns:
+            list: The paths with their headers.
+        """
+        ids = {
+            model: list(model.objects.values_list('pk', flat=True)[:SAMPLE_SIZE])
+            for model in (Task, Student, Comment)
+        }
+        auth = {'Authorization': f'Token {token.key}'}
+        requests = []
+        for _ in range(count):
+            url_name, model, api = rng.choice(TARGETS)
+            args = [rng.choice(ids[model])] if model else []
+            requests.append((reverse(url_name, args=args), auth if api else {}))
+        return requests
+
+    def run_stacks(self, requests, concurrency):
+        """
+        Send the requests through the sync and then the async stack, each with an empty cache.
+
+        Args:
+            requests (list): The paths with their headers.
+            concurrency (int): The number of concurrent connections.
+
+        Returns:
+            dict: The results by stack.
+        """
+        timings = {}
+        for name, urlconf, run in STACKS:
+            cache.clear()
+            with override_settings(ROOT_URLCONF=urlconf):
+                timings[name] = self.run_stack(run, requests, concurrency)
+        return timings
+
+    def run_stack(self, run, requests, concurrency):
+        """
+        Send the requests through one handler.
+
+        Args:
+            run (callable): The driver of the handler.
+            requests (list): The paths with their headers.
+            concurrency (int): The number of concurrent connections.
+
+        Returns:
+            dict: The requests per second, the error count and the latency summary.
+        """
+        started = perf_counter()
+        outcomes = run(requests, concurrency)
+        elapsed = perf_counter() - started
+        return {
+            **summarize([duration for duration, _ in outcomes]),
+            'requests_per_second': len(outcomes) / elapsed,
+            'errors': sum(status_code != HTTP_OK for _, status_code in outcomes),
+        }
+
+    def report(self, timings):
+        """
+        Print the results side by side.
+
+        Args:
+            timings (dict): The results by stack.
+        """
+        for name, summary in timings.items():
+            self.stdout.write(
+                f'{name}  {summary["requests_per_second"]:8.1f} req/s'
+                + f'  errors {summary["errors"]:4}'
+                + f'  p50 {summary["p50"]:8.2f} ms'
+                + f'  p99 {summary["p99"]:8.2f} ms',
+            )
@@ -0,0 +1,137 @@
+"""
+This module contains the bench_fragments management command.
+
+The command seeds a throwaway test database with tasks, students, solutions and comments,
+then walks the whole tasks and students lists through their load-more views three times:
+with the fragment cache disabled, with a cold cache and with a warm cache.
+The configured database and cache are never touched.
+"""
+
+import json
+import random
+from pathlib import Path
+from time import perf_counter
+from urllib.parse import parse_qsl
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+
+from main import views
+from main.benchmarks import populate, scratch_databases, summarize
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+DUMMY = 'django.core.cache.backends.dummy.DummyCache'
+DEFAULT_TASKS = 10000
+DEFAULT_STUDENTS = 2000
+ENTRIES_PER_ITEM = 4
+PASSES = (('uncached', DUMMY), ('cold', LOCMEM), ('warm', LOCMEM))
+LISTS = (
+    ('tasks', views.tasks_fragment, 'tasks_fragment'),
+    ('students', views.students_fragment, 'students_fragment'),
+)
+
+
+class Command(BaseCommand):
+    """Benchmark the fragment cache of the HTML lists."""
+
+    help = 'Show the render time of the tasks and students lists without, with a cold and with a warm fragment cache.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--tasks', type=int, default=DEFAULT_TASKS, help='Tasks to generate.')
+        parser.add_argument('--students', type=int, default=DEFAULT_STUDENTS, help='Students to generate.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+        parser.add_argument('--json', help='Write the results to this file.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        with scratch_databases():
+            populate(random.Random(options['seed']), options['tasks'], options['students'])
+            timings = self.run_lists(options['tasks'] + options['students'])
+        self.report(timings)
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(timings, indent=2))
+
+    def run_lists(self, entries):
+        """
+        Walk every list without the fragment cache, then cold, then warm.
+
+        Args:
+            entries (int): The number of list items, to size the cache.
+
+        Returns:
+            dict: The latency summary and the total time of every pass by list name.
+        """
+        timings = {name: {} for name, _, _ in LISTS}
+        local = {'BACKEND': LOCMEM, 'OPTIONS': {'MAX_ENTRIES': entries * ENTRIES_PER_ITEM}}
+        with override_settings(CACHES={'default': local}):
+            cache.clear()
+            for label, backend in PASSES:
+                for name, summary in self.run_pass({**local, 'BACKEND': backend}).items():
+                    timings[name][label] = summary
+        return timings
+
+    def run_pass(self, backend):
+        """
+        Walk every list once.
+
+        Args:
+            backend (dict): The settings of the cache.
+
+        Returns:
+            dict: The latency summary and the total time by list name.
+        """
+        with override_settings(CACHES={'default': backend}):
+            return {name: self.walk(view, reverse(url_name)) for name, view, url_name in LISTS}
+
+    def walk(self, view, url):
+        """
+        Request every slice of a list through its load-more view.
+
+        Args:
+            view (callable): The load-more view.
+            url (str): The URL of the first slice.
+
+        Returns:
+            dict: The latency summary of the slices and the total time in seconds.
+        """
+        factory = RequestFactory()
+        samples = []
+        while url:
+            path, _, query = url.partition('?')
+            request = factory.get(path, dict(parse_qsl(query)))
+            started = perf_counter()
+            response = view(request)
+            samples.append(perf_counter() - started)
+            url = response.headers.get('X-Next-Page')
+        return {**summarize(samples), 'pages': len(samples), 'total': sum(samples)}
+
+    def report(self, timings):
+        """
+        Print the render times side by side.
+
+        Args:
+            timings (dict): The results by list name and pass.
+        """
+        for name, passes in timings.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, summary in passes.items():
+                self.stdout.write(
+                    f'  {label:8} {summary["pages"]:5} pages'
+                    + f'  total {summary["total"]:7.2f} s'
+                    + f'  p50 {summary["p50"]:7.2f} ms'
+                    + f'  p95 {summary["p95"]:7.2f} ms',
+                )
@@ -0,0 +1,345 @@
+"""
+This module contains the bench_indexes management command.
+
+The command builds a scratch SQLite database from the current models, fills it with synthetic rows
+and shows the EXPLAIN QUERY PLAN and the latency of the hot lookups before and after the Meta.indexes are created.
+The configured database is never touched.
+"""
+
+import json
+import random
+import sqlite3
+import tempfile
+from datetime import date
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from main.benchmarks import measure
+from main.models import Comment, Student, Task, TaskStudent
+from main.pagination import Keyset
+
+MODELS = (Task, Student, TaskStudent, Comment)
+DAYS = 3650
+FIRST_YEAR = 2015
+FIRST_DAY = date(FIRST_YEAR, 1, 1)
+PAGE_SIZE = 50
+ID_BYTES = 16
+DEFAULT_ROWS = 1000000
+DEFAULT_REPEAT = 200
+ROWS_PER_OWNER = 100
+SAMPLE_EVERY = 1000
+SOLUTION_STRIDE = 7
+DIFFICULTIES = 6
+TASK_INSERT = 'INSERT INTO main_task (id, user_id, name, description, difficulty) VALUES (?, ?, ?, ?, ?)'
+STUDENT_INSERT = (
+    'INSERT INTO main_student (id, user_id, nickname, registration_date, solved_count, difficulty_sum, rating)'
+    + ' VALUES (?, ?, ?, ?, 0, 0, 0)'
+)
+SOLUTION_INSERT = 'INSERT INTO main_taskstudent (id, task_id, student_id, solution) VALUES (?, ?, ?, ?)'
+COMMENT_INSERT = (
+    'INSERT INTO main_comment (id, task_id_id, student_id, text_comment, date_publication) VALUES (?, ?, ?, ?, ?)'
+)
+
+
+def compile_queryset(queryset):
+    """
+    Compile a queryset into SQL for the scratch database.
+
+    Args:
+        queryset (QuerySet or Query): The queryset to compile.
+
+    Returns:
+        tuple: The SQL with qmark placeholders and its parameters.
+    """
+    query = getattr(queryset, 'query', queryset)
+    sql, sql_params = query.get_compiler(connection=connection).as_sql()
+    return sql.replace('%s', '?').replace('%%', '%'), sql_params  # noqa: WPS323
+
+
+def hot_queries(sample):
+    """
+    Build the hot lookups of the application for one sampled set of keys.
+
+    Args:
+        sample (dict): The sampled keys.
+
+    Returns:
+        dict: The compiled queries by name.
+    """
+    solution = TaskStudent.objects.filter(task_id=sample['task'], student_id=sample['student'])
+    comments = Comment.objects.filter(task_id=sample['task']).only('id', 'task_id')
+    tasks_page = Keyset(Task).seek(Task.objects.all(), sample['task_cursor'], PAGE_SIZE)[0]
+    comments_page = Keyset(Comment).seek(Comment.objects.all(), sample['comment_cursor'], PAGE_SIZE)[0]
+    return {
+        'student_by_user': compile_queryset(Student.objects.filter(user=sample['user'])[:1]),
+        'solution_exists': compile_queryset(solution.query.exists()),
+        'comments_of_task': compile_queryset(comments.order_by('date_publication', 'id')),
+        'tasks_by_name': compile_queryset(tasks_page),
+        'comments_deep_page': compile_queryset(comments_page),
+    }
+
+
+def random_id(rng):
+    """
+    Generate a reproducible id in the column format of the UUID fields.
+
+    Args:
+        rng (Random): The random generator.
+
+    Returns:
+        str: The id as 32 hex digits.
+    """
+    return rng.randbytes(ID_BYTES).hex()
+
+
+def schema():
+    """
+    Collect the DDL of the models, splitting off the Meta.indexes under test.
+
+    Returns:
+        tuple: The statements creating the tables with their 0001 indexes, and the statements creating the rest.
+    """
+    editor = connection.schema_editor(collect_sql=True, atomic=False)
+    with editor:
+        for model in MODELS:
+            editor.create_model(model)
+    names = {f'"{index.name}"' for indexed in MODELS for index in indexed._meta.indexes}  # noqa: WPS437
+    index_sql = [sql for sql in editor.collected_sql if any(name in sql for name in names)]
+    table_sql = [sql for sql in editor.collected_sql if sql not in index_sql]
+    return table_sql, index_sql
+
+
+def run_lookup(lookup):
+    """
+    Run one hot lookup.
+
+    Args:
+        lookup (tuple): The scratch database and the compiled query.
+
+    Returns:
+        list: The rows.
+    """
+    database, query = lookup
+    return database.execute(*query).fetchall()
+
+
+class Dataset:
+    """The synthetic rows of the scratch database."""
+
+    def __init__(self, rng, rows):
+        """
+        Generate the tasks and the students.
+
+        Args:
+            rng (Random): The random generator.
+            rows (int): The number of comments and solutions.
+        """
+        self.rng = rng
+        self.rows = rows
+        self.owners = max(rows // ROWS_PER_OWNER, 1)
+        names = [f'Task {rng.random():.12f}' for _ in range(self.owners)]
+        self.tasks = [(random_id(rng), name) for name in names]
+        self.students = [random_id(rng) for _ in range(self.owners)]
+        self.comments = []
+
+    def task_rows(self):
+        """
+        Generate the task rows.
+
+        Returns:
+            Iterator: The task rows.
+        """
+        return (
+            (task, index + 1, name, 'Description', index % DIFFICULTIES)
+            for index, (task, name) in enumerate(self.tasks)
+        )
+
+    def student_rows(self):
+        """
+        Generate the student rows.
+
+        Returns:
+            Iterator: The student rows.
+        """
+        return (
+            (student, index + 1, f'Student {index}', self.random_date())
+            for index, student in enumerate(self.students)
+        )
+
+    def solution_rows(self):
+        """
+        Generate the solutions, the same number for every student.
+
+        Yields:
+            tuple: The solution row.
+        """
+        per_student = min(self.rows // self.owners, self.owners)
+        for index, student in enumerate(self.students):
+            for shift in range(per_student):
+                task = self.tasks[(index * SOLUTION_STRIDE + shift) % self.owners][0]
+                yield random_id(self.rng), task, student, 'Solution'
+
+    def comment_rows(self):
+        """
+        Generate the comment rows, keeping every thousandth row in comments as a sample.
+
+        Yields:
+            tuple: The comment row.
+        """
+        for index in range(self.rows):
+            task = self.rng.choice(self.tasks)[0]
+            row = (random_id(self.rng), task, self.rng.choice(self.students), 'Comment', self.random_date())
+            if index % SAMPLE_EVERY == 0:
+                self.comments.append(row)
+            yield row
+
+    def random_date(self):
+        """
+        Pick a date within the last ten years.
+
+        Returns:
+            str: The date in ISO format.
+        """
+        return date.fromordinal(FIRST_DAY.toordinal() + self.rng.randrange(DAYS)).isoformat()
+
+
+class Command(BaseCommand):
+    """Benchmark the lookup indexes on a synthetic dataset."""
+
+    help = 'Show query plans and latency of the hot lookups before and after the Meta.indexes.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Comments and solutions to generate.')
+        parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='Runs of every query.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+        parser.add_argument('--json', help='Write the results to this file.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        dataset = Dataset(random.Random(options['seed']), options['rows'])
+        with tempfile.TemporaryDirectory() as directory:
+            database = sqlite3.connect(Path(directory) / 'bench.sqlite3', isolation_level=None)
+            before, after = self.compare(database, dataset, options['repeat'])
+            database.close()
+        self.report(before, after)
+        if options['json']:
+            summary = {'rows': options['rows'], 'before': before, 'after': after}
+            Path(options['json']).write_text(json.dumps(summary, indent=2))
+
+    def compare(self, database, dataset, repeat):
+        """
+        Fill the scratch database, then time the hot lookups without and with the indexes.
+
+        Args:
+            database (Connection): The scratch database.
+            dataset (Dataset): The synthetic rows.
+            repeat (int): The runs of every query.
+
+        Returns:
+            tuple: The results without and with the indexes.
+        """
+        table_sql, index_sql = schema()
+        for table_statement in table_sql:
+            database.execute(table_statement)
+        started = perf_counter()
+        self.populate(database, dataset)
+        elapsed = perf_counter() - started
+        self.stdout.write(f'Generated {dataset.rows} rows per table in {elapsed:.1f}s')
+        samples = [self.sample(dataset) for _ in range(repeat)]
+        before = self.run_queries(database, samples)
+        started = perf_counter()
+        for index_statement in index_sql:
+            database.execute(index_statement)
+        database.execute('ANALYZE')
+        elapsed = perf_counter() - started
+        self.stdout.write(f'Created {len(index_sql)} indexes in {elapsed:.1f}s')
+        return before, self.run_queries(database, samples)
+
+    def populate(self, database, dataset):
+        """
+        Fill the scratch tables with synthetic rows.
+
+        Args:
+            database (Connection): The scratch database.
+            dataset (Dataset): The synthetic rows.
+        """
+        database.execute('BEGIN')
+        database.executemany(TASK_INSERT, dataset.task_rows())
+        database.executemany(STUDENT_INSERT, dataset.student_rows())
+        database.executemany(SOLUTION_INSERT, dataset.solution_rows())
+        database.executemany(COMMENT_INSERT, dataset.comment_rows())
+        database.execute('COMMIT')
+        database.execute('ANALYZE')
+
+    def sample(self, dataset):
+        """
+        Pick the keys of one run of the hot lookups.
+
+        Args:
+            dataset (Dataset): The synthetic rows.
+
+        Returns:
+            dict: The compiled hot queries.
+        """
+        rng = dataset.rng
+        task_id, task_name = rng.choice(dataset.tasks)
+        comment = rng.choice(dataset.comments)
+        published = date.fromisoformat(comment[-1])
+        return hot_queries({
+            'user': rng.randrange(len(dataset.students)) + 1,
+            'task': task_id,
+            'student': dataset.students[rng.randrange(len(dataset.students))],
+            'task_cursor': Keyset(Task).encode(Task(id=task_id, name=task_name)),
+            'comment_cursor': Keyset(Comment).encode(Comment(id=comment[0], date_publication=published)),
+        })
+
+    def run_queries(self, database, samples):
+        """
+        Explain and time every hot lookup.
+
+        Args:
+            database (Connection): The scratch database.
+            samples (list): The compiled hot queries of every run.
+
+        Returns:
+            dict: The query plan and the latency summary by query name.
+        """
+        timings = {}
+        for name, (sql, sql_params) in samples[0].items():
+            plan = [row[-1] for row in database.execute(f'EXPLAIN QUERY PLAN {sql}', sql_params)]
+            lookups = [(database, queries[name]) for queries in samples]
+            timings[name] = {'plan': plan, **measure(run_lookup, lookups)}
+        return timings
+
+    def report(self, before, after):
+        """
+        Print the query plans and the latencies side by side.
+
+        Args:
+            before (dict): The results without the indexes.
+            after (dict): The results with the indexes.
+        """
+        for name, unindexed in before.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, timing in (('before', unindexed), ('after', after[name])):
+                self.stdout.write(
+                    f'  {label:6} mean {timing["mean"]:9.3f} ms'
+                    + f'  p95 {timing["p95"]:9.3f} ms',
+                )
+                for step in timing['plan']:
+                    self.stdout.write(f'           {step}')
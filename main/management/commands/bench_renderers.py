@@ -0,0 +1,200 @@
+"""
+This module contains the bench_renderers management command.
+
+The command seeds a throwaway test database, requests a page of the tasks and of the comments list
+of the API and times rendering and parsing those payloads with the JSON renderer and parser of DRF
+and with the orjson and the MessagePack ones, those that are installed. It checks the orjson
+JSON is the same as the DRF JSON and reports the time per payload, the throughput and the size of each.
+The configured database and cache are never touched.
+"""
+
+import json
+import random
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from main import benchmarks, renderers
+
+DUMMY = 'django.core.cache.backends.dummy.DummyCache'
+LISTS = ('task-list', 'comment-list')
+DRF_JSON = 'drf-json'
+ORJSON = 'orjson'
+SIZE = 'bytes'
+RENDER = 'render'
+PARSE = 'parse'
+BYTES_PER_MB = 1000000
+DEFAULT_TASKS = 2000
+DEFAULT_STUDENTS = 500
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_NUMBER = 50
+# The integer options: the flag, the default and the help.
+COUNT_OPTIONS = (
+    ('--tasks', DEFAULT_TASKS, 'Tasks to generate.'),
+    ('--students', DEFAULT_STUDENTS, 'Students to generate.'),
+    ('--page-size', DEFAULT_PAGE_SIZE, 'Objects per payload.'),
+    ('--number', DEFAULT_NUMBER, 'Calls per round.'),
+    ('--repeat', 5, 'Rounds; the fastest counts.'),
+    ('--seed', 0, 'Seed of the random generator.'),
+)
+
+
+def installed_codecs():
+    """
+    List the codecs to compare: the JSON of DRF, and orjson and MessagePack when they are installed.
+
+    Returns:
+        list: The names, renderer and parser classes of the codecs.
+    """
+    codecs = [(DRF_JSON, JSONRenderer, JSONParser)]
+    if renderers.orjson:
+        codecs.append((ORJSON, renderers.OrjsonRenderer, renderers.OrjsonParser))
+    if renderers.msgpack:
+        codecs.append(('msgpack', renderers.MessagePackRenderer, renderers.MessagePackParser))
+    return codecs
+
+
+def parse_bytes(parser, body):
+    """
+    Parse a body the way a request does.
+
+    Args:
+        parser (BaseParser): The parser.
+        body (bytes): The body.
+
+    Returns:
+        object: The data.
+    """
+    return parser.parse(BytesIO(body))
+
+
+def speed(operation, timings, baseline):
+    """
+    Format the time of an operation of a codec and its speedup over the JSON of DRF.
+
+    Args:
+        operation (str): The operation, render or parse.
+        timings (dict): The times of the codec.
+        baseline (dict): The times of the JSON of DRF.
+
+    Returns:
+        str: The time and the speedup.
+    """
+    seconds = timings[operation]
+    milliseconds = seconds * benchmarks.MILLISECONDS
+    speedup = baseline[operation] / seconds
+    return f'{operation} {milliseconds:8.3f} ms ({speedup:5.2f}x)'
+
+
+class Command(BaseCommand):
+    """Benchmark the renderers and the parsers of the API."""
+
+    help = 'Show the render and parse times of API pages with the DRF JSON, orjson and MessagePack codecs.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        for flag, default, help_text in COUNT_OPTIONS:
+            parser.add_argument(flag, type=int, default=default, help=help_text)
+        parser.add_argument('--json', help='Write the results to this file.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        with benchmarks.scratch_databases():
+            user = benchmarks.populate(random.Random(options['seed']), options['tasks'], options['students'])
+            payloads = self.load_payloads(user, options['page_size'])
+        codecs = installed_codecs()
+        summary = {
+            name: self.run_payload(payload, codecs, options['number'], options['repeat'])
+            for name, payload in payloads.items()
+        }
+        self.report(summary)
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(summary, indent=2))
+
+    def load_payloads(self, user, page_size):
+        """
+        Request the first page of every list.
+
+        Args:
+            user (User): The user owning the rows, made a superuser.
+            page_size (int): The objects per page.
+
+        Returns:
+            dict: The data of the pages by route name.
+        """
+        user.is_staff = True
+        user.is_superuser = True
+        user.save()
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with override_settings(CACHES={'default': {'BACKEND': DUMMY}}):
+            return {name: client.get(reverse(name), {'page_size': page_size}).data for name in LISTS}
+
+    def run_payload(self, payload, codecs, number, repeat):
+        """
+        Render and parse a payload with every codec.
+
+        Args:
+            payload (dict): The data of a page.
+            codecs (list): The names, renderer and parser classes of the codecs.
+            number (int): The calls per round.
+            repeat (int): The rounds.
+
+        Returns:
+            dict: The size and the render and parse times of every codec.
+
+        Raises:
+            CommandError: If orjson renders different JSON than DRF.
+        """
+        summary = {}
+        bodies = {}
+        for name, renderer_class, parser_class in codecs:
+            renderer = renderer_class()
+            body = renderer.render(payload)
+            bodies[name] = body
+            summary[name] = {
+                SIZE: len(body),
+                RENDER: benchmarks.best_time(renderer.render, payload, number, repeat),
+                PARSE: benchmarks.best_time(partial(parse_bytes, parser_class()), body, number, repeat),
+            }
+        if bodies.get(ORJSON, bodies[DRF_JSON]) != bodies[DRF_JSON]:
+            raise CommandError('orjson renders different JSON than the JSON renderer of DRF.')
+        return summary
+
+    def report(self, summary):
+        """
+        Print the times side by side.
+
+        Args:
+            summary (dict): The results by route name and codec.
+        """
+        for name, codecs in summary.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            baseline = codecs[DRF_JSON]
+            for codec, timings in codecs.items():
+                throughput = timings[SIZE] / timings[RENDER] / BYTES_PER_MB
+                columns = (
+                    f'{codec:9} {timings[SIZE]:9} bytes',
+                    speed(RENDER, timings, baseline),
+                    speed(PARSE, timings, baseline),
+                    f'{throughput:8.1f} MB/s',
+                )
+                self.stdout.write(f'  {"  ".join(columns)}')
@@ -0,0 +1,175 @@
+"""
+This module contains the bench_serializers management command.
+
+The command seeds a throwaway test database with tasks, students, solutions and comments,
+then reads and renders the whole tasks and comments lists page by page twice: through the ModelSerializers
+from model instances and through the compiled row functions from values_list() rows. It checks both render
+the same JSON and reports the throughput of each in rows per second. The configured database is never touched.
+"""
+
+import json
+import random
+from pathlib import Path
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from main import benchmarks
+from main.rows import plan_rows, row_plan
+from main.views import CommentViewSet, TaskViewSet
+
+LISTS = (
+    ('tasks', TaskViewSet),
+    ('comments', CommentViewSet),
+)
+SECONDS = 'seconds'
+ROWS_PER_SECOND = 'rows_per_second'
+DEFAULT_TASKS = 10000
+DEFAULT_STUDENTS = 2000
+DEFAULT_PAGE_SIZE = 100
+# The integer options: the flag, the default and the help.
+COUNT_OPTIONS = (
+    ('--tasks', DEFAULT_TASKS, 'Tasks to generate.'),
+    ('--students', DEFAULT_STUDENTS, 'Students to generate.'),
+    ('--page-size', DEFAULT_PAGE_SIZE, 'Rows per page.'),
+    ('--repeat', 3, 'Passes per path; the fastest counts.'),
+    ('--seed', 0, 'Seed of the random generator.'),
+)
+
+
+def serializer_page(viewset, offset, limit):
+    """
+    Read and serialize a page of a list from model instances.
+
+    Args:
+        viewset (type): The viewset of the list.
+        offset (int): The index of the first row.
+        limit (int): The number of rows.
+
+    Returns:
+        list: The rendered objects.
+    """
+    return viewset.serializer_class(viewset.queryset.all()[offset:offset + limit], many=True).data
+
+
+def rows_page(viewset, offset, limit):
+    """
+    Read and render a page of a list from values_list() rows.
+
+    Args:
+        viewset (type): The viewset of the list.
+        offset (int): The index of the first row.
+        limit (int): The number of rows.
+
+    Returns:
+        list: The rendered objects.
+    """
+    plan = row_plan(viewset.serializer_class)
+    rows = list(plan_rows(viewset.queryset, plan)[offset:offset + limit])
+    return plan.render(rows, plan.related_ids([row.pk for row in rows]) if plan.many else ())
+
+
+PATHS = (
+    ('serializer', serializer_page),
+    ('rows', rows_page),
+)
+
+
+def time_path(viewset, read_page, page_size, repeat):
+    """
+    Read and render every page of a list through a path, repeatedly.
+
+    Args:
+        viewset (type): The viewset of the list.
+        read_page (callable): The path.
+        page_size (int): The rows per page.
+        repeat (int): The passes.
+
+    Returns:
+        tuple: The best time in seconds and the JSON of the whole list.
+    """
+    total = viewset.queryset.count()
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        pages = [read_page(viewset, offset, page_size) for offset in range(0, total, page_size)]
+        timings.append(perf_counter() - started)
+    return min(timings), JSONRenderer().render([row for page in pages for row in page])
+
+
+class Command(BaseCommand):
+    """Benchmark the row serialization of the API lists against the ModelSerializers."""
+
+    help = 'Show the serialization throughput of the tasks and comments lists with the serializers and with the rows.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        for flag, default, help_text in COUNT_OPTIONS:
+            parser.add_argument(flag, type=int, default=default, help=help_text)
+        parser.add_argument('--json', help='Write the results to this file.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        with benchmarks.scratch_databases():
+            benchmarks.populate(random.Random(options['seed']), options['tasks'], options['students'])
+            summary = {
+                name: self.run_list(viewset, options['page_size'], options['repeat'])
+                for name, viewset in LISTS
+            }
+        self.report(summary)
+        if options['json']:
+            Path(options['json']).write_text(json.dumps(summary, indent=2))
+
+    def run_list(self, viewset, page_size, repeat):
+        """
+        Render a list through both paths and check they agree.
+
+        Args:
+            viewset (type): The viewset of the list.
+            page_size (int): The rows per page.
+            repeat (int): The passes per path.
+
+        Returns:
+            dict: The number of rows, and the best time and the throughput of every path.
+
+        Raises:
+            CommandError: If the paths render different JSON.
+        """
+        total = viewset.queryset.count()
+        summary = {'count': total}
+        rendered = {}
+        for label, read_page in PATHS:
+            best, listing = time_path(viewset, read_page, page_size, repeat)
+            rendered[label] = listing
+            summary[label] = {SECONDS: best, ROWS_PER_SECOND: total / best if best else 0}
+        if rendered['serializer'] != rendered['rows']:
+            raise CommandError(f'The rows of {viewset.__name__} render different JSON than its serializer.')
+        return summary
+
+    def report(self, summary):
+        """
+        Print the throughputs side by side.
+
+        Args:
+            summary (dict): The results by list name.
+        """
+        for name, measured in summary.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name} ({measured["count"]} rows)'))
+            for label, _ in PATHS:
+                seconds = f'{measured[label][SECONDS]:7.3f} s'
+                rate = f'{measured[label][ROWS_PER_SECOND]:10.0f} rows/s'
+                self.stdout.write(f'  {label:10} {seconds}  {rate}')
+            speedup = measured['serializer'][SECONDS] / measured['rows'][SECONDS]
+            self.stdout.write(f'  speedup    {speedup:7.2f}x')
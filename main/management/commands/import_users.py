@@ -0,0 +1,217 @@
+"""
+This module contains the import_users management command.
+
+The command creates users, their students and their API tokens from a CSV file with the columns
+username, password and nickname. The rows are validated in batches with one query per batch,
+the passwords are hashed in a process pool, and every batch is written with bulk_create in one transaction
+while the pool hashes the passwords of the next one.
+Invalid rows are skipped and reported with their line number.
+"""
+
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from main import leaderboard, versions
+from main.models import Student, max_length
+
+USERNAME = 'username'
+NICKNAME = 'nickname'
+COLUMNS = (USERNAME, 'password', NICKNAME)
+ROW_VALIDATORS = (
+    (USERNAME, UnicodeUsernameValidator()),
+    (NICKNAME, max_length),
+)
+DEFAULT_BATCH_SIZE = 1000
+HASH_CHUNK_SIZE = 64
+FIRST_LINE = 2
+
+
+def setup_worker():
+    """Configure Django in a pool process started with the spawn method."""
+    django.setup()
+
+
+def read_rows(csv_path):
+    """
+    Read the rows of a CSV file.
+
+    Args:
+        csv_path (str): The path of the file.
+
+    Returns:
+        list: The line numbers and the rows.
+
+    Raises:
+        CommandError: If the file has no header with the required columns.
+    """
+    with open(csv_path, newline='', encoding='utf-8') as csv_file:
+        reader = csv.DictReader(csv_file)
+        if not reader.fieldnames or set(COLUMNS) - set(reader.fieldnames):
+            raise CommandError(f'The CSV header must contain {", ".join(COLUMNS)}')
+        return list(enumerate(reader, start=FIRST_LINE))
+
+
+def plain_passwords(valid):
+    """
+    Read the passwords of the valid rows.
+
+    Args:
+        valid (list): The valid rows with their line numbers.
+
+    Returns:
+        list: The passwords in the order of the rows.
+    """
+    return [row['password'] for _, row in valid]
+
+
+def read_back_ids(users):
+    """
+    Set the ids of users created by a bulk insert that did not return them.
+
+    Args:
+        users (list): The created users.
+    """
+    ids = dict(
+        User.objects.filter(username__in=[created.username for created in users]).values_list(USERNAME, 'id'),
+    )
+    for user in users:
+        user.pk = ids[user.username]
+
+
+class Command(BaseCommand):
+    """Import users with their students and tokens from CSV."""
+
+    help = 'Create users, students and API tokens from a CSV file with username, password and nickname columns.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('csv_file', help='The CSV file with a header row.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows written per transaction.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes, one per CPU by default.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        rows = read_rows(options['csv_file'])
+        created = self.import_rows(rows, options['batch_size'], options['workers'])
+        if created:
+            versions.bump_on_commit(versions.label_of(User), versions.label_of(Student))
+            leaderboard.invalidate()
+        skipped = len(rows) - created
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users, skipped {skipped} rows'))
+
+    def import_rows(self, rows, batch_size, workers):
+        """
+        Validate and write the rows batch by batch, hashing the passwords of a batch while the previous one is written.
+
+        Args:
+            rows (list): The line numbers and the rows.
+            batch_size (int): The rows written per transaction.
+            workers (int): The password hashing processes.
+
+        Returns:
+            int: The number of created users.
+        """
+        created = 0
+        accepted = set()
+        hashing = None
+        with ProcessPoolExecutor(max_workers=workers, initializer=setup_worker) as pool:
+            for start in range(0, len(rows), batch_size):
+                valid = self.validate(rows[start:start + batch_size], accepted)
+                passwords = pool.map(make_password, plain_passwords(valid), chunksize=HASH_CHUNK_SIZE)
+                if hashing:
+                    created += self.write(hashing[0], list(hashing[1]))
+                hashing = (valid, passwords)
+            if hashing:
+                created += self.write(hashing[0], list(hashing[1]))
+        return created
+
+    def validate(self, batch, accepted):
+        """
+        Validate the rows of a batch, checking the taken usernames with one query, and report the invalid rows.
+
+        Args:
+            batch (list): The line numbers and the rows.
+            accepted (set): The usernames of the rows accepted so far, updated in place.
+
+        Returns:
+            list: The valid rows with their line numbers.
+        """
+        usernames = {row[USERNAME] for _, row in batch}
+        taken = accepted | set(User.objects.filter(username__in=usernames).values_list(USERNAME, flat=True))
+        valid = []
+        for line, row in batch:
+            message = self.row_error(row, taken)
+            if message:
+                self.stderr.write(f'line {line}: {message}')
+            else:
+                taken.add(row[USERNAME])
+                accepted.add(row[USERNAME])
+                valid.append((line, row))
+        return valid
+
+    def row_error(self, row, taken):
+        """
+        Validate one row.
+
+        Args:
+            row (dict): The row.
+            taken (set): The usernames already in use.
+
+        Returns:
+            str: The error message, or None if the row is valid.
+        """
+        if not all(row.get(column) for column in COLUMNS):
+            return f'{", ".join(COLUMNS)} are required'
+        if row[USERNAME] in taken:
+            return f'user {row[USERNAME]} already exists'
+        for column, validator in ROW_VALIDATORS:
+            try:
+                validator(row[column])
+            except ValidationError as error:
+                return ' '.join(error.messages)
+        return None
+
+    def write(self, valid, passwords):
+        """
+        Create the users, the students and the tokens of a batch in one transaction.
+
+        The ids of the users are read back if the database does not return them from a bulk insert.
+
+        Args:
+            valid (list): The valid rows with their line numbers.
+            passwords (list): The password hashes in the order of the rows.
+
+        Returns:
+            int: The number of created users.
+        """
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                User(username=row[USERNAME], password=password) for (_, row), password in zip(valid, passwords)
+            )
+            if users and users[0].pk is None:
+                read_back_ids(users)
+            Student.objects.bulk_create(
+                Student(user=user, nickname=row[NICKNAME]) for user, (_, row) in zip(users, valid)
+            )
+            Token.objects.bulk_create(Token(user=owner, key=Token.generate_key()) for owner in users)
+        return len(users)
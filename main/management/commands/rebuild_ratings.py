@@ -0,0 +1,44 @@
+"""
+This module contains the rebuild_ratings management command.
+
+The command recalculates the solve counters and the rating of every student from the task-student table.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main import leaderboard, versions
+from main.fragments import bump_generation
+from main.models import Student
+from main.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    """Rebuild the denormalized solve counters of students."""
+
+    help = 'Recalculate solved_count, difficulty_sum and rating of all students with one GROUP BY query.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--batch-size', type=int, default=1000, help='Students written per UPDATE batch.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        with transaction.atomic():
+            fixed = rebuild_ratings(batch_size=options['batch_size'])
+            if fixed:
+                versions.bump_on_commit(versions.label_of(Student))
+                leaderboard.invalidate()
+                bump_generation()
+        self.stdout.write(self.style.SUCCESS(f'Fixed counters of {fixed} students'))
@@ -0,0 +1,29 @@
+"""
+This module contains the rebuild_search management command.
+
+The command recreates the triggers of the full-text search indexes and refills the indexes from the tables.
+Run it after a migration that alters the tasks, comments or task-student table.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.search import SEARCH_INDEXES, create_indexes
+
+
+class Command(BaseCommand):
+    """Rebuild the full-text search indexes."""
+
+    help = 'Recreate the FTS5 search indexes and their triggers from the tasks, comments and solutions.'
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        with transaction.atomic():
+            create_indexes()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(SEARCH_INDEXES)} search indexes'))
@@ -0,0 +1,109 @@
+"""
+This module contains the report_duplicates management command.
+
+The command prints the pairs of near-duplicate solutions of every task (or of the given tasks) as CSV,
+most similar first within a task, reading the LSH buckets of main.similarity instead of comparing every pair.
+Solutions written without the signal handlers (bulk_create, QuerySet.update) can be indexed first with --reindex.
+"""
+
+import csv
+
+from django.core.management.base import BaseCommand
+
+from main.models import TaskStudent
+from main.similarity import DEFAULT_THRESHOLD, duplicate_pairs, index_solutions
+
+REINDEX_BATCH_SIZE = 500
+HEADER = ('task', 'first_solution', 'first_student', 'second_solution', 'second_student', 'similarity')
+
+
+def report_order(pair):
+    """
+    Order the pairs by task, most similar first.
+
+    Args:
+        pair (tuple): The task id, the two solution ids and the similarity.
+
+    Returns:
+        tuple: The sort key.
+    """
+    return str(pair[0]), -pair[3]
+
+
+class Command(BaseCommand):
+    """Report the near-duplicate solutions."""
+
+    help = 'Print the pairs of near-duplicate solutions of the same task as CSV.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--task', action='append', dest='tasks', help='Only check this task; may be repeated.')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Minimal similarity.')
+        parser.add_argument(
+            '--reindex', choices=('missing', 'all'), help='Index the solutions without a signature, or all, first.',
+        )
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+        """
+        if options['reindex']:
+            indexed = self.reindex(options['reindex'] == 'all', options['tasks'])
+            self.stderr.write(f'Indexed {indexed} solutions')
+        pairs = list(duplicate_pairs(options['tasks'], options['threshold']))
+        pairs.sort(key=report_order)
+        names = self.describe({solution_id for pair in pairs for solution_id in pair[1:3]})
+        writer = csv.writer(self.stdout)
+        writer.writerow(HEADER)
+        for task_id, first, second, score in pairs:
+            writer.writerow(
+                (task_id, first, names.get(first), second, names.get(second), f'{score:.3f}'),
+            )
+        self.stderr.write(self.style.SUCCESS(f'Found {len(pairs)} pairs'))
+
+    def reindex(self, everything, task_ids):
+        """
+        Index the signatures of solutions in batches.
+
+        Args:
+            everything (bool): Whether to index every solution or only those without a signature.
+            task_ids (list): The tasks to index, or None for all tasks.
+
+        Returns:
+            int: The number of indexed solutions.
+        """
+        solutions = TaskStudent.objects.order_by('pk').only('id', 'task_id', 'solution')
+        if not everything:
+            solutions = solutions.filter(signature__isnull=True)
+        if task_ids:
+            solutions = solutions.filter(task_id__in=task_ids)
+        ids = list(solutions.values_list('pk', flat=True))
+        for start in range(0, len(ids), REINDEX_BATCH_SIZE):
+            index_solutions(list(solutions.filter(pk__in=ids[start:start + REINDEX_BATCH_SIZE])))
+        return len(ids)
+
+    def describe(self, solution_ids):
+        """
+        Read the nicknames of the students of solutions.
+
+        Args:
+            solution_ids (set): The ids of the solutions.
+
+        Returns:
+            dict: The nicknames by solution id.
+        """
+        nicknames = {}
+        solution_ids = sorted(solution_ids)
+        for start in range(0, len(solution_ids), REINDEX_BATCH_SIZE):
+            rows = TaskStudent.objects.filter(pk__in=solution_ids[start:start + REINDEX_BATCH_SIZE])
+            nicknames.update(rows.values_list('pk', 'student__nickname'))
+        return nicknames
@@ -0,0 +1,285 @@
+"""
+This module contains the seed_data management command.
+
+The command fills the configured database with a synthetic dataset of millions of rows for load tests:
+users owning tasks and students, solutions and comments. Everything derives from --seed, the ids included,
+so two runs with the same options produce the same rows. The skew of real data is reproduced with Zipf laws:
+the solutions are shared out between the students by the rank of the student, and the tasks are picked
+for the solutions and the comments by the rank of their popularity. A student never gets two solutions
+of the same task, as unique_together requires.
+
+The rows skip the models: every batch is drawn at once as numpy arrays from a numpy Generator seeded
+with --seed, turned into tuples in the column format of the database and inserted with executemany,
+many batches per transaction (see main.seeding). On SQLite the secondary indexes of the tables
+and the search triggers are dropped during the load, and the indexes are built once at the end; building
+the unique index checks that no pair of task and student was repeated. The counters of the students
+are known from the generated solutions and written with one executemany UPDATE, then the caches are marked stale.
+The signatures of the similarity search are not computed; run report_duplicates --reindex for them.
+"""
+
+from itertools import chain
+from time import perf_counter
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from main import leaderboard, seeding, versions
+from main.fragments import bump_generation
+from main.models import Comment, Student, Task, TaskStudent
+from main.ratings import COUNTER_FIELDS, apply_solution_delta
+
+ID = 'id'
+SEED = 'seed'
+TASKS = 'tasks'
+STUDENTS = 'students'
+DIFFICULTIES = 6
+DEFAULT_BATCH_SIZE = 10000
+# The integer options: the flag, the default and the help.
+COUNT_OPTIONS = (
+    ('--users', 100, 'Users owning the tasks and the students.'),
+    ('--tasks', 10000, 'Tasks to generate.'),
+    ('--students', 100000, 'Students to generate.'),
+    ('--solutions', 800000, 'Solutions to generate.'),
+    ('--comments', 100000, 'Comments to generate.'),
+    ('--seed', 0, 'Seed of the random generator.'),
+    ('--batch-size', DEFAULT_BATCH_SIZE, 'Rows per executemany call.'),
+    ('--transaction-size', 500000, 'Rows per transaction.'),
+)
+# The float options: the flag, the default and the help.
+SKEW_OPTIONS = (
+    ('--solve-skew', 1.0, 'Zipf exponent of the solutions per student, by rank.'),
+    ('--task-skew', 0.8, 'Zipf exponent of the popularity of the tasks, by rank.'),
+)
+
+
+def count_errors(options):
+    """
+    Check that the counts can be generated.
+
+    Args:
+        options (dict): The command options.
+
+    Returns:
+        list: Why the counts cannot be generated: a negative count, or solutions that do not fit
+        the tasks and the students.
+    """
+    negative = [count for count in ('users', TASKS, STUDENTS, 'solutions', 'comments') if options[count] < 0]
+    has_tasks, has_students = options[TASKS] > 0, options[STUDENTS] > 0
+    checks = (
+        (negative, f'Counts must not be negative: {", ".join(negative)}'),
+        (min(options['batch_size'], options['transaction_size']) < 1, 'Batch and transaction sizes must be positive'),
+        ((has_tasks or has_students) and not options['users'], 'Tasks and students need users'),
+        (
+            options['solutions'] > options[TASKS] * options[STUDENTS],
+            'There are more solutions than pairs of tasks and students',
+        ),
+        (options['comments'] and not (has_tasks and has_students), 'Comments need tasks and students'),
+    )
+    return [message for failed, message in checks if failed]
+
+
+def username_prefix(seed):
+    """
+    Return the prefix of the usernames of a seed; the other rows derive from the seed like them.
+
+    Args:
+        seed (int): The seed.
+
+    Returns:
+        str: The prefix.
+    """
+    return f'seed{seed}_'
+
+
+def create_users(prefix, count):
+    """
+    Create the users with unusable passwords.
+
+    Args:
+        prefix (str): The prefix of the usernames.
+        count (int): The number of users.
+
+    Returns:
+        list: The ids of the users.
+    """
+    users = User.objects.bulk_create(
+        User(username=f'{prefix}{index:05}', password=make_password(None)) for index in range(count)
+    )
+    return [user.pk for user in users]
+
+
+def counters_sql():
+    """
+    Build the UPDATE statement of the counters of a student.
+
+    Returns:
+        str: The SQL taking the solved count, the total difficulty and the id of the student.
+    """
+    quote = connection.ops.quote_name
+    columns = {name: quote(Student._meta.get_field(name).column) for name in (ID, *COUNTER_FIELDS)}  # noqa: WPS437
+    assignments = f'{columns["solved_count"]} = %s, {columns["difficulty_sum"]} = %s'  # noqa: WPS323
+    return f'UPDATE {quote(Student._meta.db_table)} SET {assignments} WHERE {columns[ID]} = %s'  # noqa: WPS323, WPS437
+
+
+class Command(BaseCommand):
+    """Fill the database with a large synthetic dataset."""
+
+    help = 'Generate a deterministic synthetic dataset of tasks, students, solutions and comments with skewed counts.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        for flag, default, help_text in COUNT_OPTIONS:
+            parser.add_argument(flag, type=int, default=default, help=help_text)
+        for skew_flag, skew, skew_help in SKEW_OPTIONS:
+            parser.add_argument(skew_flag, type=float, default=skew, help=skew_help)
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+
+        Raises:
+            CommandError: If the counts are inconsistent or the rows of the seed already exist.
+        """
+        errors = count_errors(options)
+        if errors:
+            raise CommandError(errors[0])
+        prefix = username_prefix(options[SEED])
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'The rows of seed {options[SEED]} already exist')
+        self.options = options
+        self.rows = seeding.RowFactory(np.random.default_rng(options[SEED]))
+        self.loader = seeding.Loader(self.stdout, options['batch_size'], options['transaction_size'])
+        started = perf_counter()
+        with seeding.FastWrites(connection):
+            user_ids = create_users(prefix, options['users'])
+            task_ids, difficulties = self.insert_tasks(user_ids)
+            student_ids = self.insert_students(user_ids)
+            self.insert_solutions(task_ids, difficulties, student_ids)
+            self.insert_comments(task_ids, student_ids)
+        with transaction.atomic():
+            leaderboard.invalidate()
+            versions.bump_on_commit(
+                *(versions.label_of(model) for model in (User, Task, Student, TaskStudent, Comment)),
+            )
+            bump_generation()
+        elapsed = perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Seeded the database in {elapsed:.1f} s'))
+
+    def insert_tasks(self, user_ids):
+        """
+        Insert the tasks; the first ones are the most popular.
+
+        Args:
+            user_ids (list): The ids of the users.
+
+        Returns:
+            tuple: The ids and the difficulties of the tasks, as arrays.
+        """
+        count = self.options[TASKS]
+        ids = self.rows.uuids(count)
+        difficulties = self.rows.rng.integers(DIFFICULTIES, size=count)
+        names = map('Task {0:07} {1}'.format, range(count), self.rows.picks(seeding.WORDS, count))
+        users = self.rows.picks(user_ids, count)
+        rows = zip(ids, users, names, self.rows.texts(count), difficulties.tolist())
+        self.loader.insert(Task, (ID, 'user', 'name', 'description', 'difficulty'), rows)
+        return np.array(ids, dtype=object), difficulties
+
+    def insert_students(self, user_ids):
+        """
+        Insert the students with zero counters, written after their solutions.
+
+        Args:
+            user_ids (list): The ids of the users.
+
+        Returns:
+            ndarray: The ids of the students.
+        """
+        count = self.options[STUDENTS]
+        ids = self.rows.uuids(count)
+        nicknames = (f'Student {index:07}' for index in range(count))
+        rows = (
+            (*student, 0, 0, 0)
+            for student in zip(ids, self.rows.picks(user_ids, count), nicknames, self.rows.dates(count))
+        )
+        fields = (ID, 'user', 'nickname', 'registration_date', 'solved_count', 'difficulty_sum', 'rating')
+        self.loader.insert(Student, fields, rows)
+        return np.array(ids, dtype=object)
+
+    def insert_solutions(self, task_ids, difficulties, student_ids):
+        """
+        Insert the solutions, shared out between the students in random order of rank, and their counters.
+
+        Args:
+            task_ids (ndarray): The ids of the tasks, most popular first.
+            difficulties (ndarray): The difficulties of the tasks.
+            student_ids (ndarray): The ids of the students.
+        """
+        ranked = self.rows.rng.permutation(student_ids)
+        weights = seeding.zipf_weights(len(ranked), self.options['solve_skew']).tolist()
+        shares = seeding.allocate(self.options['solutions'], weights, len(task_ids))
+        cum_weights = np.cumsum(seeding.zipf_weights(len(task_ids), self.options['task_skew']))
+        batches = seeding.solution_batches(
+            self.rows.rng, cum_weights, zip(ranked.tolist(), shares), self.loader.batch_size,
+        )
+        counters = []
+        rows = self.solution_rows(task_ids, difficulties, batches, counters)
+        self.loader.insert(TaskStudent, (ID, 'task', 'student', 'solution'), rows)
+        self.loader.write('Counters', counters_sql(), counters)
+        with transaction.atomic():
+            apply_solution_delta(Student.objects.filter(solved_count__gt=0), 0, 0)
+
+    def solution_rows(self, task_ids, difficulties, batches, counters):
+        """
+        Generate the solutions batch by batch, and note the counters of the students.
+
+        Args:
+            task_ids (ndarray): The ids of the tasks, most popular first.
+            difficulties (ndarray): The difficulties of the tasks.
+            batches (iterable): The task ranks of the solutions with the ids and the solved counts of their students.
+            counters (list): Receives the solved count, the total difficulty and the id of every student with solutions.
+
+        Yields:
+            tuple: The values of a solution.
+        """
+        for ranks, solvers, solved in batches:
+            # Every student's solutions are contiguous, so their difficulties add up by the offsets of the students.
+            sums = np.add.reduceat(difficulties[ranks], np.cumsum(solved) - solved).tolist()
+            counters.extend(zip(solved, sums, solvers))
+            solver_ids = np.repeat(np.array(solvers, dtype=object), solved).tolist()
+            count = len(ranks)
+            ids = self.rows.uuids(count)
+            yield from zip(ids, task_ids[ranks].tolist(), solver_ids, self.rows.texts(count))
+
+    def insert_comments(self, task_ids, student_ids):
+        """
+        Insert the comments in batches on tasks picked by popularity, by students picked uniformly.
+
+        Args:
+            task_ids (ndarray): The ids of the tasks, most popular first.
+            student_ids (ndarray): The ids of the students.
+        """
+        rng = self.rows.rng
+        cum_weights = np.cumsum(seeding.zipf_weights(len(task_ids), self.options['task_skew']))
+        rows = chain.from_iterable(
+            zip(
+                self.rows.uuids(size),
+                task_ids[seeding.zipf_picks(rng, cum_weights, size)].tolist(),
+                self.rows.picks(student_ids, size),
+                self.rows.texts(size),
+                self.rows.dates(size),
+            )
+            for size in self.loader.batch_sizes(self.options['comments'])
+        )
+        self.loader.insert(Comment, (ID, 'task_id', 'student', 'text_comment', 'date_publication'), rows)
@@ -0,0 +1,215 @@
+"""
+This module contains the summarize_slow_queries management command.
+
+The command reads the NDJSON entries of the slow query log (SLOW_QUERY_LOG and its rotated files by default),
+groups them by the fingerprint of their SQL and prints the groups that took the most time in total,
+with their count, mean and maximum duration, the views they ran for and their most frequent calling line.
+It only reads the log files, so it can run anywhere the files are copied to.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.slow_queries import fingerprint
+
+DEFAULT_TOP = 20
+
+
+class Group:
+    """The slow queries sharing a fingerprint."""
+
+    def __init__(self, sql):
+        """
+        Start an empty group.
+
+        Args:
+            sql (str): The fingerprint.
+        """
+        self.sql = sql
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.views = Counter()
+        self.callers = Counter()
+
+    def add(self, entry):
+        """
+        Add an entry of the log.
+
+        Args:
+            entry (dict): The entry.
+        """
+        self.count += 1
+        self.total += entry['duration_ms']
+        self.max = max(self.max, entry['duration_ms'])
+        view = entry.get('view') or '-'
+        if entry.get('action'):
+            view = f'{view}.{entry["action"]}'
+        self.views[view] += 1
+        if entry.get('stack'):
+            self.callers[entry['stack'][-1]] += 1
+
+    def summary(self):
+        """
+        Summarize the group.
+
+        Returns:
+            dict: The fingerprint, the count, the total, mean and maximum milliseconds, the views and the caller.
+        """
+        caller = self.callers.most_common(1)
+        return {
+            'fingerprint': self.sql,
+            'count': self.count,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3),
+            'max_ms': round(self.max, 3),
+            'views': dict(self.views.most_common()),
+            'caller': caller[0][0] if caller else None,
+        }
+
+
+def total_ms(summary):
+    """
+    Order the groups by their total time.
+
+    Args:
+        summary (dict): The summary of a group.
+
+    Returns:
+        float: The total milliseconds.
+    """
+    return summary['total_ms']
+
+
+def default_paths():
+    """
+    Return the slow query log and its rotated files, oldest first.
+
+    Returns:
+        list: The existing files, none when the log is disabled.
+    """
+    if not settings.SLOW_QUERY_LOG:
+        return []
+    log = Path(settings.SLOW_QUERY_LOG)
+    rotated = sorted(log.parent.glob(f'{log.name}.*'), key=rotation_number, reverse=True)
+    return [*rotated, log] if log.exists() else rotated
+
+
+def parse_entry(line):
+    """
+    Read an entry of the log and the fingerprint of its SQL.
+
+    Args:
+        line (str): The line of the log.
+
+    Returns:
+        tuple: The fingerprint and the entry, or None for a malformed line.
+    """
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    try:
+        return fingerprint(entry['sql']), entry
+    except (KeyError, TypeError):
+        return None
+
+
+def rotation_number(path):
+    """
+    Read the number of a rotated log file.
+
+    Args:
+        path (Path): The file, such as slow_queries.ndjson.2.
+
+    Returns:
+        int: The number, higher for older files.
+    """
+    suffix = path.suffix.lstrip('.')
+    return int(suffix) if suffix.isdigit() else 0
+
+
+class Command(BaseCommand):
+    """Summarize the slow query log."""
+
+    help = 'Group the slow query log by SQL fingerprint and show the groups that took the most time.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('paths', nargs='*', help='Log files; SLOW_QUERY_LOG and its rotated files by default.')
+        parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='Groups to show.')
+        parser.add_argument('--json', action='store_true', help='Print the groups as JSON.')
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+
+        Raises:
+            CommandError: If the log is disabled or there is no log file.
+        """
+        paths = [Path(path) for path in options['paths']] or default_paths()
+        if not settings.SLOW_QUERY_LOG and not paths:
+            raise CommandError('The slow query log is disabled; pass its files or set SLOW_QUERY_LOG')
+        if not paths:
+            raise CommandError(f'No slow query log at {settings.SLOW_QUERY_LOG}')
+        groups, skipped = self.read(paths)
+        summaries = sorted((group.summary() for group in groups.values()), key=total_ms, reverse=True)
+        summaries = summaries[:options['top']]
+        if options['json']:
+            self.stdout.write(json.dumps(summaries, indent=2, ensure_ascii=False))
+        else:
+            self.report(summaries)
+        if skipped:
+            self.stderr.write(self.style.WARNING(f'Skipped {skipped} malformed lines'))
+
+    def read(self, paths):
+        """
+        Group the entries of the log files.
+
+        Args:
+            paths (list): The log files.
+
+        Returns:
+            tuple: The groups by fingerprint and the number of malformed lines.
+        """
+        groups = {}
+        skipped = 0
+        for path in paths:
+            with path.open(encoding='utf-8') as log:
+                parsed = [parse_entry(line) for line in log]
+            skipped += parsed.count(None)
+            for key, entry in filter(None, parsed):
+                groups.setdefault(key, Group(key)).add(entry)
+        return groups, skipped
+
+    def report(self, summaries):
+        """
+        Print the groups.
+
+        Args:
+            summaries (list): The summaries of the groups, slowest first.
+        """
+        for summary in summaries:
+            counts = summary['views'].items()
+            views = ', '.join(f'{view} ×{count}' for view, count in counts)
+            self.stdout.write(
+                f'{summary["total_ms"]:10.1f} ms total  {summary["count"]:6} queries  '
+                + f'mean {summary["mean_ms"]:8.1f} ms  max {summary["max_ms"]:8.1f} ms',
+            )
+            self.stdout.write(f'    {summary["fingerprint"]}')
+            self.stdout.write(f'    views: {views}')
+            if summary['caller']:
+                self.stdout.write(f'    caller: {summary["caller"]}')
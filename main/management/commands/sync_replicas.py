@@ -0,0 +1,70 @@
+"""
+This module contains the sync_replicas management command.
+
+The command copies the SQLite file of the primary database over every read replica of REPLICA_DATABASES
+(see main.replicas), once or every --interval seconds until interrupted, standing in for replication
+on a single machine. Keep the interval below REPLICA_STICKY_SECONDS so clients read their own writes.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.replicas import replica_aliases, sync_replica
+
+
+class Command(BaseCommand):
+    """Refresh the read replicas from the primary database."""
+
+    help = 'Copy the primary SQLite database over the read replicas, once or periodically.'
+
+    def add_arguments(self, parser):
+        """
+        Add the command arguments.
+
+        Args:
+            parser (ArgumentParser): The argument parser.
+        """
+        parser.add_argument('--interval', type=float, default=0, help='Seconds between syncs; 0 syncs once.')
+        parser.add_argument(
+            '--replica', action='append', dest='replicas', help='Only sync this alias; may be repeated.',
+        )
+
+    def handle(self, *args, **options):  # noqa: WPS110
+        """
+        Run the command.
+
+        Args:
+            args (tuple): The positional arguments.
+            options (dict): The command options.
+
+        Raises:
+            CommandError: If there is no replica to sync or an alias is not a replica.
+        """
+        aliases = options['replicas'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured; set DB_REPLICAS')
+        unknown = set(aliases) - set(replica_aliases())
+        if unknown:
+            raise CommandError(f'Not a replica: {", ".join(sorted(unknown))}')
+        if options['interval'] > settings.REPLICA_STICKY_SECONDS:
+            self.stderr.write(self.style.WARNING('The interval is longer than REPLICA_STICKY_SECONDS'))
+        while True:
+            self.sync(aliases)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def sync(self, aliases):
+        """
+        Copy the primary over the replicas.
+
+        Args:
+            aliases (list): The aliases of the replicas.
+        """
+        for alias in aliases:
+            started = time.perf_counter()
+            path = sync_replica(alias)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'Synced {alias} to {path} in {elapsed:.0f} ms')
@@ -0,0 +1,342 @@
+"""
+This module records the request metrics of the application (see main.prometheus for their counters).
+
+The middleware records, per resolved view name, histograms of the request latency, of the number and the time
+of the database queries, of the template render time and of the response size, and counts the responses by status.
+The queries are timed by an execute wrapper installed on every database connection and the templates
+by the TimedDjangoTemplates backend; both add to the request being served through a context variable,
+which the async ORM threads inherit too.
+"""
+
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .prometheus import (DB_DURATION, DB_QUERIES, REQUEST_DURATION,
+                         RESPONSE_SIZE, RESPONSES, TEMPLATE_DURATION, metrics)
+
+UNRESOLVED = 'unresolved'
+
+
+class RequestTiming:
+    """The queries and the render time of the request being served, and its statements when captured."""
+
+    def __init__(self, request=None):
+        """
+        Start timing a request.
+
+        Args:
+            request (HttpRequest): The request object.
+        """
+        self.request = request
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_seconds = 0
+        self.template_seconds = 0
+        self.statements = None
+
+    @contextmanager
+    def serving(self):
+        """
+        Make this the request being served in the current context.
+
+        Yields:
+            RequestTiming: The timing.
+        """
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    @contextmanager
+    def timed_query(self, sql, many):
+        """
+        Time a query, even if it fails, and add it to the request.
+
+        Args:
+            sql (str): The SQL.
+            many (bool): Whether it is an executemany call.
+
+        Yields:
+            None: Control to the query.
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = perf_counter() - started
+            self.queries += 1
+            self.db_seconds += elapsed
+            if self.statements is not None:
+                self.statements.append((sql, elapsed, many))
+
+    @contextmanager
+    def timed_render(self):
+        """
+        Time a template render, even if it fails, and add it to the request.
+
+        Yields:
+            None: Control to the render.
+        """
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.template_seconds += perf_counter() - started
+
+
+_current = ContextVar('request_timing', default=None)
+
+
+def current_request():
+    """
+    Return the request being served in this context.
+
+    Returns:
+        HttpRequest: The request, or None outside of a request.
+    """
+    timing = _current.get()
+    return timing.request if timing is not None else None
+
+
+@contextmanager
+def capture_statements():
+    """
+    Collect the SQL and the duration of every query of the current request.
+
+    Only the request that asks for it pays for the capture (see main.profiling).
+
+    Yields:
+        list: The SQL, the duration in seconds and the executemany flag of every query, filled as they run.
+    """
+    timing = _current.get()
+    with ExitStack() as stack:
+        if timing is None:
+            timing = stack.enter_context(RequestTiming().serving())
+        timing.statements = []
+        stack.callback(setattr, timing, 'statements', None)
+        yield timing.statements
+
+
+def record_query(execute, sql, sql_params, many, context):
+    """
+    Time a query and add it to the request being served; installed on every database connection.
+
+    Args:
+        execute (callable): The next wrapper or the cursor method.
+        sql (str): The SQL.
+        sql_params (tuple): The parameters.
+        many (bool): Whether it is an executemany call.
+        context (dict): The connection and the cursor.
+
+    Returns:
+        object: The result of the query.
+    """
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, sql_params, many, context)
+    with timing.timed_query(sql, many):
+        return execute(sql, sql_params, many, context)
+
+
+def instrument_connection(connection):
+    """
+    Time the queries of a new database connection.
+
+    Args:
+        connection (DatabaseWrapper): The connection.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedTemplate(Template):
+    """A Django template adding its render time to the request being served."""
+
+    def render(self, context=None, request=None):
+        """
+        Render the template.
+
+        Args:
+            context (dict): The template context.
+            request (HttpRequest): The request object.
+
+        Returns:
+            SafeString: The rendered template.
+        """
+        timing = _current.get()
+        if timing is None:
+            return super().render(context, request)
+        with timing.timed_render():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend with timed templates."""
+
+    def from_string(self, template_code):
+        """
+        Compile a template from a string.
+
+        Args:
+            template_code (str): The template source.
+
+        Returns:
+            TimedTemplate: The template.
+        """
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        """
+        Load a template.
+
+        Args:
+            template_name (str): The template name.
+
+        Returns:
+            TimedTemplate: The template.
+        """
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as error:
+            reraise(error, self)
+
+
+def view_name(request):
+    """
+    Return the name of the view a request was routed to.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        str: The view name with its namespace, the dotted path of an unnamed view, or UNRESOLVED.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED
+    return match.view_name
+
+
+def record_request(request, response, timing, size):
+    """
+    Record the metrics of a served request.
+
+    Args:
+        request (HttpRequest): The request object.
+        response (HttpResponse): The response.
+        timing (RequestTiming): The timing of the request.
+        size (int): The size of the body, or None if unknown.
+    """
+    labels = (('view', view_name(request)),)
+    metrics.record(REQUEST_DURATION, labels, perf_counter() - timing.started)
+    metrics.record(DB_QUERIES, labels, timing.queries)
+    metrics.record(DB_DURATION, labels, timing.db_seconds)
+    metrics.record(TEMPLATE_DURATION, labels, timing.template_seconds)
+    if size is not None:
+        metrics.record(RESPONSE_SIZE, labels, size)
+    metrics.record(RESPONSES, (*labels, ('status', str(response.status_code))))
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory:
+        metrics.flush(directory)
+
+
+class MetricsMiddleware:
+    """Record the metrics of every request; place it first, so it times the other middleware too."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Wrap the next handler, sync or async.
+
+        Args:
+            get_response (callable): The next handler.
+        """
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Handle a request.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        if self.async_mode:
+            return self.__acall__(request)
+        timing = RequestTiming(request)
+        with timing.serving():
+            response = self.get_response(request)
+        return self.finish(request, response, timing)
+
+    async def __acall__(self, request):
+        """
+        Handle a request on the async path.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        timing = RequestTiming(request)
+        with timing.serving():
+            response = await self.get_response(request)
+        return self.finish(request, response, timing)
+
+    def finish(self, request, response, timing):
+        """
+        Record the request, or for a sync streaming response, record it once the body is sent.
+
+        Args:
+            request (HttpRequest): The request object.
+            response (HttpResponse): The response.
+            timing (RequestTiming): The timing of the request.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(response.streaming_content, request, response, timing)
+            return response
+        size = None if response.streaming else len(response.content)
+        record_request(request, response, timing, size)
+        return response
+
+    def stream(self, chunks, request, response, timing):
+        """
+        Pass the chunks of a sync streaming response on, timing their queries, and record the request once sent.
+
+        Args:
+            chunks (Iterable): The chunks of the body.
+            request (HttpRequest): The request object.
+            response (StreamingHttpResponse): The response.
+            timing (RequestTiming): The timing of the request.
+
+        Yields:
+            bytes: The chunks.
+        """
+        size = 0
+        iterator = iter(chunks)
+        with ExitStack() as stack:
+            stack.callback(lambda: record_request(request, response, timing, size))
+            while True:
+                with timing.serving():
+                    chunk = next(iterator, None)
+                if chunk is None:
+                    return
+                size += len(chunk)
+                yield chunk
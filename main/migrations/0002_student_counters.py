@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:19
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_counters(apps, schema_editor):
+    Student = apps.get_model('main', 'Student')
+    TaskStudent = apps.get_model('main', 'TaskStudent')
+    totals = TaskStudent.objects.order_by().values('student').annotate(
+        solved=Count('id'),
+        difficulty=Sum('task__difficulty'),
+    )
+    students = []
+    for row in totals:
+        solved, difficulty = row['solved'], row['difficulty'] or 0
+        students.append(Student(
+            id=row['student'],
+            solved_count=solved,
+            difficulty_sum=difficulty,
+            rating=round(difficulty / solved, 2),
+        ))
+    Student.objects.bulk_update(students, ['solved_count', 'difficulty_sum', 'rating'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='difficulty_sum',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='rating',
+            field=models.FloatField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='solved_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
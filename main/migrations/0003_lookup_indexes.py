@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_student_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['task_id', 'date_publication', 'id'], name='comment_task_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['date_publication', 'id'], name='comment_published_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['user', 'registration_date', 'id'], name='student_user_registered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['registration_date', 'id'], name='student_registered_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['name', 'id'], name='task_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskstudent',
+            index=models.Index(fields=['student', 'task'], name='taskstudent_student_task_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskstudent',
+            index=models.Index(fields=['task', 'id'], name='taskstudent_task_id_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+from django.db import migrations
+
+# The search indexes as they are at this migration. The DDL is built here rather than by main.search,
+# so later changes to that module do not change what this migration does.
+TOKENIZER = 'unicode61 remove_diacritics 2'
+INDEXES = (
+    ('main_task', ('name', 'description')),
+    ('main_comment', ('text_comment',)),
+    ('main_taskstudent', ('solution',)),
+)
+TRIGGERS = ('insert', 'delete', 'update')
+
+
+def drop_sql(table):
+    fts = f'{table}_fts'
+    triggers = [f'DROP TRIGGER IF EXISTS {fts}_{name}' for name in TRIGGERS]
+    return [*triggers, f'DROP TABLE IF EXISTS {fts}', f'DROP TABLE IF EXISTS {fts}_keys']
+
+
+def create_sql(table, columns):
+    fts = f'{table}_fts'
+    keys = f'{fts}_keys'
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    table_values = ', '.join(f'{table}.{column}' for column in columns)
+    changes = ', '.join(f'{column} = new.{column}' for column in columns)
+    new_key = f'(SELECT {keys}.id FROM {keys} WHERE pk = new.id)'
+    old_key = f'(SELECT {keys}.id FROM {keys} WHERE pk = old.id)'
+    return [
+        *drop_sql(table),
+        f'CREATE TABLE {keys} (id integer NOT NULL PRIMARY KEY, pk char(32) NOT NULL UNIQUE)',
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(pk UNINDEXED, {names}, tokenize='{TOKENIZER}')",
+        f'CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN '
+        f'INSERT INTO {keys}(pk) VALUES (new.id); '
+        f'INSERT INTO {fts}(rowid, pk, {names}) SELECT {keys}.id, pk, {new_values} FROM {keys} WHERE pk = new.id; END',
+        f'CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN '
+        f'DELETE FROM {fts} WHERE rowid = {old_key}; DELETE FROM {keys} WHERE pk = old.id; END',
+        f'CREATE TRIGGER {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN '
+        f'UPDATE {fts} SET {changes} WHERE rowid = {new_key}; END',
+        f'INSERT INTO {keys}(pk) SELECT {table}.id FROM {table}',
+        f'INSERT INTO {fts}(rowid, pk, {names}) SELECT {keys}.id, pk, {table_values} '
+        f'FROM {table} JOIN {keys} ON pk = {table}.id',
+    ]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in INDEXES:
+        for statement in create_sql(table, columns):
+            schema_editor.execute(statement)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _ in INDEXES:
+        for statement in drop_sql(table):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
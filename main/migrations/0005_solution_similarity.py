@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The signatures are computed by main.similarity rather than frozen here: the backfilled rows must match
+# what the running code computes for new solutions and looks up.
+from main.similarity import buckets, signature
+
+BACKFILL_CHUNK = 500
+
+
+def index_existing_solutions(apps, schema_editor):
+    TaskStudent = apps.get_model('main', 'TaskStudent')
+    SolutionSignature = apps.get_model('main', 'SolutionSignature')
+    SolutionBucket = apps.get_model('main', 'SolutionBucket')
+    solutions = TaskStudent.objects.order_by('pk').values_list('pk', 'task_id', 'solution')
+    chunk = list(solutions[:BACKFILL_CHUNK])
+    while chunk:
+        signatures = []
+        rows = []
+        for pk, task_id, text in chunk:
+            minhash = signature(text)
+            signatures.append(SolutionSignature(solution_id=pk, task_id=task_id, minhash=minhash.tobytes()))
+            rows.extend(
+                SolutionBucket(solution_id=pk, task_id=task_id, band=band, bucket=bucket)
+                for band, bucket in enumerate(buckets(minhash))
+            )
+        SolutionSignature.objects.bulk_create(signatures)
+        SolutionBucket.objects.bulk_create(rows)
+        chunk = list(solutions.filter(pk__gt=chunk[-1][0])[:BACKFILL_CHUNK])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolutionSignature',
+            fields=[
+                ('solution', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='main.taskstudent')),
+                ('minhash', models.BinaryField()),
+                ('task', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main.task')),
+            ],
+            options={
+                'verbose_name': 'SolutionSignature',
+                'verbose_name_plural': 'SolutionSignatures',
+            },
+        ),
+        migrations.CreateModel(
+            name='SolutionBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('solution', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.taskstudent')),
+                ('task', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main.task')),
+            ],
+            options={
+                'verbose_name': 'SolutionBucket',
+                'verbose_name_plural': 'SolutionBuckets',
+                'indexes': [models.Index(fields=['task', 'band', 'bucket'], name='solution_bucket_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_solutions, migrations.RunPython.noop),
+    ]
@@ -22,6 +22,9 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db import models
 
+ID = 'id'
+TASK = 'task'
+
 
 def validate_future_date(date_value):
     """
@@ -109,6 +112,9 @@ class Task(UUIDMixin, UserMixin):
         ordering = ['name']
         verbose_name = 'Task'
         verbose_name_plural = 'Tasks'
+        indexes = [
+            models.Index(fields=['name', ID], name='task_name_id_idx'),
+        ]
 
 
 class Student(UUIDMixin, UserMixin):
@@ -116,6 +122,9 @@ class Student(UUIDMixin, UserMixin):
     Model representing a student.
 
     Each student has a nickname and registration date, and is associated with multiple tasks.
+
+    The solve counters and the rating (the average difficulty of the solved tasks, rounded to 2 decimal places)
+    are denormalized columns kept up to date by the handlers in main.signals.
     """
 
     nickname = models.TextField(validators=[max_length])
@@ -123,6 +132,10 @@ class Student(UUIDMixin, UserMixin):
 
     tasks = models.ManyToManyField(Task, through='TaskStudent')
 
+    solved_count = models.IntegerField(default=0, editable=False)
+    difficulty_sum = models.IntegerField(default=0, editable=False)
+    rating = models.FloatField(default=0, editable=False, db_index=True)
+
     def __str__(self):
         """
         Return the nickname of the student.
@@ -136,18 +149,10 @@ class Student(UUIDMixin, UserMixin):
         ordering = ['registration_date']
         verbose_name = 'Student'
         verbose_name_plural = 'Students'
-
-    @property
-    def rating(self):
-        """
-        Calculate the average difficulty of the tasks associated with the student.
-
-        Returns:
-            float: The average difficulty of the tasks, rounded to 2 decimal places.
-        """
-        summ = [task.difficulty for task in self.tasks.all()]
-        len_tasks = len(self.tasks.all())
-        return round(sum(summ) / len_tasks, 2) if len_tasks > 0 else 0
+        indexes = [
+            models.Index(fields=['user', 'registration_date', ID], name='student_user_registered_idx'),
+            models.Index(fields=['registration_date', ID], name='student_registered_id_idx'),
+        ]
 
 
 class TaskStudent(UUIDMixin):
@@ -166,6 +171,10 @@ class TaskStudent(UUIDMixin):
         verbose_name = 'TaskStudent'
         verbose_name_plural = 'TaskStudents'
         unique_together = ('task', 'student')
+        indexes = [
+            models.Index(fields=['student', TASK], name='taskstudent_student_task_idx'),
+            models.Index(fields=[TASK, ID], name='taskstudent_task_id_idx'),
+        ]
 
 
 class Comment(UUIDMixin):
@@ -195,3 +204,43 @@ class Comment(UUIDMixin):
         ordering = ['date_publication']
         verbose_name = 'Comment'
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(fields=['task_id', 'date_publication', ID], name='comment_task_published_idx'),
+            models.Index(fields=['date_publication', ID], name='comment_published_id_idx'),
+        ]
+
+
+class SolutionSignature(models.Model):
+    """
+    Model representing the MinHash signature of a solution.
+
+    The signature and the LSH buckets of a solution are maintained by main.similarity.
+    """
+
+    solution = models.OneToOneField(TaskStudent, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    task = models.ForeignKey(Task, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    minhash = models.BinaryField()
+
+    class Meta:
+        verbose_name = 'SolutionSignature'
+        verbose_name_plural = 'SolutionSignatures'
+
+
+class SolutionBucket(models.Model):
+    """
+    Model representing one LSH band of a solution signature.
+
+    Solutions of a task sharing a bucket in the same band are candidate near-duplicates.
+    """
+
+    solution = models.ForeignKey(TaskStudent, on_delete=models.CASCADE, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = 'SolutionBucket'
+        verbose_name_plural = 'SolutionBuckets'
+        indexes = [
+            models.Index(fields=[TASK, 'band', 'bucket'], name='solution_bucket_idx'),
+        ]
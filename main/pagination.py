@@ -0,0 +1,307 @@
+"""
+This module contains the keyset (seek) pagination of the application.
+
+A page is selected with a WHERE clause on the model's Meta.ordering column plus the UUID id as a tie-breaker,
+never with OFFSET or COUNT(*), so reading page 10 000 costs the same as reading page 1.
+The position is passed between requests as an opaque base64 cursor.
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from collections import OrderedDict
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+INVALID_CURSOR = 'Invalid cursor'
+
+
+class Page(NamedTuple):
+    """A page of rows with the cursors of its neighbours."""
+
+    rows: list
+    next_cursor: str
+    previous_cursor: str
+
+
+class Keyset:
+    """
+    Seek pagination over the first Meta.ordering field of a model and its primary key.
+
+    Relations are ordered by their raw column, so ordering = ['task'] pages over task_id.
+    """
+
+    def __init__(self, model):
+        """
+        Resolve the ordering column of the model.
+
+        Args:
+            model (type): The model class.
+        """
+        ordering = model._meta.ordering[0]  # noqa: WPS437
+        self.descending = ordering.startswith('-')
+        self.field = model._meta.get_field(ordering.lstrip('-'))  # noqa: WPS437
+        self.column = self.field.attname
+
+    def order_by(self, reverse=False):
+        """
+        Return the ORDER BY clause of the keyset.
+
+        Args:
+            reverse (bool): Whether to walk backwards.
+
+        Returns:
+            tuple: The ordering expressions.
+        """
+        prefix = '' if self.descending == reverse else '-'
+        return (f'{prefix}{self.column}', f'{prefix}pk')
+
+    def encode(self, instance, reverse=False):
+        """
+        Build an opaque cursor pointing at a row.
+
+        Args:
+            instance (Model): The row.
+            reverse (bool): Whether the cursor walks backwards from the row.
+
+        Returns:
+            str: The cursor.
+        """
+        position = [str(getattr(instance, self.column)), str(instance.pk), int(reverse)]
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode(self, cursor):
+        """
+        Read the row position out of a cursor.
+
+        Args:
+            cursor (str): The cursor.
+
+        Returns:
+            tuple: The ordering value, the primary key and the direction.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            anchor, pk, reverse = json.loads(urlsafe_b64decode(cursor.encode()))
+        except (DecodeError, TypeError, ValueError) as error:
+            raise ValueError(INVALID_CURSOR) from error
+        try:
+            return self.field.to_python(anchor), str(pk), bool(reverse)
+        except ValidationError as invalid:
+            raise ValueError(INVALID_CURSOR) from invalid
+
+    def seek(self, queryset, cursor, size):
+        """
+        Restrict a queryset to the rows of one page plus one look-ahead row.
+
+        A malformed cursor raises ValueError.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            cursor (str): The cursor of the page, or None for the first page.
+            size (int): The page size.
+
+        Returns:
+            tuple: The sliced queryset and whether it walks backwards.
+        """
+        reverse = False
+        if cursor:
+            anchor, pk, reverse = self.decode(cursor)
+            lookup = 'gt' if self.descending == reverse else 'lt'
+            past_anchor = models.Q(**{f'{self.column}__{lookup}': anchor})
+            past_pk = models.Q(**{f'pk__{lookup}': pk})
+            from_anchor = models.Q(**{f'{self.column}__{lookup}e': anchor})
+            queryset = queryset.filter(from_anchor, past_anchor | past_pk)
+        return queryset.order_by(*self.order_by(reverse))[:size + 1], reverse
+
+    def paginate(self, queryset, cursor, size):
+        """
+        Fetch one page of a queryset.
+
+        A malformed cursor raises ValueError.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            cursor (str): The cursor of the page, or None for the first page.
+            size (int): The page size.
+
+        Returns:
+            Page: The page.
+        """
+        rows, reverse = self.seek(queryset, cursor, size)
+        return build_page(self, rows, cursor, reverse, size)
+
+    async def apaginate(self, queryset, cursor, size):
+        """
+        Fetch one page of a queryset with the async ORM.
+
+        A malformed cursor raises ValueError.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            cursor (str): The cursor of the page, or None for the first page.
+            size (int): The page size.
+
+        Returns:
+            Page: The page.
+        """
+        rows, reverse = self.seek(queryset, cursor, size)
+        return build_page(self, [row async for row in rows], cursor, reverse, size)
+
+
+def build_page(keyset, rows, cursor, reverse, size):
+    """
+    Build a page from the rows fetched by Keyset.seek().
+
+    Args:
+        keyset (Keyset): The keyset the rows were fetched with.
+        rows (list): The fetched rows.
+        cursor (str): The cursor the rows were fetched with.
+        reverse (bool): Whether the rows were fetched backwards.
+        size (int): The page size.
+
+    Returns:
+        Page: The rows in the display order and the cursors of the neighbour pages.
+    """
+    rows = list(rows)
+    has_more = len(rows) > size
+    shown = rows[:size]
+    if reverse:
+        shown.reverse()
+    more_before = has_more if reverse else bool(cursor)
+    next_cursor = None
+    previous_cursor = None
+    if shown and (has_more or reverse):
+        next_cursor = keyset.encode(shown[-1])
+    if shown and more_before:
+        previous_cursor = keyset.encode(shown[0], reverse=True)
+    return Page(shown, next_cursor, previous_cursor)
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination for the API viewsets built on Keyset."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_page_size(self, request):
+        """
+        Read the requested page size, capped by max_page_size.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            int: The page size.
+        """
+        default = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except ValueError:
+            size = default
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Fetch the page requested by the cursor.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            request (Request): The request object.
+            view (View): The view object.
+
+        Returns:
+            list: The rows of the page.
+
+        Raises:
+            NotFound: If the cursor is malformed.
+        """
+        self.base_url = request.build_absolute_uri()
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            self.current_page = Keyset(queryset.model).paginate(queryset, cursor, self.get_page_size(request))
+        except ValueError:
+            raise NotFound(INVALID_CURSOR)
+        return self.current_page.rows
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Fetch the page requested by the cursor with the async ORM.
+
+        Args:
+            queryset (QuerySet): The queryset to paginate.
+            request (Request): The request object.
+            view (View): The view object.
+
+        Returns:
+            list: The rows of the page.
+
+        Raises:
+            NotFound: If the cursor is malformed.
+        """
+        self.base_url = request.build_absolute_uri()
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            self.current_page = await Keyset(queryset.model).apaginate(queryset, cursor, self.get_page_size(request))
+        except ValueError:
+            raise NotFound(INVALID_CURSOR)
+        return self.current_page.rows
+
+    def get_link(self, cursor):
+        """
+        Build the absolute URL of a neighbour page.
+
+        Args:
+            cursor (str): The cursor of the page.
+
+        Returns:
+            str: The URL, or None if there is no such page.
+        """
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, serialized):
+        """
+        Wrap the serialized rows with the neighbour links.
+
+        Args:
+            serialized (list): The serialized rows.
+
+        Returns:
+            Response: The paginated response.
+        """
+        return Response(OrderedDict([
+            ('next', self.get_link(self.current_page.next_cursor)),
+            ('previous', self.get_link(self.current_page.previous_cursor)),
+            ('results', serialized),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        """
+        Describe the paginated response for the schema generators.
+
+        Args:
+            schema (dict): The schema of the rows.
+
+        Returns:
+            dict: The schema of the paginated response.
+        """
+        link = {'type': 'string', 'nullable': True, 'format': 'uri'}
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {'next': link, 'previous': link, 'results': schema},
+        }
@@ -0,0 +1,382 @@
+"""
+This module contains the on-demand profiling of single requests.
+
+A staff user, logged in or authenticated by a token, adds the profile query parameter or the X-Profile header
+to any request, and the request runs under cProfile with its SQL captured. The response is replaced by the report:
+profile=html (the default) renders an icicle view of the call tree, the slowest functions and every query
+with its duration, and profile=pstats downloads the stats for pstats, snakeviz or gprof2dot,
+with the query count and time in headers. The flag of other users is ignored.
+Requests without the flag only pay for the lookup of the flag.
+
+cProfile sees the thread it is enabled in, so on the async path it sees the coroutines of the event loop,
+those of concurrent requests included, but not the ORM threads; their queries are still captured.
+"""
+
+import cProfile
+import marshal
+from collections import defaultdict
+from pathlib import Path
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from rest_framework import exceptions
+
+from .authentication import CachedTokenAuthentication
+from .metrics import capture_statements, view_name
+
+PROFILE_PARAM = 'profile'
+PROFILE_HEADER = 'X-Profile'
+HTML = 'html'
+PSTATS = 'pstats'
+FORMATS = (HTML, PSTATS)
+TOP_FUNCTIONS = 40
+MAX_DEPTH = 40
+MIN_SHARE = 0.005
+
+authentication = CachedTokenAuthentication()
+
+
+def requested_format(request):
+    """
+    Read the profile format asked for by a request.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        str: HTML or PSTATS, or None for a request without the flag or with an unknown format.
+    """
+    flag = request.GET.get(PROFILE_PARAM, request.headers.get(PROFILE_HEADER))
+    if flag is None:
+        return None
+    output = flag or HTML
+    return output if output in FORMATS else None
+
+
+def is_staff(user):
+    """
+    Check whether a user may profile.
+
+    Args:
+        user (User): The user, possibly anonymous.
+
+    Returns:
+        bool: True for an active staff user.
+    """
+    return user is not None and user.is_active and user.is_staff
+
+
+def token_user(credentials):
+    """
+    Return the user of token credentials.
+
+    Args:
+        credentials (tuple): The user and the token, or None.
+
+    Returns:
+        User: The user, or None.
+    """
+    return credentials[0] if credentials else None
+
+
+class Report:
+    """The profile and the queries of a request, rendered as HTML or as a pstats file."""
+
+    def __init__(self, request, profiler, statements, elapsed):
+        """
+        Collect the results of a profiled request.
+
+        Args:
+            request (HttpRequest): The request object.
+            profiler (Profile): The disabled profiler.
+            statements (list): The SQL, the duration and the executemany flag of every query.
+            elapsed (float): The duration of the request in seconds.
+        """
+        profiler.create_stats()
+        self.stats = profiler.stats
+        self.request = request
+        self.statements = list(statements)
+        self.elapsed = elapsed
+        self.db_seconds = sum(statement[1] for statement in self.statements)
+        self.callees = defaultdict(list)
+        for callee, entry in self.stats.items():
+            for caller in entry[4]:
+                self.callees[caller].append(callee)
+
+    def response(self, output):
+        """
+        Build the response of the report.
+
+        Args:
+            output (str): HTML or PSTATS.
+
+        Returns:
+            HttpResponse: The report.
+        """
+        if output == PSTATS:
+            response = HttpResponse(marshal.dumps(self.stats), content_type='application/octet-stream')
+            stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+            response['Content-Disposition'] = f'attachment; filename="{view_name(self.request)}-{stamp}.prof"'
+        else:
+            response = HttpResponse(render_to_string('profile.html', self.context()))
+        response['X-Profile-Queries'] = str(len(self.statements))
+        response['X-Profile-Query-Time'] = f'{self.db_seconds * 1000:.2f}ms'
+        return response
+
+    def context(self):
+        """
+        Build the context of the HTML report.
+
+        Returns:
+            dict: The icicle, the slowest functions and the queries.
+        """
+        return {
+            'title': f'Профиль {self.request.method} {self.request.get_full_path()}',
+            'view': view_name(self.request),
+            'elapsed': self.elapsed * 1000,
+            'db_time': self.db_seconds * 1000,
+            'tree': self.tree(),
+            'functions': self.functions(),
+            'statements': [
+                {'sql': sql, 'time': duration * 1000, 'many': many} for sql, duration, many in self.statements
+            ],
+        }
+
+    def functions(self):
+        """
+        List the functions that took the most time, subcalls included.
+
+        Returns:
+            list: The rows of the table.
+        """
+        rows = []
+        for func, (_, calls, own, total, _) in self.stats.items():
+            rows.append({
+                'name': describe(func),
+                'calls': calls,
+                'own': own * 1000,
+                'total': total * 1000,
+            })
+        rows.sort(key=total_time, reverse=True)
+        return rows[:TOP_FUNCTIONS]
+
+    def tree(self):
+        """
+        Build the call tree of the icicle view from the caller-callee edges of the profile.
+
+        cProfile keeps the time of every edge, not of every path, so the time of a function called from
+        several places is shared between the paths in proportion to the edges, as snakeviz does,
+        and a path stops when it would follow an edge twice (the middleware chain calls itself).
+
+        Returns:
+            list: The root nodes.
+        """
+        roots = [func for func, entry in self.stats.items() if not entry[4]]
+        total = sum(self.stats[root][3] for root in roots) or 1
+        nodes = []
+        for root in roots:
+            node = self.node(root, self.stats[root][3], total, ())
+            if node['share'] >= MIN_SHARE:
+                node['width'] = node['share'] * 100
+                nodes.append(node)
+        nodes.sort(key=total_time, reverse=True)
+        return nodes
+
+    def node(self, func, seconds, total, path):
+        """
+        Build a node of the call tree and its children.
+
+        Args:
+            func (tuple): The function.
+            seconds (float): The time of the function on this path.
+            total (float): The time of the whole profile.
+            path (tuple): The caller-callee edges of the path, to stop at recursion.
+
+        Returns:
+            dict: The node.
+        """
+        share = seconds / total
+        node = {
+            'name': describe(func),
+            'file': func[0],
+            'time': seconds * 1000,
+            'share': share,
+            'children': [],
+        }
+        function_total = self.stats[func][3]
+        if len(path) >= MAX_DEPTH or not function_total:
+            return node
+        scale = seconds / function_total
+        for callee in self.callees[func]:
+            callers = self.stats[callee][4]
+            child_seconds = callers[func][3] * scale
+            if (func, callee) in path or child_seconds / total < MIN_SHARE:
+                continue
+            child = self.node(callee, child_seconds, total, (*path, (func, callee)))
+            child['width'] = child_seconds / seconds * 100
+            node['children'].append(child)
+        node['children'].sort(key=total_time, reverse=True)
+        return node
+
+
+def describe(func):
+    """
+    Name a profiled function.
+
+    Args:
+        func (tuple): The file, the line and the name of the function.
+
+    Returns:
+        str: The name with the file name and the line.
+    """
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({Path(filename).name}:{line})'
+
+
+def total_time(row):
+    """
+    Order functions and nodes by their time.
+
+    Args:
+        row (dict): The function or the node.
+
+    Returns:
+        float: The time.
+    """
+    return row.get('total', row.get('time'))
+
+
+def consume(response):
+    """
+    Read the body of a sync streaming response, so its generator is profiled too, and close the response.
+
+    Args:
+        response (HttpResponse): The profiled response.
+    """
+    if response.streaming and not response.is_async:
+        b''.join(response.streaming_content)
+    response.close()
+
+
+def serve(get_response, request):
+    """
+    Serve a profiled request; the root of its call tree.
+
+    Args:
+        get_response (callable): The next handler.
+        request (HttpRequest): The request object.
+    """
+    consume(get_response(request))
+
+
+async def aserve(get_response, request):
+    """
+    Serve a profiled request on the async path; the root of its call tree.
+
+    Args:
+        get_response (callable): The next handler.
+        request (HttpRequest): The request object.
+    """
+    consume(await get_response(request))
+
+
+class ProfilingMiddleware:
+    """Profile the requests of staff users that ask for it; place it after the authentication middleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Wrap the next handler, sync or async.
+
+        Args:
+            get_response (callable): The next handler.
+        """
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Handle a request, profiling it if asked to by a staff user.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response, or the report of a profiled request.
+        """
+        if self.async_mode:
+            return self.__acall__(request)
+        output = requested_format(request)
+        if output is None or not self.allowed(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        with capture_statements() as statements:
+            started = perf_counter()
+            with profiler:
+                serve(self.get_response, request)
+            report = Report(request, profiler, statements, perf_counter() - started)
+        return report.response(output)
+
+    async def __acall__(self, request):
+        """
+        Handle a request on the async path, profiling it if asked to by a staff user.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response, or the report of a profiled request.
+        """
+        output = requested_format(request)
+        if output is None or not await self.aallowed(request):
+            return await self.get_response(request)
+        profiler = cProfile.Profile()
+        with capture_statements() as statements:
+            started = perf_counter()
+            with profiler:
+                await aserve(self.get_response, request)
+            report = Report(request, profiler, statements, perf_counter() - started)
+        return report.response(output)
+
+    def allowed(self, request):
+        """
+        Check whether the user of the session or of the token is staff.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            bool: True if the request may be profiled.
+        """
+        if is_staff(request.user):
+            return True
+        try:
+            return is_staff(token_user(authentication.authenticate(request)))
+        except exceptions.AuthenticationFailed:
+            return False
+
+    async def aallowed(self, request):
+        """
+        Check whether the user of the session or of the token is staff, on the async path.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            bool: True if the request may be profiled.
+        """
+        if is_staff(await request.auser()):
+            return True
+        try:
+            return is_staff(token_user(await authentication.aauthenticate(request)))
+        except exceptions.AuthenticationFailed:
+            return False
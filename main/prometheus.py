@@ -0,0 +1,288 @@
+"""
+This module contains the counters of the request metrics and their Prometheus text exposition format.
+
+Every thread records into its own shard, so recording takes no lock; the shards are only merged when scraped.
+With METRICS_DIR set, every process also writes its merged counters to a file of its own in that directory
+at most every FLUSH_SECONDS, and a scrape adds up the files of all processes, so any worker can serve the totals.
+The files of stopped processes are kept, since the counters of Prometheus must never go down.
+"""
+
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from pathlib import Path
+from time import monotonic, time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from django.conf import settings
+
+FLUSH_SECONDS = 1.0
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+HISTOGRAM = 'histogram'
+COUNTER = 'counter'
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+LABEL_ESCAPES = str.maketrans({'\\': r'\\', '"': r'\"', '\n': r'\n'})
+
+
+class Metric(NamedTuple):
+    """A metric: its name, type, description and, for a histogram, the upper bounds of the buckets."""
+
+    name: str
+    kind: str
+    help: str
+    buckets: tuple = ()
+
+
+REQUEST_DURATION = Metric('http_request_duration_seconds', HISTOGRAM, 'Request latency.', SECONDS_BUCKETS)
+DB_QUERIES = Metric('http_request_db_queries', HISTOGRAM, 'Database queries per request.', QUERY_BUCKETS)
+DB_DURATION = Metric('http_request_db_duration_seconds', HISTOGRAM, 'Database time per request.', SECONDS_BUCKETS)
+TEMPLATE_DURATION = Metric(
+    'http_request_template_duration_seconds', HISTOGRAM, 'Template render time per request.', SECONDS_BUCKETS,
+)
+RESPONSE_SIZE = Metric('http_response_size_bytes', HISTOGRAM, 'Response body size.', SIZE_BUCKETS)
+RESPONSES = Metric('http_responses_total', COUNTER, 'Responses by status code.')
+METRICS = MappingProxyType({
+    metric.name: metric
+    for metric in (REQUEST_DURATION, DB_QUERIES, DB_DURATION, TEMPLATE_DURATION, RESPONSE_SIZE, RESPONSES)
+})
+
+
+class MetricsStore:
+    """The counters of a process, sharded by thread, with optional files shared by the processes."""
+
+    def __init__(self):
+        """Create an empty store."""
+        self.reset()
+
+    def reset(self):
+        """Drop the counters and the locks, as a forked process must, since they belong to its parent."""
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed = 0
+        self._name = f'{os.getpid()}-{time():.0f}.json'
+
+    def series(self, metric, labels):
+        """
+        Return the values of a series in the shard of the current thread.
+
+        Args:
+            metric (Metric): The metric.
+            labels (tuple): The label names and values.
+
+        Returns:
+            list: The count of every bucket and the sum for a histogram, or the count for a counter.
+        """
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.append(shard)
+        key = (metric.name, labels)
+        if key not in shard:
+            size = len(metric.buckets) + 2 if metric.kind == HISTOGRAM else 1
+            shard[key] = [0 for _ in range(size)]
+        return shard[key]
+
+    def record(self, metric, labels, amount=1):
+        """
+        Add an observation to a histogram, or an amount to a counter.
+
+        Args:
+            metric (Metric): The metric.
+            labels (tuple): The label names and values.
+            amount (float): The observed value, or what to add to the counter.
+        """
+        series = self.series(metric, labels)
+        if metric.kind == COUNTER:
+            series[0] += amount
+            return
+        series[bisect_left(metric.buckets, amount)] += 1
+        series[-1] += amount
+
+    def snapshot(self):
+        """
+        Add up the shards of all threads.
+
+        A shard may change while it is read; its copy is taken at once, so an observation is at worst missed.
+
+        Returns:
+            dict: The values of every series.
+        """
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged = {}
+        for shard in shards:
+            for key, series in dict(shard).items():
+                merge_series(merged, key, list(series))
+        return merged
+
+    def flush(self, directory, force=False):
+        """
+        Write the counters of the process to its file, at most every FLUSH_SECONDS unless forced.
+
+        Args:
+            directory (str): The directory shared by the processes.
+            force (bool): Whether to write even if the file is recent.
+        """
+        if not force and monotonic() - self._flushed < FLUSH_SECONDS:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        with ExitStack() as stack:
+            stack.callback(self._flush_lock.release)
+            self._flushed = monotonic()
+            rows = [
+                [name, [list(label) for label in labels], series]
+                for (name, labels), series in self.snapshot().items()
+            ]
+            path = Path(directory) / self._name
+            partial = path.with_suffix('.partial')
+            partial.write_text(json.dumps(rows))
+            os.replace(partial, path)
+
+    def collect(self):
+        """
+        Add up the counters of this process or, with METRICS_DIR set, of every process.
+
+        Returns:
+            dict: The values of every series.
+        """
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return self.snapshot()
+        self.flush(directory, force=True)
+        merged = {}
+        for path in Path(directory).glob('*.json'):
+            try:
+                rows = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name, labels, series in rows:
+                merge_series(merged, (name, tuple(tuple(label) for label in labels)), series)
+        return merged
+
+
+def merge_series(merged, key, series):
+    """
+    Add the values of a series to the merged values.
+
+    Args:
+        merged (dict): The merged values of every series.
+        key (tuple): The metric name and the labels.
+        series (list): The values to add.
+    """
+    total = merged.get(key)
+    if total is None:
+        merged[key] = series
+        return
+    for index, amount in enumerate(series):
+        total[index] += amount
+
+
+metrics = MetricsStore()
+os.register_at_fork(after_in_child=metrics.reset)
+
+
+def format_label(name, label):
+    """
+    Format a label, escaping its value.
+
+    Args:
+        name (str): The label name.
+        label (object): The label value.
+
+    Returns:
+        str: The label.
+    """
+    escaped = str(label).translate(LABEL_ESCAPES)
+    return f'{name}="{escaped}"'
+
+
+def format_labels(labels):
+    """
+    Format labels for the exposition format.
+
+    Args:
+        labels (tuple): The label names and values.
+
+    Returns:
+        str: The labels in braces, or nothing without labels.
+    """
+    if not labels:
+        return ''
+    pairs = ','.join(format_label(*label) for label in labels)
+    return f'{{{pairs}}}'
+
+
+def metric_lines(metric, labelled_series):
+    """
+    Render the series of a metric.
+
+    Args:
+        metric (Metric): The metric.
+        labelled_series (list): The labels and the values of every series of the metric.
+
+    Returns:
+        list: The lines of the exposition.
+    """
+    lines = [f'# HELP {metric.name} {metric.help}']
+    lines.append(f'# TYPE {metric.name} {metric.kind}')
+    for labels, series in sorted(labelled_series):
+        if metric.kind == COUNTER:
+            lines.append(f'{metric.name}{format_labels(labels)} {series[0]}')
+        else:
+            lines.extend(histogram_lines(metric, labels, series))
+    return lines
+
+
+def histogram_lines(metric, labels, series):
+    """
+    Render a series of a histogram: its cumulative buckets, its sum and its count.
+
+    Args:
+        metric (Metric): The histogram.
+        labels (tuple): The label names and values.
+        series (list): The count of every bucket and the sum.
+
+    Returns:
+        list: The lines of the exposition.
+    """
+    name = metric.name
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*metric.buckets, '+Inf'), series):
+        cumulative += count
+        bucket_labels = format_labels((*labels, ('le', bound)))
+        lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+    formatted = format_labels(labels)
+    lines.append(f'{name}_sum{formatted} {series[-1]}')
+    lines.append(f'{name}_count{formatted} {cumulative}')
+    return lines
+
+
+def exposition(counters):
+    """
+    Render counters in the Prometheus text exposition format.
+
+    Args:
+        counters (dict): The values of every series.
+
+    Returns:
+        str: The exposition.
+    """
+    by_metric = {}
+    for (name, labels), series in counters.items():
+        by_metric.setdefault(name, []).append((labels, series))
+    lines = []
+    for metric in METRICS.values():
+        lines.extend(metric_lines(metric, by_metric.get(metric.name, ())))
+    lines.append('')
+    return '\n'.join(lines)
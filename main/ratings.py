@@ -0,0 +1,102 @@
+"""
+This module maintains the denormalized solve counters of students.
+
+Student.solved_count, Student.difficulty_sum and Student.rating are shifted incrementally
+by a single UPDATE whenever a solution or a task difficulty changes,
+and can be rebuilt from scratch with one GROUP BY over the task-student table.
+"""
+
+from django.db import models
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+from .models import Student, Task, TaskStudent
+
+SOLVED_COUNT = 'solved_count'
+DIFFICULTY_SUM = 'difficulty_sum'
+COUNTER_FIELDS = (SOLVED_COUNT, DIFFICULTY_SUM, 'rating')
+RATING_PRECISION = 2
+
+
+def rating_expression(difficulty_sum, solved_count):
+    """
+    Build the SQL expression of the student rating.
+
+    Args:
+        difficulty_sum (Expression): The total difficulty of the solved tasks.
+        solved_count (Expression): The number of the solved tasks.
+
+    Returns:
+        Expression: The average difficulty rounded to 2 decimal places, or 0 if nothing is solved.
+    """
+    average = Cast(difficulty_sum, models.FloatField()) / NullIf(solved_count, 0)
+    return Coalesce(Round(average, RATING_PRECISION), models.Value(0), output_field=models.FloatField())
+
+
+def task_difficulty(task_id):
+    """
+    Build a subquery that reads the difficulty of a task.
+
+    Args:
+        task_id (UUID): The id of the task.
+
+    Returns:
+        Expression: The difficulty of the task, or 0 if the task does not exist anymore.
+    """
+    difficulty = Task.objects.filter(pk=task_id).values('difficulty')[:1]
+    return Coalesce(models.Subquery(difficulty), models.Value(0))
+
+
+def apply_solution_delta(students, solved_delta, difficulty_delta):
+    """
+    Shift the counters of the given students in a single UPDATE.
+
+    Args:
+        students (QuerySet): The students to update.
+        solved_delta (int): The change of the number of the solved tasks.
+        difficulty_delta (int or Expression): The change of the total difficulty.
+
+    Returns:
+        int: The number of updated students.
+    """
+    solved_count = models.F(SOLVED_COUNT) + solved_delta
+    difficulty_sum = models.F(DIFFICULTY_SUM) + difficulty_delta
+    return students.update(
+        solved_count=solved_count,
+        difficulty_sum=difficulty_sum,
+        rating=rating_expression(difficulty_sum, solved_count),
+    )
+
+
+def rebuild_ratings(student_ids=None, batch_size=1000):
+    """
+    Recalculate the counters of students from the task-student table.
+
+    All totals are read with one GROUP BY query and only the students whose counters differ are written,
+    then the ratings are recalculated by the database in one UPDATE.
+
+    Args:
+        student_ids (Iterable, optional): The ids of the students to rebuild. All students by default.
+        batch_size (int): The number of students written per UPDATE batch.
+
+    Returns:
+        int: The number of students whose counters were fixed.
+    """
+    students = Student.objects.only('id', SOLVED_COUNT, DIFFICULTY_SUM).order_by()
+    totals = TaskStudent.objects.order_by().values('student')
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        students = students.filter(id__in=student_ids)
+        totals = totals.filter(student__in=student_ids)
+    totals = totals.annotate(solved=models.Count('id'), difficulty=models.Sum('task__difficulty'))
+    counters = {row['student']: (row['solved'], row['difficulty'] or 0) for row in totals}
+
+    changed = []
+    for student in students.iterator(chunk_size=batch_size):
+        solved, difficulty = counters.get(student.id, (0, 0))
+        if (solved, difficulty) != (student.solved_count, student.difficulty_sum):
+            student.solved_count = solved
+            student.difficulty_sum = difficulty
+            changed.append(student)
+    Student.objects.bulk_update(changed, [SOLVED_COUNT, DIFFICULTY_SUM], batch_size=batch_size)
+    apply_solution_delta(students, 0, 0)
+    return len(changed)
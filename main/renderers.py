@@ -0,0 +1,162 @@
+"""
+This module contains the renderers and the parsers of the API.
+
+JSON is encoded and decoded with orjson, which handles UUIDs and dates natively and renders what
+the JSON renderer of DRF renders: compact UTF-8 without a charset parameter. orjson is optional too:
+without it the settings register the JSON renderer and parser of DRF instead. Internal services may ask
+for MessagePack with Accept: application/msgpack and send it with Content-Type: application/msgpack;
+msgpack is optional and the settings only register its renderer and parser when it is installed.
+Values neither format handles natively are converted the way the JSON encoder of DRF converts them.
+The async views render their JSON responses with json_response().
+"""
+
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.http import HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+orjson = import_module('orjson') if find_spec('orjson') else None
+msgpack = import_module('msgpack') if find_spec('msgpack') else None
+
+MSGPACK = 'application/msgpack'
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z if orjson else 0
+encoder = JSONEncoder()
+
+
+def encode_default(unencoded):
+    """
+    Convert a value the encoders do not handle natively, such as a lazy string or a Decimal.
+
+    Args:
+        unencoded (object): The value.
+
+    Returns:
+        object: What the JSON encoder of DRF converts the value to.
+    """
+    return encoder.default(unencoded)
+
+
+class OrjsonRenderer(BaseRenderer):
+    """Render JSON with orjson."""
+
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):  # noqa: WPS110
+        """
+        Render data.
+
+        Args:
+            data (object): The data.
+            accepted_media_type (str): The accepted media type, indented if it has an indent parameter.
+            renderer_context (dict): The context of the view.
+
+        Returns:
+            bytes: The JSON, empty for no data.
+        """
+        if data is None:
+            return b''
+        options = ORJSON_OPTIONS
+        if 'indent=' in (accepted_media_type or '') or (renderer_context or {}).get('indent'):
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=encode_default, option=options)
+
+
+class OrjsonParser(BaseParser):
+    """Parse JSON with orjson."""
+
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parse a request body.
+
+        Args:
+            stream (IO): The body.
+            media_type (str): The media type of the body.
+            parser_context (dict): The context of the view.
+
+        Returns:
+            object: The data.
+
+        Raises:
+            ParseError: If the body is not JSON.
+        """
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as error:
+            raise ParseError(f'JSON parse error - {error}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render MessagePack."""
+
+    media_type = MSGPACK
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):  # noqa: WPS110
+        """
+        Render data.
+
+        Args:
+            data (object): The data.
+            accepted_media_type (str): The accepted media type.
+            renderer_context (dict): The context of the view.
+
+        Returns:
+            bytes: The MessagePack, empty for no data.
+        """
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Parse MessagePack."""
+
+    media_type = MSGPACK
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """
+        Parse a request body.
+
+        Args:
+            stream (IO): The body.
+            media_type (str): The media type of the body.
+            parser_context (dict): The context of the view.
+
+        Returns:
+            object: The data.
+
+        Raises:
+            ParseError: If the body is not MessagePack.
+        """
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as error:
+            raise ParseError(f'MessagePack parse error - {error}')
+
+
+def json_response(payload, status_code=status.HTTP_200_OK):
+    """
+    Render data outside of a DRF view the way the JSON renderer of the API does.
+
+    Args:
+        payload (object): The data.
+        status_code (int): The status code.
+
+    Returns:
+        HttpResponse: The response.
+    """
+    renderer = OrjsonRenderer() if orjson else JSONRenderer()
+    response = HttpResponse(renderer.render(payload), content_type='application/json', status=status_code)
+    response['Vary'] = 'Accept'
+    return response
@@ -0,0 +1,319 @@
+"""
+This module contains the routing of the database queries between the primary database and its read replicas.
+
+The middleware lets the reads of GET and HEAD requests (the HTML pages and the list and retrieve actions of the API)
+go to a replica picked at random, and keeps every write, every read of a request that writes
+and every read outside of a request (commands, the shell) on the primary.
+A client that wrote is pinned to the primary for REPLICA_STICKY_SECONDS afterwards, so it reads its own writes
+while the replicas catch up: browsers through a cookie and token clients through a cache entry
+keyed by their Authorization header (shared between processes only with a shared cache, see CACHE_DIR).
+Sessions and tokens are always read from the primary, since a login has to work on the very next request.
+The version counters of main.versions are bumped on the primary, so a replica may hold rows older than them:
+whatever a request builds from replica rows is not cached under those versions (see read_replica)
+and its response gets no ETag or Last-Modified.
+
+The replicas listed in REPLICA_DATABASES are stand-ins for real replication: read-only connections to copies
+of the SQLite file of the primary, refreshed by sync_replica (the sync_replicas command runs it periodically).
+"""
+
+import os
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from hashlib import sha256
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.transaction import TransactionManagementError
+
+PRIMARY = DEFAULT_DB_ALIAS
+PRIMARY_APPS = frozenset(('sessions', 'authtoken'))
+READ_METHODS = frozenset(('GET', 'HEAD'))
+STICKY_COOKIE = 'primary_reads'
+ETAG = 'ETag'
+LAST_MODIFIED = 'Last-Modified'
+NOT_MODIFIED = 304
+
+
+class Routing:
+    """The routing state of a request: whether its reads may go to a replica and whether it wrote."""
+
+    def __init__(self, replica_reads):
+        """
+        Start routing a request.
+
+        Args:
+            replica_reads (bool): Whether the reads of the request may go to a replica.
+        """
+        self.replica_reads = replica_reads
+        self.wrote = False
+        self.used_replica = False
+
+
+_routing = ContextVar('routing', default=None)
+
+
+def replica_aliases():
+    """
+    Return the aliases of the read replicas.
+
+    Returns:
+        list: The aliases from the REPLICA_DATABASES setting.
+    """
+    return list(getattr(settings, 'REPLICA_DATABASES', ()))
+
+
+class PrimaryReplicaRouter:
+    """Send the reads allowed by the request to a replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        """
+        Choose the database of a read.
+
+        Args:
+            model (type): The model read.
+            hints (dict): The routing hints.
+
+        Returns:
+            str: The alias of a replica, or of the primary.
+        """
+        routing = _routing.get()
+        replicas = replica_aliases()
+        if routing is None or not routing.replica_reads or routing.wrote or not replicas:
+            return PRIMARY
+        if model._meta.app_label in PRIMARY_APPS:  # noqa: WPS437
+            return PRIMARY
+        routing.used_replica = True
+        return random.choice(replicas)  # noqa: S311
+
+    def db_for_write(self, model, **hints):
+        """
+        Choose the database of a write, and keep the rest of the request on the primary.
+
+        Args:
+            model (type): The model written.
+            hints (dict): The routing hints.
+
+        Returns:
+            str: The alias of the primary.
+        """
+        routing = _routing.get()
+        if routing is not None:
+            routing.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Allow relations between objects read from any of the databases, since they hold the same rows.
+
+        Args:
+            obj1 (Model): The first object.
+            obj2 (Model): The second object.
+            hints (dict): The routing hints.
+
+        Returns:
+            bool: True.
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Keep the migrations off the replicas, which are copies of the migrated primary.
+
+        Args:
+            db (str): The database alias.
+            app_label (str): The label of the migrated app.
+            model_name (str): The name of the migrated model.
+            hints (dict): The routing hints.
+
+        Returns:
+            bool: False for a replica, None to let the other routers decide.
+        """
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def read_replica():
+    """
+    Check whether the current request read from a replica.
+
+    Returns:
+        bool: True if a read of the request went to a replica, whose rows may be older than the version counters.
+    """
+    routing = _routing.get()
+    return routing is not None and routing.used_replica
+
+
+def sticky_key(request):
+    """
+    Build the cache key pinning a token client to the primary.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        str: The key, or None for a request without an Authorization header.
+    """
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return None
+    return f'primary:{sha256(authorization.encode()).hexdigest()}'
+
+
+def is_sticky(request):
+    """
+    Check whether the client of a request wrote recently.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        bool: True if the client is pinned to the primary.
+    """
+    if STICKY_COOKIE in request.COOKIES:
+        return True
+    key = sticky_key(request)
+    return key is not None and cache.get(key) is not None
+
+
+def stick(request, response):
+    """
+    Pin the client of a request that wrote to the primary for REPLICA_STICKY_SECONDS.
+
+    Args:
+        request (HttpRequest): The request object.
+        response (HttpResponse): The response.
+    """
+    timeout = settings.REPLICA_STICKY_SECONDS
+    response.set_cookie(STICKY_COOKIE, '1', max_age=timeout, httponly=True, samesite='Lax')
+    key = sticky_key(request)
+    if key is not None:
+        cache.set(key, value=True, timeout=timeout)
+
+
+class ReplicaRoutingMiddleware:
+    """Route the reads of each request and pin the clients that wrote to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """
+        Wrap the next handler, sync or async.
+
+        Args:
+            get_response (callable): The next handler.
+        """
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """
+        Handle a request.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        if self.async_mode:
+            return self.__acall__(request)
+        with self.route(request) as routing:
+            return self.finish(request, self.get_response(request), routing)
+
+    async def __acall__(self, request):
+        """
+        Handle a request on the async path.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        with self.route(request) as routing:
+            return self.finish(request, await self.get_response(request), routing)
+
+    @contextmanager
+    def route(self, request):
+        """
+        Decide where the reads of a request go, for the duration of its handling.
+
+        Args:
+            request (HttpRequest): The request object.
+
+        Yields:
+            Routing: The routing state of the request.
+        """
+        routing = Routing(request.method in READ_METHODS and not is_sticky(request))
+        token = _routing.set(routing)
+        try:
+            yield routing
+        finally:
+            _routing.reset(token)
+
+    def finish(self, request, response, routing):
+        """
+        Pin the client to the primary if the request wrote, and drop the validators of a response read from a replica.
+
+        Args:
+            request (HttpRequest): The request object.
+            response (HttpResponse): The response.
+            routing (Routing): The routing state of the request.
+
+        Returns:
+            HttpResponse: The response.
+        """
+        if routing.wrote or request.method not in READ_METHODS:
+            stick(request, response)
+        if routing.used_replica and response.status_code != NOT_MODIFIED:
+            response.headers.pop(ETAG, None)
+            response.headers.pop(LAST_MODIFIED, None)
+        return response
+
+
+def copy_primary(path):
+    """
+    Replace a file with a consistent copy of the primary.
+
+    The copy is written next to the file with the SQLite backup API and moved over it,
+    so connections opened before keep reading the previous copy and the next ones read the new copy.
+
+    Args:
+        path (str): The path of the copy.
+
+    Raises:
+        TransactionManagementError: If the primary connection is in a transaction, which would block the backup.
+    """
+    partial = f'{path}.partial'
+    primary = connections[PRIMARY]
+    if primary.in_atomic_block:
+        raise TransactionManagementError('Cannot copy the primary inside a transaction')
+    primary.ensure_connection()
+    with closing(sqlite3.connect(partial)) as target:
+        primary.connection.backup(target)
+    os.replace(partial, path)
+
+
+def sync_replica(alias):
+    """
+    Replace a replica with a copy of the primary.
+
+    Args:
+        alias (str): The alias of the replica, whose NAME may be a plain path or a file: URI.
+
+    Returns:
+        str: The path of the replica.
+    """
+    name = str(settings.DATABASES[alias]['NAME'])
+    path = urlsplit(name).path if name.startswith('file:') else name
+    copy_primary(path)
+    return path
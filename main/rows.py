@@ -0,0 +1,345 @@
+"""
+This module contains the fast serialization of the API lists.
+
+A page of a list is read with values_list() and every row is turned into the dict the ModelSerializer
+of the viewset renders by a function compiled once per serializer and set of fields, so no model instance
+is built and no serializer field is bound or looked up per row. The function keeps the database values
+the fields render unchanged (text, integers, foreign key ids) and passes the others (UUIDs, dates, floats)
+through the to_representation of their field. The ids of a many-to-many field are read for the whole page
+with one query, in the ordering of the related model like the prefetch of the serializer path,
+so the rendered JSON is the same byte for byte. A serializer with fields the rows cannot render,
+such as expanded relations, keeps the serializer path.
+"""
+
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .pagination import Keyset
+
+# Fields rendering the database value unchanged.
+VERBATIM_FIELDS = (serializers.ReadOnlyField, serializers.CharField, serializers.IntegerField)
+ROW_FUNCTION = 'row_to_dict'
+# Plans kept, one per serializer and set of requested fields.
+ROW_PLANS = 256
+
+
+class RowPlan(NamedTuple):
+    """How to read and render the rows of a serializer."""
+
+    lookups: tuple
+    many: tuple
+    to_dict: object
+
+    def related_rows(self, pks):
+        """
+        Build the queries of the ids of the many-to-many fields of the rows of a page.
+
+        Args:
+            pks (list): The primary keys of the rows.
+
+        Returns:
+            list: The queryset of the primary key and the related id pairs of every field.
+        """
+        return [
+            model._default_manager.filter(**{f'{query_name}__in': pks}).values_list(query_name, 'pk')  # noqa: WPS437
+            for query_name, model in self.many
+        ]
+
+    def related_ids(self, pks):
+        """
+        Read the ids of the many-to-many fields of the rows of a page, one query per field.
+
+        Args:
+            pks (list): The primary keys of the rows.
+
+        Returns:
+            list: The ids of every field by primary key.
+        """
+        related = []
+        for rows in self.related_rows(pks):
+            ids = {}
+            for pk, related_pk in rows:
+                ids.setdefault(pk, []).append(related_pk)
+            related.append(ids)
+        return related
+
+    async def arelated_ids(self, pks):
+        """
+        Read the ids of the many-to-many fields of the rows of a page with the async ORM.
+
+        Args:
+            pks (list): The primary keys of the rows.
+
+        Returns:
+            list: The ids of every field by primary key.
+        """
+        related = []
+        for rows in self.related_rows(pks):
+            ids = {}
+            async for pk, related_pk in rows:
+                ids.setdefault(pk, []).append(related_pk)
+            related.append(ids)
+        return related
+
+    def render(self, rows, related):
+        """
+        Render rows.
+
+        Args:
+            rows (list): The rows read with the lookups.
+            related (list): The ids of the many-to-many fields by primary key.
+
+        Returns:
+            list: The dicts the serializer renders.
+        """
+        to_dict = self.to_dict
+        return [to_dict(row, related) for row in rows]
+
+
+def resolve(model, source):
+    """
+    Resolve the source of a serializer field to a values() lookup.
+
+    Args:
+        model (type): The model of the serializer.
+        source (str): The dotted source, such as user.username.
+
+    Returns:
+        tuple: The lookup and the model field it ends on, or None if the source is not a chain of columns.
+    """
+    path = source.split('.')
+    model_field = None
+    for depth, name in enumerate(path):
+        try:
+            model_field = model._meta.get_field(name)  # noqa: WPS437
+        except FieldDoesNotExist:
+            return None
+        if model_field.many_to_many or model_field.one_to_many:
+            return None
+        if depth < len(path) - 1:
+            if not model_field.is_relation:
+                return None
+            model = model_field.related_model
+    return '__'.join(path), model_field
+
+
+def compile_row(entries, converters):
+    """
+    Compile the function building the dict of a row.
+
+    Args:
+        entries (list): The key and the Python expression of every item of the dict, in order.
+        converters (list): The to_representation methods the expressions call as convert[index].
+
+    Returns:
+        callable: The function taking the row and the ids of the many-to-many fields.
+    """
+    pairs = ', '.join(f'{key!r}: {expression}' for key, expression in entries)
+    source = f'def {ROW_FUNCTION}(row, related):\n    return {{{pairs}}}\n'
+    namespace = {'convert': tuple(converters)}
+    exec(compile(source, f'<{ROW_FUNCTION}>', 'exec'), namespace)  # noqa: S102, WPS421
+    return namespace[ROW_FUNCTION]
+
+
+class PlanBuilder:
+    """The lookups, the dict items, the converters and the many-to-many fields of a row plan being built."""
+
+    def __init__(self, model):
+        """
+        Start with the primary key and the ordering column, which the pagination reads.
+
+        Args:
+            model (type): The model of the serializer.
+        """
+        self.model = model
+        self.lookups = ['pk', Keyset(model).column]
+        self.entries = []
+        self.converters = []
+        self.many = []
+
+    def add(self, name, field):
+        """
+        Add a field of the serializer.
+
+        Args:
+            name (str): The name of the field.
+            field (Field): The serializer field.
+
+        Returns:
+            bool: Whether the rows can render the field.
+        """
+        if isinstance(field, serializers.ManyRelatedField):
+            return self.add_many(name, field)
+        if isinstance(field, serializers.BaseSerializer) or field.source == '*':
+            return False
+        resolved = resolve(self.model, field.source)
+        if resolved is None:
+            # The serializer skips a field missing from its objects.
+            return not field.required
+        return self.add_column(name, field, *resolved)
+
+    def add_many(self, name, field):
+        """
+        Add a many-to-many field rendered as the ids of the related objects.
+
+        Args:
+            name (str): The name of the field.
+            field (ManyRelatedField): The serializer field.
+
+        Returns:
+            bool: Whether the rows can render the field.
+        """
+        child = field.child_relation
+        if not isinstance(child, serializers.PrimaryKeyRelatedField) or child.pk_field:
+            return False
+        model_field = self.model._meta.get_field(field.source)  # noqa: WPS437
+        self.entries.append((name, f'related[{len(self.many)}].get(row[0], [])'))
+        self.many.append((model_field.related_query_name(), model_field.related_model))
+        return True
+
+    def add_column(self, name, field, lookup, model_field):
+        """
+        Add a field rendered from a column of the rows.
+
+        Args:
+            name (str): The name of the field.
+            field (Field): The serializer field.
+            lookup (str): The values() lookup of the column.
+            model_field (Field): The model field the lookup ends on.
+
+        Returns:
+            bool: Whether the rows can render the field.
+        """
+        primary_key = isinstance(field, serializers.PrimaryKeyRelatedField) and not field.pk_field
+        if model_field.is_relation and not primary_key:
+            return False
+        if lookup == self.model._meta.pk.name:  # noqa: WPS437
+            lookup = 'pk'
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        column = f'row[{self.lookups.index(lookup)}]'
+        if primary_key or isinstance(field, VERBATIM_FIELDS):
+            self.entries.append((name, column))
+            return True
+        converted = f'convert[{len(self.converters)}]({column})'
+        self.entries.append((name, f'None if {column} is None else {converted}'))
+        self.converters.append(field.to_representation)
+        return True
+
+    def plan(self):
+        """
+        Compile the plan.
+
+        Returns:
+            RowPlan: The plan.
+        """
+        return RowPlan(tuple(self.lookups), tuple(self.many), compile_row(self.entries, self.converters))
+
+
+@lru_cache(maxsize=None)
+def declared_fields(serializer_class):
+    """
+    List the fields of a serializer in the order it declares them.
+
+    Args:
+        serializer_class (type): The model serializer.
+
+    Returns:
+        tuple: The names of the fields.
+    """
+    return tuple(serializer_class().fields)
+
+
+@lru_cache(maxsize=ROW_PLANS)
+def row_plan(serializer_class, fields=None):
+    """
+    Plan the fast serialization of a serializer and a set of fields.
+
+    Args:
+        serializer_class (type): The model serializer, with SparseFieldsMixin.
+        fields (tuple, optional): The requested fields, in the order of declared_fields(). All fields by default.
+
+    Returns:
+        RowPlan: The plan, or None if a field cannot be rendered from rows.
+    """
+    serializer = serializer_class(fields=fields)
+    builder = PlanBuilder(serializer.Meta.model)
+    for name, field in serializer.fields.items():
+        if not builder.add(name, field):
+            return None
+    return builder.plan()
+
+
+def sparse_plan(serializer_class, sparse):
+    """
+    Return the row plan of a list with the requested fields.
+
+    The serializer renders the fields in the order it declares them whatever the order of the request,
+    so the requested fields are put in that order and every order of a set of fields shares a plan.
+
+    Args:
+        serializer_class (type): The serializer of the list.
+        sparse (dict): The requested fields and expanded relations, empty for all fields.
+
+    Returns:
+        RowPlan: The plan, or None if the rows cannot render the list, e.g. with expanded relations.
+    """
+    if sparse.get('expand'):
+        return None
+    fields = sparse.get('fields')
+    if fields is not None:
+        requested = frozenset(fields)
+        fields = tuple(name for name in declared_fields(serializer_class) if name in requested)
+    return row_plan(serializer_class, fields)
+
+
+def plan_rows(queryset, plan):
+    """
+    Make a queryset read the rows of a plan instead of model instances.
+
+    Args:
+        queryset (QuerySet): The queryset of the list.
+        plan (RowPlan): The plan.
+
+    Returns:
+        QuerySet: The named values_list() rows.
+    """
+    return queryset.select_related(None).prefetch_related(None).values_list(*plan.lookups, named=True)
+
+
+class RowListMixin:
+    """
+    Serve the list action of a ModelViewSet from values_list() rows.
+
+    Attributes:
+        row_list: Whether the rows path is enabled.
+    """
+
+    row_list = True
+
+    def list(self, request, *args, **kwargs):
+        """
+        Return a page of the list rendered from rows, or from model instances if the rows cannot render it.
+
+        Args:
+            request (Request): The request object.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+
+        Returns:
+            Response: The page.
+        """
+        plan = sparse_plan(self.get_serializer_class(), getattr(self, 'sparse', {})) if self.row_list else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = plan_rows(self.filter_queryset(self.get_queryset()), plan)
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        rendered = plan.render(rows, plan.related_ids([row.pk for row in rows]) if plan.many else ())
+        if page is None:
+            return Response(rendered)
+        return self.get_paginated_response(rendered)
@@ -0,0 +1,312 @@
+"""
+This module contains the full-text search over the tasks, the comments and the solutions.
+
+Every searched model has an SQLite FTS5 index over its text columns. The index holds its own copy of the text
+and the primary key of every object in an UNINDEXED column, so a hit carries the UUID of its object
+and nothing depends on the rowids of the tables, which VACUUM and the table rebuilds of migrations renumber.
+A small table with an INTEGER PRIMARY KEY, which keeps its values, maps every UUID to the rowid of its entry,
+so the triggers on the table of the model update and delete entries by rowid instead of scanning the index.
+The triggers keep the index in sync on every insert, update and delete, bulk writes and raw SQL included.
+A search runs one MATCH per index, ranks the hits by BM25 and pages through them with a keyset cursor
+on the score, so it never scans the tables. The indexes are copied with the file, so searches run on a read replica
+like the other reads (see main.replicas).
+
+A migration that alters one of the tables makes Django rebuild it, which drops the triggers,
+so run the rebuild_search command after it.
+"""
+
+import json
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from typing import NamedTuple
+
+from django.db import connection, connections, router
+
+from .models import Comment, Task, TaskStudent
+from .pagination import INVALID_CURSOR
+
+TOKENIZER = 'unicode61 remove_diacritics 2'
+COLUMN_SEPARATOR = ', '
+DEFAULT_PAGE_SIZE = 50
+WORD = re.compile(r'\w+')
+NO_WORDS = 'Query must contain a word'
+
+
+class SearchIndex(NamedTuple):
+    """The FTS5 index of the text columns of a model."""
+
+    kind: str
+    model: type
+    columns: tuple
+    weights: tuple
+
+    @property
+    def table(self):
+        """
+        Return the table of the model.
+
+        Returns:
+            str: The table name.
+        """
+        return self.model._meta.db_table  # noqa: WPS437
+
+    @property
+    def fts_table(self):
+        """
+        Return the FTS5 table of the index.
+
+        Returns:
+            str: The table name.
+        """
+        return f'{self.table}_fts'
+
+    @property
+    def keys_table(self):
+        """
+        Return the table mapping the primary keys of the objects to the rowids of the index.
+
+        Returns:
+            str: The table name.
+        """
+        return f'{self.fts_table}_keys'
+
+    def create_sql(self):
+        """
+        Build the statements creating the index, its key table and its triggers, and filling them from the table.
+
+        The statements drop what exists first, so they can be run again to repair the index.
+
+        Returns:
+            list: The SQL statements.
+        """
+        fts = self.fts_table
+        keys = self.keys_table
+        columns = COLUMN_SEPARATOR.join(self.columns)
+        table_values = COLUMN_SEPARATOR.join(f'{self.table}.{column}' for column in self.columns)
+        return [
+            *self.drop_sql(),
+            f'CREATE TABLE {keys} (id integer NOT NULL PRIMARY KEY, pk char(32) NOT NULL UNIQUE)',
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(pk UNINDEXED, {columns}, tokenize='{TOKENIZER}')",
+            *(
+                f'CREATE TRIGGER {fts}_{name} AFTER {event} ON {self.table} BEGIN {body} END'
+                for name, (event, body) in self.trigger_sql().items()
+            ),
+            f'INSERT INTO {keys}(pk) SELECT {self.table}.id FROM {self.table}',
+            fill_sql(self, table_values, f'{self.table} JOIN {keys} ON pk = {self.table}.id'),
+        ]
+
+    def trigger_sql(self):
+        """
+        Build the triggers keeping the index in sync with the table.
+
+        The entries are found by rowid through the key table, so no trigger scans the index.
+
+        Returns:
+            dict: The event and the body of every trigger by name.
+        """
+        fts = self.fts_table
+        keys = self.keys_table
+        new_values = COLUMN_SEPARATOR.join(f'new.{column}' for column in self.columns)
+        changes = COLUMN_SEPARATOR.join(f'{column} = new.{column}' for column in self.columns)
+        fill = fill_sql(self, new_values, f'{keys} WHERE pk = new.id')
+        delete = f'DELETE FROM {fts} WHERE rowid = (SELECT {keys}.id FROM {keys} WHERE pk = old.id);'  # noqa: S608
+        return {
+            'insert': ('INSERT', f'INSERT INTO {keys}(pk) VALUES (new.id); {fill};'),
+            'delete': ('DELETE', f'{delete} DELETE FROM {keys} WHERE pk = old.id;'),  # noqa: S608
+            'update': (
+                f'UPDATE OF {COLUMN_SEPARATOR.join(self.columns)}',
+                f'UPDATE {fts} SET {changes} WHERE rowid = (SELECT {keys}.id FROM {keys} WHERE pk = new.id);',
+            ),
+        }
+
+    def drop_sql(self):
+        """
+        Build the statements dropping the index, its key table and its triggers.
+
+        Returns:
+            list: The SQL statements.
+        """
+        triggers = [f'DROP TRIGGER IF EXISTS {self.fts_table}_{event}' for event in ('insert', 'delete', 'update')]
+        return [*triggers, f'DROP TABLE IF EXISTS {self.fts_table}', f'DROP TABLE IF EXISTS {self.keys_table}']
+
+    def match_sql(self, position):
+        """
+        Build the query of the hits of the index, with the position of the index as their kind.
+
+        Args:
+            position (int): The position of the index in SEARCH_INDEXES.
+
+        Returns:
+            str: The SQL taking the match expression as its parameter.
+        """
+        fts = self.fts_table
+        weights = COLUMN_SEPARATOR.join(map(str, (0, *self.weights)))
+        selected = f'bm25({fts}, {weights}) AS score, {position} AS kind'
+        return f'SELECT {selected}, rowid AS row_id, pk FROM {fts} WHERE {fts} MATCH %s'  # noqa: WPS323
+
+
+def fill_sql(index, row_values, source):
+    """
+    Build the statement adding rows to an index under the rowids of their primary keys in the key table.
+
+    Args:
+        index (SearchIndex): The index.
+        row_values (str): The indexed values of the rows.
+        source (str): The FROM clause joining the rows with their keys.
+
+    Returns:
+        str: The SQL statement.
+    """
+    fts = index.fts_table
+    keys = index.keys_table
+    columns = COLUMN_SEPARATOR.join(index.columns)
+    return f'INSERT INTO {fts}(rowid, pk, {columns}) SELECT {keys}.id, pk, {row_values} FROM {source}'
+
+
+class Hit(NamedTuple):
+    """A search result: the kind and the primary key of the object and its BM25 score, lower is better."""
+
+    kind: str
+    pk: str
+    score: float
+
+
+class SearchPage(NamedTuple):
+    """A page of search results with the cursor of the next page."""
+
+    hits: list
+    next_cursor: str
+
+
+SEARCH_INDEXES = (
+    SearchIndex('task', Task, ('name', 'description'), (10.0, 1.0)),
+    SearchIndex('comment', Comment, ('text_comment',), (1.0,)),
+    SearchIndex('solution', TaskStudent, ('solution',), (1.0,)),
+)
+KINDS = tuple(index.kind for index in SEARCH_INDEXES)
+
+
+def create_indexes(schema_connection=connection):
+    """
+    Create or repair the search indexes and their triggers, and fill them from the tables.
+
+    Databases other than SQLite are left alone.
+
+    Args:
+        schema_connection (DatabaseWrapper): The database connection.
+    """
+    if schema_connection.vendor != 'sqlite':
+        return
+    with schema_connection.cursor() as cursor:
+        for index in SEARCH_INDEXES:
+            for statement in index.create_sql():
+                cursor.execute(statement)
+
+
+def match_expression(text):
+    """
+    Turn user input into an FTS5 query matching rows that contain all of its words.
+
+    Every word is quoted, so the input cannot use the FTS5 query syntax or make it fail.
+
+    Args:
+        text (str): The user input.
+
+    Returns:
+        str: The match expression.
+
+    Raises:
+        ValueError: If the input has no words.
+    """
+    words = WORD.findall(text)
+    if not words:
+        raise ValueError(NO_WORDS)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def encode_cursor(position):
+    """
+    Build an opaque cursor pointing after a hit.
+
+    Args:
+        position (tuple): The score, the kind position and the rowid of the hit.
+
+    Returns:
+        str: The cursor.
+    """
+    return urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Read the position out of a cursor.
+
+    Args:
+        cursor (str): The cursor.
+
+    Returns:
+        tuple: The score, the kind position and the rowid.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        score, kind, row_id = json.loads(urlsafe_b64decode(cursor.encode()))
+    except (DecodeError, TypeError, ValueError) as error:
+        raise ValueError(INVALID_CURSOR) from error
+    try:
+        return float(score), int(kind), int(row_id)
+    except (TypeError, ValueError) as invalid:
+        raise ValueError(INVALID_CURSOR) from invalid
+
+
+def search_sql(expression, kinds, cursor, size):
+    """
+    Build the query of a page of hits over some of the indexes.
+
+    A malformed cursor raises ValueError.
+
+    Args:
+        expression (str): The match expression.
+        kinds (Iterable): The kinds of objects to search.
+        cursor (str): The cursor of the page, or None for the first page.
+        size (int): The page size.
+
+    Returns:
+        tuple: The SQL and its parameters.
+    """
+    searched = [(position, index) for position, index in enumerate(SEARCH_INDEXES) if index.kind in kinds]
+    union = ' UNION ALL '.join(index.match_sql(position) for position, index in searched)
+    sql_params = [expression for _ in searched]
+    after = ''
+    if cursor:
+        after = 'WHERE (score, kind, row_id) > (%s, %s, %s)'  # noqa: WPS323
+        sql_params.extend(decode_cursor(cursor))
+    sql_params.append(size + 1)
+    return f'SELECT * FROM ({union}) {after} ORDER BY score, kind, row_id LIMIT %s', sql_params  # noqa: S608, WPS323
+
+
+def search(text, kinds=KINDS, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """
+    Find the objects containing all words of the text, best matches first.
+
+    Input without words and a malformed cursor raise ValueError.
+
+    Args:
+        text (str): The user input.
+        kinds (Iterable): The kinds of objects to search.
+        cursor (str): The cursor of the page, or None for the first page.
+        size (int): The page size.
+
+    Returns:
+        SearchPage: The hits of the page and the cursor of the next one.
+    """
+    with connections[router.db_for_read(SEARCH_INDEXES[0].model)].cursor() as db_cursor:
+        db_cursor.execute(*search_sql(match_expression(text), kinds, cursor, size))
+        rows = db_cursor.fetchmany(size)
+        next_cursor = None
+        if db_cursor.fetchone():
+            next_cursor = encode_cursor(rows[-1][:3])
+    hits = [Hit(KINDS[kind], pk, score) for score, kind, _, pk in rows]
+    return SearchPage(hits, next_cursor)
@@ -0,0 +1,431 @@
+"""
+This module contains the helpers of the seed_data management command.
+
+The helpers draw the skew of real data from Zipf laws and generate random values in the column format
+of the database a batch at a time, as numpy arrays drawn from a seeded numpy Generator:
+the picks by popularity are a searchsorted of uniform draws on the cumulative weights.
+The rows are written with executemany, many batches per transaction.
+On SQLite, FastWrites drops the secondary indexes of the seeded tables and the search triggers during the load
+and builds the indexes once at the end.
+"""
+
+from datetime import date, timedelta
+from itertools import chain, islice
+from time import perf_counter
+from uuid import UUID
+
+import numpy as np
+from django.db import connection, transaction
+
+from .models import Comment, Student, Task, TaskStudent
+from .search import SEARCH_INDEXES, create_indexes
+
+WORDS = (
+    'array', 'graph', 'tree', 'string', 'number', 'matrix', 'queue', 'stack', 'heap', 'hash', 'sort', 'search',
+    'path', 'cycle', 'prime', 'digit', 'sum', 'product', 'interval', 'segment', 'point', 'vector', 'list', 'set',
+    'map', 'loop', 'index', 'range', 'binary', 'greedy', 'dynamic', 'recursive', 'iterative', 'linear', 'square',
+    'minimum', 'maximum', 'count', 'reverse', 'merge', 'split', 'join', 'filter', 'window', 'prefix', 'suffix',
+)
+PHRASES = 4096
+PHRASE_WORDS = 4
+DAYS_PER_YEAR = 365
+DAYS = 3 * DAYS_PER_YEAR
+UUID_BYTES = 16
+UUID_HEX = 2 * UUID_BYTES
+# The version 4 and RFC 4122 variant bits of a random UUID: the byte, the bits kept and the bits set.
+UUID_MARKS = ((6, 0xF, 0x40), (8, 0x3F, 0x80))
+SEEDED_MODELS = (Task, Student, TaskStudent, Comment)
+KIB = 1024
+CACHE_MIB = 512
+# Pages of the SQLite cache during the load, in KiB when negative: the random ids spread the index writes.
+CACHE_SIZE = -CACHE_MIB * KIB
+# Students solving more than this share of the tasks get them uniformly, not by popularity.
+UNIFORM_SHARE = 0.5
+# Rounds of Zipf draws before the tasks still missing are picked uniformly.
+SAMPLE_ROUNDS = 8
+INDEXES_SQL = "SELECT tbl_name, name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+
+
+def zipf_weights(count, exponent):
+    """
+    Weight the ranks of a Zipf law.
+
+    Args:
+        count (int): The number of ranks.
+        exponent (float): The skew; 0 weights every rank equally.
+
+    Returns:
+        ndarray: The weight of every rank, highest first.
+    """
+    return np.arange(1, count + 1, dtype=np.float64) ** -exponent
+
+
+def zipf_picks(rng, cum_weights, count):
+    """
+    Pick ranks at random, the popular ones more often.
+
+    Args:
+        rng (Generator): The random generator.
+        cum_weights (ndarray): The cumulative weights of the ranks.
+        count (int): The number of picks.
+
+    Returns:
+        ndarray: The picked ranks, possibly repeated.
+    """
+    picks = np.searchsorted(cum_weights, rng.random(count) * cum_weights[-1], side='right')
+    # A draw rounded up to the total weight would fall past the last rank.
+    return np.minimum(picks, len(cum_weights) - 1)
+
+
+def allocate(total, weights, cap):
+    """
+    Share a total out between ranks in proportion to their weights, none getting more than the cap.
+
+    What a capped rank cannot take goes to the ranks after it, so the shares add up to the total.
+
+    Args:
+        total (int): The total, at most the cap times the number of ranks.
+        weights (list): The weights of the ranks, highest first.
+        cap (int): The largest share.
+
+    Returns:
+        list: The share of every rank.
+    """
+    remaining_weight = sum(weights)
+    shares = []
+    for weight in weights:
+        share = min(cap, round(total * weight / remaining_weight)) if remaining_weight else 0
+        shares.append(share)
+        total -= share
+        remaining_weight -= weight
+    return shares
+
+
+def sample_distinct(rng, cum_weights, count):
+    """
+    Pick distinct ranks, the popular ones more often.
+
+    Args:
+        rng (Generator): The random generator.
+        cum_weights (ndarray): The cumulative weights of the ranks.
+        count (int): The number of ranks to pick, at most the number of ranks.
+
+    Returns:
+        ndarray: The picked ranks.
+    """
+    population = len(cum_weights)
+    if count > population * UNIFORM_SHARE:
+        return rng.choice(population, count, replace=False)
+    picked = np.empty(0, dtype=np.int64)
+    for _ in range(SAMPLE_ROUNDS):
+        picked = np.union1d(picked, zipf_picks(rng, cum_weights, count - len(picked)))
+        if len(picked) == count:
+            return picked
+    rest = np.setdiff1d(np.arange(population), picked)
+    return np.concatenate((picked, rng.choice(rest, count - len(picked), replace=False)))
+
+
+def solution_batches(rng, cum_weights, shares, batch_size):
+    """
+    Pick the distinct tasks of every student by popularity, gathered in batches of about batch_size solutions.
+
+    Args:
+        rng (Generator): The random generator.
+        cum_weights (ndarray): The cumulative weights of the tasks.
+        shares (iterable): The id of every student and the number of its solutions.
+        batch_size (int): The solutions per batch; a batch ends with the student that fills it.
+
+    Yields:
+        tuple: The task ranks of the solutions, and the ids and the numbers of solutions of their students.
+    """
+    ranks, students, solved = [], [], []
+    size = 0
+    for student_id, share in shares:
+        if share:
+            ranks.append(sample_distinct(rng, cum_weights, share))
+            students.append(student_id)
+            solved.append(share)
+            size += share
+        if size >= batch_size:
+            yield np.concatenate(ranks), students, solved
+            ranks, students, solved = [], [], []
+            size = 0
+    if students:
+        yield np.concatenate(ranks), students, solved
+
+
+def chunked(rows, size):
+    """
+    Split rows into batches.
+
+    Args:
+        rows (iterable): The rows.
+        size (int): The rows per batch.
+
+    Yields:
+        list: The next batch.
+    """
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+def insert_sql(model, fields):
+    """
+    Build the INSERT statement of a model.
+
+    Args:
+        model (type): The model.
+        fields (tuple): The names of the fields of the values, in order.
+
+    Returns:
+        str: The SQL with one placeholder per field.
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(field).column) for field in fields)  # noqa: WPS437
+    placeholders = ', '.join('%s' for _ in fields)  # noqa: WPS323
+    return f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})'  # noqa: WPS437
+
+
+class FastWrites:
+    """
+    Relax the durability of SQLite and enlarge its cache until the end of the load.
+
+    The secondary indexes of the seeded tables and the search triggers are dropped too, and rebuilt
+    on exit even if the load fails, so they match what was committed. Other databases are left as they are.
+    """
+
+    def __init__(self, schema_connection):
+        """
+        Prepare to relax a connection.
+
+        Args:
+            schema_connection (DatabaseWrapper): The database connection.
+        """
+        self.connection = schema_connection
+        self.pragmas = {}
+        self.indexes = []
+
+    def __enter__(self):
+        """
+        Relax the connection and drop the indexes.
+
+        Returns:
+            FastWrites: The context manager.
+        """
+        if self.connection.vendor == 'sqlite':
+            with self.connection.cursor() as cursor:
+                self.relax(cursor)
+                self.drop_indexes(cursor)
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Rebuild the indexes and restore the settings of the connection.
+
+        Args:
+            exc_info (tuple): The exception raised by the load, if any.
+        """
+        if self.connection.vendor == 'sqlite':
+            self.restore()
+
+    def relax(self, cursor):
+        """
+        Save the durability and the cache size of SQLite, then relax them.
+
+        Args:
+            cursor (CursorWrapper): The cursor.
+        """
+        for pragma in ('synchronous', 'cache_size'):
+            cursor.execute(f'PRAGMA {pragma}')
+            self.pragmas[pragma] = int(cursor.fetchone()[0])
+        cursor.execute(f'PRAGMA cache_size = {CACHE_SIZE}')
+        if not self.connection.in_atomic_block:
+            cursor.execute('PRAGMA synchronous = OFF')
+
+    def drop_indexes(self, cursor):
+        """
+        Drop the secondary indexes of the seeded tables and the search triggers, keeping the SQL of the indexes.
+
+        Args:
+            cursor (CursorWrapper): The cursor.
+        """
+        tables = {model._meta.db_table for model in SEEDED_MODELS}  # noqa: WPS437
+        cursor.execute(INDEXES_SQL)
+        self.indexes = [(name, index_sql) for table, name, index_sql in cursor.fetchall() if table in tables]
+        for name, _ in self.indexes:
+            cursor.execute(f'DROP INDEX {self.connection.ops.quote_name(name)}')
+        for index in SEARCH_INDEXES:
+            for statement in index.drop_sql():
+                cursor.execute(statement)
+
+    def restore(self):
+        """Build the dropped indexes and the search indexes, then restore the durability and the cache size."""
+        with transaction.atomic():
+            with self.connection.cursor() as index_cursor:
+                for _, index_sql in self.indexes:
+                    index_cursor.execute(index_sql)
+            create_indexes(self.connection)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {self.pragmas["cache_size"]}')
+            if not self.connection.in_atomic_block:
+                cursor.execute(f'PRAGMA synchronous = {self.pragmas["synchronous"]}')
+
+
+class RowFactory:
+    """Batches of random values in the column format of the database."""
+
+    def __init__(self, rng):
+        """
+        Prepare the pools of texts and dates.
+
+        Args:
+            rng (Generator): The random generator.
+        """
+        self.rng = rng
+        self.native_uuid = connection.features.has_native_uuid_field
+        indexes = rng.integers(len(WORDS), size=(PHRASES, PHRASE_WORDS))
+        words = np.array(WORDS, dtype=object)[indexes]
+        self.phrases = np.array([' '.join(phrase) for phrase in words], dtype=object)
+        today = date.today()
+        days = [connection.ops.adapt_datefield_value(today - timedelta(days=day)) for day in range(DAYS)]
+        self.days = np.array(days, dtype=object)
+
+    def uuids(self, count):
+        """
+        Make random version 4 UUIDs from the seeded generator.
+
+        Args:
+            count (int): The number of UUIDs.
+
+        Returns:
+            list: The UUIDs, or their hex on databases without a UUID type.
+        """
+        raw = np.frombuffer(bytearray(self.rng.bytes(count * UUID_BYTES)), dtype=np.uint8)
+        raw = raw.reshape(count, UUID_BYTES)
+        for index, kept, marked in UUID_MARKS:
+            raw[:, index] = raw[:, index] & kept | marked
+        if self.native_uuid:
+            return [UUID(bytes=uuid_bytes.tobytes()) for uuid_bytes in raw]
+        hexed = raw.tobytes().hex()
+        return [hexed[start:start + UUID_HEX] for start in range(0, len(hexed), UUID_HEX)]
+
+    def texts(self, count):
+        """
+        Make texts of two random phrases.
+
+        Args:
+            count (int): The number of texts.
+
+        Returns:
+            list: The texts.
+        """
+        first, second = self.phrases[self.rng.integers(PHRASES, size=(2, count))].tolist()
+        return [f'{head} {tail}' for head, tail in zip(first, second)]
+
+    def dates(self, count):
+        """
+        Pick dates of the last three years.
+
+        Args:
+            count (int): The number of dates.
+
+        Returns:
+            list: The dates.
+        """
+        return self.days[self.rng.integers(DAYS, size=count)].tolist()
+
+    def picks(self, choices, count):
+        """
+        Pick values uniformly.
+
+        Args:
+            choices (Sequence): The values to pick from.
+            count (int): The number of picks.
+
+        Returns:
+            list: The picked values.
+        """
+        indexes = self.rng.integers(len(choices), size=count)
+        return np.asarray(choices, dtype=object)[indexes].tolist()
+
+
+class Loader:
+    """Write rows with executemany, many batches per transaction, printing the rate."""
+
+    def __init__(self, stdout, batch_size, transaction_size):
+        """
+        Set the sizes of the batches and of the transactions.
+
+        Args:
+            stdout (OutputWrapper): Where the rates are printed.
+            batch_size (int): The rows per executemany call.
+            transaction_size (int): The rows per transaction.
+        """
+        self.stdout = stdout
+        self.batch_size = batch_size
+        self.per_transaction = max(1, transaction_size // batch_size)
+
+    def batch_sizes(self, count):
+        """
+        Split a number of rows into batches.
+
+        Args:
+            count (int): The number of rows.
+
+        Returns:
+            list: The rows of every batch.
+        """
+        return [min(self.batch_size, count - start) for start in range(0, count, self.batch_size)]
+
+    def insert(self, model, fields, rows):
+        """
+        Insert rows.
+
+        Args:
+            model (type): The model.
+            fields (tuple): The names of the fields of the values, in order.
+            rows (iterable): The values of the rows.
+        """
+        self.write(model.__name__, insert_sql(model, fields), rows)
+
+    def write(self, name, sql, rows):
+        """
+        Run a statement for many rows and print the rate.
+
+        Args:
+            name (str): The name printed with the rate.
+            sql (str): The statement.
+            rows (iterable): The parameters of every row.
+        """
+        batches = chunked(rows, self.batch_size)
+        started = perf_counter()
+        written = sum(
+            self.write_batches(sql, chain([first], islice(batches, self.per_transaction - 1)))
+            for first in batches
+        )
+        elapsed = perf_counter() - started
+        rate = written / elapsed if elapsed else 0
+        throughput = f'{elapsed:8.1f} s  {rate:10.0f} rows/s'
+        self.stdout.write(f'{name:12} {written:10} rows  {throughput}')
+
+    def write_batches(self, sql, batches):
+        """
+        Run a statement for the batches of one transaction.
+
+        Args:
+            sql (str): The statement.
+            batches (iterable): The batches of parameters.
+
+        Returns:
+            int: The number of rows written.
+        """
+        written = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for batch in batches:
+                    cursor.executemany(sql, batch)
+                    written += len(batch)
+        return written
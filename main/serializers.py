@@ -4,51 +4,82 @@ This module defines the serializers for the application.
 It includes serializers for tasks, students, task-student associations, and comments.
 Each serializer is a Django REST Framework ModelSerializer,
 which means it automatically generates fields based on the model it's serializing.
+The model serializers render the fields and expand the relations asked for by the request (see main.sparse).
 """
 
+from django.contrib.auth.models import User
 from rest_framework import serializers
 
 from .models import Comment, Student, Task, TaskStudent
+from .sparse import SparseFieldsMixin
 
 USER_USERNAME = 'user.username'
 ALL_FIELDS = '__all__'
+USER_SERIALIZER = 'main.serializers.UserSerializer'
+TASK_SERIALIZER = 'main.serializers.TaskSerializer'
+STUDENT_SERIALIZER = 'main.serializers.StudentSerializer'
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Serializer for an expanded owner."""
+
+    class Meta:
+        model = User
+        fields = ('id', 'username')
+
+
+class TaskSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the Task model."""
 
     user = serializers.ReadOnlyField(source=USER_USERNAME)
+    expandable = {'students': STUDENT_SERIALIZER, 'user': USER_SERIALIZER}
 
     class Meta:
         model = Task
         fields = ALL_FIELDS
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the Student model."""
 
     user = serializers.ReadOnlyField(source=USER_USERNAME)
+    expandable = {'tasks': TASK_SERIALIZER, 'user': USER_SERIALIZER}
 
     class Meta:
         model = Student
         fields = ALL_FIELDS
 
 
-class TaskStudentSerializer(serializers.ModelSerializer):
+class TaskStudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the TaskStudent model."""
 
     user = serializers.ReadOnlyField(source=USER_USERNAME)
+    expandable = {'task': TASK_SERIALIZER, 'student': STUDENT_SERIALIZER}
 
     class Meta:
         model = TaskStudent
         fields = ALL_FIELDS
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for the Comment model."""
 
     user = serializers.ReadOnlyField(source=USER_USERNAME)
+    expandable = {'task_id': TASK_SERIALIZER, 'student': STUDENT_SERIALIZER}
 
     class Meta:
         model = Comment
         fields = ALL_FIELDS
+
+
+class BulkTaskStudentSerializer(serializers.Serializer):
+    """
+    Serializer validating one item of a bulk task-student payload.
+
+    The task, the student and the uniqueness of the pair are checked for the whole batch at once by the viewset,
+    so validating an item does not query the database.
+    """
+
+    task = serializers.UUIDField()
+    student = serializers.UUIDField()
+    solution = serializers.CharField()
@@ -0,0 +1,347 @@
+"""
+This module contains the signal handlers of the application.
+
+The handlers keep the denormalized solve counters of students in sync
+with the task-student associations and the task difficulties.
+They also mark the cached leaderboard as stale, bump the data versions of the changed models
+and the fragment versions of the list items that show the changed rows,
+drop the cached credentials of deleted tokens and changed users,
+index the MinHash signatures of saved solutions for the near-duplicate search,
+and time the queries of every new database connection for the request metrics and the slow query log.
+They are connected when the 'main' app is ready.
+
+Bulk writes run inside suspend_handlers() and rebuild what they touched once, instead of row by row.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import leaderboard, metrics, similarity, slow_queries, versions
+from .authentication import invalidate_token, invalidate_user
+from .models import Comment, Student, Task, TaskStudent
+from .ratings import COUNTER_FIELDS, apply_solution_delta, task_difficulty
+
+_suspended = ContextVar('suspended', default=False)
+
+
+@contextmanager
+def suspend_handlers():
+    """
+    Skip the per-row handlers of this module for the duration of a bulk write.
+
+    Yields:
+        None: Control to the bulk write.
+    """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def _refresh_cached_student(task_student):
+    """
+    Reload the counters of the student instance cached on the association, if any.
+
+    Args:
+        task_student (TaskStudent): The task-student association.
+    """
+    if TaskStudent.student.is_cached(task_student):
+        task_student.student.refresh_from_db(fields=COUNTER_FIELDS)
+
+
+@receiver(pre_save, sender=TaskStudent)
+def remember_solution_owner(sender, instance, **kwargs):
+    """
+    Remember the task and the student the association pointed to before the update.
+
+    Args:
+        sender (type): The model class.
+        instance (TaskStudent): The association being saved.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    instance._previous_owner = None  # noqa: WPS437
+    if not instance._state.adding:  # noqa: WPS437
+        previous = TaskStudent.objects.filter(pk=instance.pk).values_list('task_id', 'student_id').first()
+        instance._previous_owner = previous  # noqa: WPS437
+
+
+@receiver(post_save, sender=TaskStudent)
+def count_solution(sender, instance, created, **kwargs):
+    """
+    Count a new solution, or move it between students when the association changes.
+
+    Args:
+        sender (type): The model class.
+        instance (TaskStudent): The saved association.
+        created (bool): True if a new association was created.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    previous = getattr(instance, '_previous_owner', None)
+    if not created:
+        if previous is None or previous == (instance.task_id, instance.student_id):
+            return
+        previous_task_id, previous_student_id = previous
+        apply_solution_delta(Student.objects.filter(pk=previous_student_id), -1, -task_difficulty(previous_task_id))
+    apply_solution_delta(Student.objects.filter(pk=instance.student_id), 1, task_difficulty(instance.task_id))
+    _refresh_cached_student(instance)
+
+
+@receiver(post_delete, sender=TaskStudent)
+def uncount_solution(sender, instance, **kwargs):
+    """
+    Remove a deleted solution from the counters of its student.
+
+    Args:
+        sender (type): The model class.
+        instance (TaskStudent): The deleted association.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    apply_solution_delta(Student.objects.filter(pk=instance.student_id), -1, -task_difficulty(instance.task_id))
+    _refresh_cached_student(instance)
+
+
+@receiver(post_save, sender=TaskStudent)
+def index_solution(sender, instance, **kwargs):
+    """
+    Index the signature of a saved solution for the near-duplicate search.
+
+    Args:
+        sender (type): The model class.
+        instance (TaskStudent): The saved association.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    similarity.index_solutions([instance])
+
+
+@receiver(pre_save, sender=Task)
+def remember_difficulty(sender, instance, **kwargs):
+    """
+    Remember the difficulty the task had before the update.
+
+    Args:
+        sender (type): The model class.
+        instance (Task): The task being saved.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    instance._previous_difficulty = None  # noqa: WPS437
+    if not instance._state.adding:  # noqa: WPS437
+        previous = Task.objects.filter(pk=instance.pk).values_list('difficulty', flat=True).first()
+        instance._previous_difficulty = previous  # noqa: WPS437
+
+
+@receiver(post_save, sender=Task)
+def recount_difficulty(sender, instance, created, **kwargs):
+    """
+    Shift the total difficulty of every student who solved the task when its difficulty changes.
+
+    Args:
+        sender (type): The model class.
+        instance (Task): The saved task.
+        created (bool): True if a new task was created.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    previous = getattr(instance, '_previous_difficulty', None)
+    if created or previous is None or previous == instance.difficulty:
+        return
+    apply_solution_delta(Student.objects.filter(tasks=instance), 0, instance.difficulty - previous)
+
+
+@receiver(post_save, sender=TaskStudent)
+@receiver(post_delete, sender=TaskStudent)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Task)
+def invalidate_leaderboard(sender, **kwargs):
+    """
+    Mark the leaderboard as stale after a change of the ranked data.
+
+    Args:
+        sender (type): The model class.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    leaderboard.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Task)
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=TaskStudent)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=User)
+def bump_version(sender, **kwargs):
+    """
+    Bump the data version of the changed model, skipping the last_login updates of users.
+
+    Args:
+        sender (type): The model class.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get() or kwargs.get('update_fields') == {'last_login'}:
+        return
+    versions.bump_on_commit(versions.label_of(sender))
+
+
+def _bump_items(model, pks):
+    """
+    Bump the fragment versions of some objects.
+
+    Args:
+        model (type): The model class.
+        pks (Iterable): The primary keys of the objects.
+    """
+    labels = [versions.object_label(model, pk) for pk in set(pks) if pk is not None]
+    if labels:
+        versions.bump_on_commit(*labels)
+
+
+@receiver(post_save, sender=TaskStudent)
+@receiver(post_delete, sender=TaskStudent)
+def bump_solution_items(sender, instance, **kwargs):
+    """
+    Re-render the items of the task and the student of a changed solution, and of its previous owner.
+
+    Args:
+        sender (type): The model class.
+        instance (TaskStudent): The changed association.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    previous_task_id, previous_student_id = getattr(instance, '_previous_owner', None) or (None, None)
+    _bump_items(Task, (instance.task_id, previous_task_id))
+    _bump_items(Student, (instance.student_id, previous_student_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_items(sender, instance, **kwargs):
+    """
+    Re-render the item of the task of a changed comment.
+
+    Args:
+        sender (type): The model class.
+        instance (Comment): The changed comment.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    _bump_items(Task, (instance.task_id_id,))
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_task_items(sender, instance, **kwargs):
+    """
+    Re-render the item of a changed task and, on update, the items of the students who solved it.
+
+    A deleted task cascades to its solutions, whose own handlers re-render the students.
+
+    Args:
+        sender (type): The model class.
+        instance (Task): The changed task.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    _bump_items(Task, (instance.pk,))
+    if kwargs['signal'] is post_save and not kwargs['created']:
+        _bump_items(Student, TaskStudent.objects.filter(task_id=instance.pk).values_list('student_id', flat=True))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def bump_student_items(sender, instance, **kwargs):
+    """
+    Re-render the item of a changed student and, on update, the items of the tasks they solved.
+
+    Args:
+        sender (type): The model class.
+        instance (Student): The changed student.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get():
+        return
+    _bump_items(Student, (instance.pk,))
+    if kwargs['signal'] is post_save and not kwargs['created']:
+        _bump_items(Task, TaskStudent.objects.filter(student_id=instance.pk).values_list('task_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def bump_user_items(sender, instance, created, update_fields, **kwargs):
+    """
+    Re-render the items of the tasks and the students of a renamed user.
+
+    Args:
+        sender (type): The model class.
+        instance (User): The saved user.
+        created (bool): True if a new user was created.
+        update_fields (frozenset): The updated fields, or None if all fields were saved.
+        kwargs (dict): The signal arguments.
+    """
+    if _suspended.get() or created or update_fields == {'last_login'}:
+        return
+    _bump_items(Task, Task.objects.filter(user=instance).values_list('id', flat=True))
+    _bump_items(Student, Student.objects.filter(user=instance).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Token)
+def drop_token(sender, instance, **kwargs):
+    """
+    Drop the cached credentials of a deleted or rotated token.
+
+    Args:
+        sender (type): The model class.
+        instance (Token): The deleted token.
+        kwargs (dict): The signal arguments.
+    """
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_user_tokens(sender, instance, **kwargs):
+    """
+    Drop the cached credentials of a changed (e.g. deactivated) or deleted user.
+
+    Args:
+        sender (type): The model class.
+        instance (User): The changed user.
+        kwargs (dict): The signal arguments.
+    """
+    if kwargs.get('created') or kwargs.get('update_fields') == {'last_login'}:
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """
+    Time the queries of a new database connection for the request metrics and the slow query log.
+
+    Args:
+        sender (type): The database wrapper class.
+        connection (DatabaseWrapper): The new connection.
+        kwargs (dict): Additional keyword arguments.
+    """
+    metrics.instrument_connection(connection)
+    slow_queries.instrument_connection(connection)
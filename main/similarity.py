@@ -0,0 +1,235 @@
+"""
+This module contains the near-duplicate detection of the task solutions.
+
+Every solution gets a MinHash signature of its shingles (the runs of SHINGLE_SIZE consecutive tokens
+of the lowercased text), which estimates the Jaccard similarity of two solutions as the share of equal values.
+The signature is split into BANDS bands of ROWS values, and every band is hashed into a bucket of the task
+(locality-sensitive hashing): solutions of a task that share a bucket in any band are candidate duplicates,
+and the candidates are confirmed by comparing their signatures.
+
+Indexing a solution writes its signature and its BANDS buckets with a fixed number of queries,
+and finding the solutions similar to one reads only the solutions sharing a bucket with it,
+so neither depends on the number of solutions of the task.
+With 16 bands of 8 rows a pair with a similarity of 0.8 becomes a candidate with a probability of 0.95.
+"""
+
+import re
+from hashlib import blake2b
+from itertools import chain, combinations, groupby
+from operator import attrgetter, itemgetter
+from random import Random
+from typing import NamedTuple
+
+import numpy as np
+from django.db import models, transaction
+
+from .models import SolutionBucket, SolutionSignature
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+SIGNATURE_CHUNK_SIZE = 500
+DEFAULT_THRESHOLD = 0.8
+# The largest prime below 2**32: a * x + b stays below 2**64 for 32-bit a, b and x.
+HASH_PRIME = 4294967291
+SHINGLE_HASH_SIZE = 4
+SIGNATURE_DTYPE = np.dtype('<u4')
+BUCKET_SIZE = 8
+SOLUTION_ID = 'solution_id'
+TOKEN = re.compile(r'\w+|[^\w\s]')
+
+_random = Random(1)
+FACTORS, OFFSETS = np.array(
+    [(_random.randrange(1, HASH_PRIME), _random.randrange(HASH_PRIME)) for _ in range(NUM_PERM)],
+    dtype=np.uint64,
+).T
+
+
+class Match(NamedTuple):
+    """A solution similar to another one, with the estimated Jaccard similarity."""
+
+    solution_id: object
+    similarity: float
+
+
+def signature(text):
+    """
+    Compute the MinHash signature of the shingles of a text; a text shorter than a shingle is one shingle.
+
+    Every permutation is the universal hash (a * x + b) mod HASH_PRIME of the 32-bit hash x of a shingle,
+    with a and b drawn below HASH_PRIME, so a * x + b fits in 64 bits and numpy computes the permutations
+    of all shingles at once without wrapping around. The values are below 2**32.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        ndarray: NUM_PERM unsigned 32-bit values.
+    """
+    tokens = TOKEN.findall(text.lower())
+    starts = range(max(len(tokens) - SHINGLE_SIZE, 0) + 1)
+    shingles = {' '.join(tokens[start:start + SHINGLE_SIZE]) for start in starts}
+    digests = [blake2b(shingle.encode(), digest_size=SHINGLE_HASH_SIZE).digest() for shingle in shingles]
+    hashes = np.frombuffer(b''.join(digests), dtype=SIGNATURE_DTYPE).astype(np.uint64)
+    permuted = (np.outer(hashes, FACTORS) + OFFSETS) % HASH_PRIME
+    return permuted.min(axis=0).astype(SIGNATURE_DTYPE)
+
+
+def load_signatures(solution_ids):
+    """
+    Read the stored signatures of solutions in chunks.
+
+    Args:
+        solution_ids (set): The ids of the solutions.
+
+    Returns:
+        dict: The signatures by solution id.
+    """
+    solution_ids = sorted(solution_ids)
+    loaded = {}
+    for start in range(0, len(solution_ids), SIGNATURE_CHUNK_SIZE):
+        chunk = solution_ids[start:start + SIGNATURE_CHUNK_SIZE]
+        stored = SolutionSignature.objects.filter(solution__in=chunk).values_list(SOLUTION_ID, 'minhash')
+        loaded.update((pk, np.frombuffer(minhash, dtype=SIGNATURE_DTYPE)) for pk, minhash in stored)
+    return loaded
+
+
+def similarity(first, second):
+    """
+    Estimate the Jaccard similarity of two texts from their signatures.
+
+    Args:
+        first (ndarray): The first signature.
+        second (ndarray): The second signature.
+
+    Returns:
+        float: The share of equal values, from 0 to 1.
+    """
+    return np.count_nonzero(first == second) / NUM_PERM
+
+
+def buckets(minhash):
+    """
+    Hash every band of a signature into a bucket.
+
+    Args:
+        minhash (ndarray): The signature.
+
+    Returns:
+        list: The bucket of every band, as signed 64-bit integers.
+    """
+    digests = (blake2b(band.tobytes(), digest_size=BUCKET_SIZE).digest() for band in minhash.reshape(BANDS, ROWS))
+    return [int.from_bytes(digest, 'little', signed=True) for digest in digests]
+
+
+def band_filter(minhash):
+    """
+    Build the filter of the buckets a signature falls into.
+
+    Args:
+        minhash (ndarray): The signature.
+
+    Returns:
+        Q: The filter matching any of the buckets.
+    """
+    bands = models.Q()
+    for band, bucket in enumerate(buckets(minhash)):
+        bands |= models.Q(band=band, bucket=bucket)
+    return bands
+
+
+def index_solutions(solutions):
+    """
+    Write the signatures and the buckets of solutions, replacing their previous ones.
+
+    The cost is three queries whatever the number of solutions of their tasks.
+
+    Args:
+        solutions (list): The saved task-student associations.
+    """
+    if not solutions:
+        return
+    signatures = []
+    rows = []
+    for solution in solutions:
+        minhash = signature(solution.solution)
+        signatures.append(SolutionSignature(solution=solution, task_id=solution.task_id, minhash=minhash.tobytes()))
+        rows.extend(
+            SolutionBucket(solution=solution, task_id=solution.task_id, band=band, bucket=bucket)
+            for band, bucket in enumerate(buckets(minhash))
+        )
+    with transaction.atomic():
+        SolutionBucket.objects.filter(solution__in=solutions).delete()
+        SolutionSignature.objects.bulk_create(
+            signatures, update_conflicts=True, unique_fields=['solution'], update_fields=['task', 'minhash'],
+        )
+        SolutionBucket.objects.bulk_create(rows)
+
+
+def similar_solutions(solution, threshold=DEFAULT_THRESHOLD):
+    """
+    Find the solutions of the same task similar to a solution, most similar first.
+
+    A solution that is not indexed yet is compared by its current text.
+
+    Args:
+        solution (TaskStudent): The solution.
+        threshold (float): The minimal estimated similarity.
+
+    Returns:
+        list: The matches.
+    """
+    minhash = signature(solution.solution)
+    candidates = SolutionBucket.objects.filter(band_filter(minhash), task_id=solution.task_id)
+    candidates = candidates.exclude(solution=solution)
+    stored = SolutionSignature.objects.filter(solution__in=candidates.values(SOLUTION_ID))
+    matches = [
+        Match(pk, similarity(minhash, np.frombuffer(other, dtype=SIGNATURE_DTYPE)))
+        for pk, other in stored.values_list(SOLUTION_ID, 'minhash')
+    ]
+    return sorted(
+        (match for match in matches if match.similarity >= threshold), key=attrgetter('similarity'), reverse=True,
+    )
+
+
+def scored_pairs(task_rows):
+    """
+    Estimate the similarity of every pair of solutions of a task sharing a bucket.
+
+    Args:
+        task_rows (Iterable): The task, band, bucket and solution id rows of the task, in the order of the buckets.
+
+    Returns:
+        list: The ids of the two solutions, the smaller first, and their estimated similarity.
+    """
+    pairs = set()
+    for _, members in groupby(task_rows, key=itemgetter(1, 2)):
+        pairs.update(combinations(sorted(row[3] for row in members), 2))
+    loaded = load_signatures(set(chain.from_iterable(pairs)))
+    ordered = sorted(pairs)
+    return [(first, second, similarity(loaded[first], loaded[second])) for first, second in ordered]
+
+
+def duplicate_pairs(task_ids=None, threshold=DEFAULT_THRESHOLD):
+    """
+    Find every pair of similar solutions of the same task.
+
+    The buckets are streamed in the order of the index, one task at a time,
+    and only the solutions sharing a bucket are compared.
+
+    Args:
+        task_ids (list): The tasks to check, or None for all tasks.
+        threshold (float): The minimal estimated similarity.
+
+    Yields:
+        tuple: The id of the task, the ids of the two solutions and their estimated similarity.
+    """
+    rows = SolutionBucket.objects.order_by('task', 'band', 'bucket')
+    if task_ids is not None:
+        rows = rows.filter(task_id__in=task_ids)
+    rows = rows.values_list('task_id', 'band', 'bucket', SOLUTION_ID).iterator()
+    for task_id, task_rows in groupby(rows, key=itemgetter(0)):
+        for first, second, score in scored_pairs(task_rows):
+            if score >= threshold:
+                yield task_id, first, second, score
@@ -0,0 +1,197 @@
+"""
+This module contains the slow query log.
+
+An execute wrapper installed on every database connection times every query, and the queries slower than
+SLOW_QUERY_MS are logged to the 'main.slow_queries' logger as one JSON object per line: the SQL, its parameters,
+its duration, the database, the view or viewset action of the request being served
+and the frames of the stack inside the main app, innermost last. Settings send the logger
+to a rotating file (SLOW_QUERY_LOG); without it the log is disabled and the queries are not timed.
+The summarize_slow_queries command groups the entries of the files by the fingerprint of their SQL.
+"""
+
+import json
+import logging
+import os
+import re
+import traceback
+from contextlib import ExitStack
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metrics import current_request, view_name
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(__file__)
+# The wrappers and the middleware only pass the query or the request on.
+SKIPPED_FILES = frozenset(
+    os.path.join(APP_DIR, name) for name in ('slow_queries.py', 'metrics.py', 'replicas.py', 'profiling.py')
+)
+STACK_DEPTH = 6
+MAX_PARAM_LENGTH = 200
+STRING_LITERAL = re.compile("'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER = re.compile(r'%s|\?')  # noqa: WPS323
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Normalize SQL so the queries differing only in their values are grouped.
+
+    Args:
+        sql (str): The SQL.
+
+    Returns:
+        str: The SQL with the literals and the placeholders replaced by ?, the lists of them by (...)
+        and the whitespace collapsed.
+    """
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = PLACEHOLDER.sub('?', sql)
+    sql = PLACEHOLDER_LIST.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def short_param(sql_param):
+    """
+    Make a query parameter fit the log.
+
+    Args:
+        sql_param (object): The parameter.
+
+    Returns:
+        object: The parameter, with long values and bytes shortened to strings.
+    """
+    if sql_param is None or isinstance(sql_param, (bool, int, float)):
+        return sql_param
+    text = sql_param.hex() if isinstance(sql_param, (bytes, memoryview)) else str(sql_param)
+    if len(text) > MAX_PARAM_LENGTH:
+        return f'{text[:MAX_PARAM_LENGTH]}... ({len(text)} chars)'
+    return text
+
+
+def loggable_params(sql_params, many):
+    """
+    Shorten the parameters of a query for the log.
+
+    Args:
+        sql_params (object): The parameters of the query, or of every row of an executemany call.
+        many (bool): Whether it is an executemany call.
+
+    Returns:
+        list: The parameters; for an executemany call, those of the first row.
+    """
+    if many:
+        sql_params = next(iter(sql_params), None)
+    if sql_params is None:
+        return []
+    if isinstance(sql_params, dict):
+        return {name: short_param(sql_param) for name, sql_param in sql_params.items()}
+    return [short_param(sql_param) for sql_param in sql_params]
+
+
+def app_stack():
+    """
+    Capture the frames of the current stack inside the main app.
+
+    Returns:
+        list: The file relative to the app, the line, the function and the code of the innermost frames.
+    """
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(APP_DIR + os.sep) and frame.filename not in SKIPPED_FILES
+    ]
+    lines = []
+    for frame in frames[-STACK_DEPTH:]:
+        relative = Path(frame.filename).relative_to(APP_DIR).as_posix()
+        location = f'main/{relative}:{frame.lineno}'
+        lines.append(f'{location} in {frame.name}: {frame.line}')
+    return lines
+
+
+def request_details(request):
+    """
+    Describe the request a query ran for.
+
+    Args:
+        request (HttpRequest): The request object, or None outside of a request.
+
+    Returns:
+        dict: The view, the viewset action, the method and the path.
+    """
+    if request is None:
+        return {'view': None, 'action': None, 'method': None, 'path': None}
+    match = getattr(request, 'resolver_match', None)
+    actions = getattr(match.func, 'actions', None) if match else None
+    return {
+        'view': view_name(request),
+        'action': actions.get(request.method.lower()) if actions else None,
+        'method': request.method,
+        'path': request.path,
+    }
+
+
+def log_if_slow(started, sql, sql_params, many, context):
+    """
+    Log a query that took SLOW_QUERY_MS or more.
+
+    Args:
+        started (float): The perf_counter() reading when the query started.
+        sql (str): The SQL.
+        sql_params (tuple): The parameters.
+        many (bool): Whether it is an executemany call.
+        context (dict): The connection and the cursor.
+    """
+    duration = (perf_counter() - started) * 1000
+    if duration < settings.SLOW_QUERY_MS:
+        return
+    entry = {
+        'time': timezone.now().isoformat(),
+        'duration_ms': round(duration, 3),
+        'database': context['connection'].alias,
+        'sql': sql,
+        'params': loggable_params(sql_params, many),
+        'many': many,
+        **request_details(current_request()),
+        'stack': app_stack(),
+    }
+    logger.warning(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+def log_slow_query(execute, sql, sql_params, many, context):
+    """
+    Run a query and, with SLOW_QUERY_LOG set, log it if it is slower than SLOW_QUERY_MS, even if it fails.
+
+    Installed on every database connection.
+
+    Args:
+        execute (callable): The next wrapper or the cursor method.
+        sql (str): The SQL.
+        sql_params (tuple): The parameters.
+        many (bool): Whether it is an executemany call.
+        context (dict): The connection and the cursor.
+
+    Returns:
+        object: The result of the query.
+    """
+    if not settings.SLOW_QUERY_LOG:
+        return execute(sql, sql_params, many, context)
+    with ExitStack() as stack:
+        stack.callback(log_if_slow, perf_counter(), sql, sql_params, many, context)
+        return execute(sql, sql_params, many, context)
+
+
+def instrument_connection(connection):
+    """
+    Log the slow queries of a new database connection.
+
+    Args:
+        connection (DatabaseWrapper): The connection.
+    """
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
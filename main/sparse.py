@@ -0,0 +1,292 @@
+"""
+This module contains the sparse fieldsets and the expansion of relations of the API.
+
+A list or detail request picks the fields of the objects with ?fields=id,name,difficulty and inlines related objects
+with ?expand=students,user; the expanded relations are rendered even if fields does not name them.
+The serializers declare the relations they may expand, and the queryset is built from the fields
+that will actually be rendered: only() their columns, a join for the relations rendered through
+(user.username) and the expanded foreign keys, and a prefetch for the many-to-many fields, of the ids
+or, expanded, of the related objects. A field that is not rendered costs no column, join or query.
+Expanded objects are flat: their own many-to-many fields are left out.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import BaseSerializer
+
+from .pagination import Keyset
+from .versions import label_of
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+SPARSE_ACTIONS = frozenset(('list', 'retrieve'))
+
+
+def parse_names(raw_value):
+    """
+    Split a comma-separated query parameter.
+
+    Args:
+        raw_value (str): The value, or None if the parameter is absent.
+
+    Returns:
+        tuple: The distinct names in order, or None if the parameter is absent.
+    """
+    if raw_value is None:
+        return None
+    return tuple(dict.fromkeys(name.strip() for name in raw_value.split(',') if name.strip()))
+
+
+def sparse_options(query_params, serializer_class):
+    """
+    Read the fields and the expanded relations asked for by a request.
+
+    Args:
+        query_params (QueryDict): The query parameters.
+        serializer_class (type): The serializer of the objects, with SparseFieldsMixin.
+
+    Returns:
+        dict: The serializer arguments: the names of the fields, or None for all of them,
+        and the names of the expanded relations.
+
+    Raises:
+        ValidationError: If a field or a relation is unknown.
+    """
+    fields = parse_names(query_params.get(FIELDS_PARAM))
+    expand = parse_names(query_params.get(EXPAND_PARAM)) or ()
+    errors = {}
+    unknown = [name for name in expand if name not in serializer_class.expandable]
+    if unknown:
+        errors[EXPAND_PARAM] = [f'Unknown relations: {", ".join(unknown)}']
+    if fields is not None:
+        known = serializer_class().fields
+        unknown = [name for name in fields if name not in known]
+        if unknown:
+            errors[FIELDS_PARAM] = [f'Unknown fields: {", ".join(unknown)}']
+    if errors:
+        raise ValidationError(errors)
+    return {FIELDS_PARAM: fields, EXPAND_PARAM: expand}
+
+
+class SparseFieldsMixin:
+    """
+    Let a ModelSerializer render some of its fields and inline related objects.
+
+    Attributes:
+        expandable: The dotted paths of the serializers of the relations that may be expanded, by field name.
+    """
+
+    expandable = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        """
+        Build the fields of the serializer.
+
+        The flat keyword argument leaves out the many-to-many fields, for an expanded object.
+
+        Args:
+            args (tuple): The positional arguments of the serializer.
+            fields (Iterable, optional): The fields to render. All fields by default.
+            expand (Iterable): The relations to render as objects.
+            kwargs (dict): The keyword arguments of the serializer.
+        """
+        flat = kwargs.pop('flat', False)
+        super().__init__(*args, **kwargs)
+        opts = self.Meta.model._meta  # noqa: WPS437
+        for relation in expand:
+            nested = import_string(self.expandable[relation])
+            self.fields[relation] = nested(many=opts.get_field(relation).many_to_many, read_only=True, flat=True)
+        kept = None if fields is None else {*fields, *expand}
+        omitted = {field.name for field in opts.many_to_many} if flat else set()
+        for name in list(self.fields):
+            if name in omitted or (kept is not None and name not in kept):
+                del self.fields[name]  # noqa: WPS420
+
+
+def model_field_of(model, name):
+    """
+    Find the model field of a serializer field source.
+
+    Args:
+        model (type): The model.
+        name (str): The first name of the source.
+
+    Returns:
+        Field: The model field, or None for a method or a property.
+    """
+    try:
+        return model._meta.get_field(name)  # noqa: WPS437
+    except FieldDoesNotExist:
+        return None
+
+
+def loads(model, serializer, prefix=''):
+    """
+    List what the database must load for a serializer to render its objects.
+
+    Args:
+        model (type): The model of the objects.
+        serializer (Serializer): The serializer of one object.
+        prefix (str): The lookup of the model from the queried one, for an expanded foreign key.
+
+    Returns:
+        tuple: The columns for only(), the relations for select_related() and the Prefetch objects.
+    """
+    loaded = ([f'{prefix}{model._meta.pk.name}'], [], [])  # noqa: WPS437
+    for field in serializer.fields.values():
+        path = field.source.split('.')
+        model_field = model_field_of(model, path[0])
+        if model_field is not None:
+            add_loads(loaded, model_field, field, f'{prefix}{path[0]}', path[1:])
+    return loaded
+
+
+def add_loads(loaded, model_field, field, lookup, rest):
+    """
+    Add what the database must load for a serializer field to render.
+
+    Args:
+        loaded (tuple): The columns, the relations and the Prefetch objects to add to.
+        model_field (Field): The model field of the source of the field.
+        field (Field): The serializer field.
+        lookup (str): The lookup of the model field from the queried model.
+        rest (list): The names of the source after the model field.
+    """
+    columns, joins, prefetches = loaded
+    nested = getattr(field, 'child', field)
+    expanded = isinstance(nested, BaseSerializer)
+    if model_field.many_to_many:
+        related = model_field.related_model._default_manager.all()  # noqa: WPS437
+        related = sparse_queryset(related, nested) if expanded else related.only('pk')
+        prefetches.append(Prefetch(lookup, queryset=related))
+        return
+    columns.append(lookup)
+    if expanded:
+        joins.append(lookup)
+        for part, nested_part in zip(loaded, loads(model_field.related_model, nested, f'{lookup}__')):
+            part.extend(nested_part)
+    elif model_field.is_relation and rest:
+        joins.append(lookup)
+        columns.append(f'{lookup}__{rest[0]}')
+
+
+def read_models(model, serializer):
+    """
+    List the models a serializer reads besides the model of its objects, for the versions of a cached response.
+
+    Args:
+        model (type): The model of the objects.
+        serializer (Serializer): The serializer of one object.
+
+    Returns:
+        list: The related models rendered through or expanded.
+    """
+    models = []
+    for field in serializer.fields.values():
+        source = field.source.split('.')
+        # None for a method, a property or a column.
+        related = getattr(model_field_of(model, source[0]), 'related_model', None)
+        nested = getattr(field, 'child', field)
+        if isinstance(nested, BaseSerializer):
+            models.extend((related, *read_models(related, nested)))
+        elif related is not None and len(source) > 1:
+            models.append(related)
+    return models
+
+
+def read_labels(labels, model, serializer):
+    """
+    Add the version labels of the related models a serializer reads to the labels of a cached response.
+
+    Args:
+        labels (list): The labels, starting with the model of the viewset.
+        model (type): The model of the objects.
+        serializer (Serializer): The serializer of one object.
+
+    Returns:
+        list: The labels, without duplicates.
+    """
+    models = read_models(model, serializer)
+    return list(dict.fromkeys((*labels, *(label_of(related) for related in models))))
+
+
+def sparse_queryset(queryset, serializer):
+    """
+    Make a queryset load what a serializer renders, and nothing else.
+
+    The joins and the prefetches of the queryset are replaced; the ordering column is always loaded
+    for the keyset pagination.
+
+    Args:
+        queryset (QuerySet): The queryset.
+        serializer (Serializer): The serializer of one object.
+
+    Returns:
+        QuerySet: The queryset.
+    """
+    columns, joins, prefetches = loads(queryset.model, serializer)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if queryset.model._meta.ordering:  # noqa: WPS437
+        columns.append(Keyset(queryset.model).field.name)
+    return queryset.only(*columns)
+
+
+class SparseViewMixin:
+    """Apply the fields and expand parameters to the list and retrieve actions of a ModelViewSet."""
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Read the fields and the expanded relations once authentication and permissions passed.
+
+        Args:
+            request (Request): The request object.
+            args (tuple): The positional arguments.
+            kwargs (dict): The keyword arguments.
+        """
+        super().initial(request, *args, **kwargs)
+        self.sparse = {}
+        if self.action in SPARSE_ACTIONS:
+            self.sparse = sparse_options(request.query_params, self.get_serializer_class())
+
+    def cache_labels(self):
+        """
+        Add the models of the expanded relations to the version labels of the cached responses.
+
+        Returns:
+            list: The labels, starting with the model of the viewset.
+        """
+        labels = super().cache_labels()
+        if getattr(self, 'sparse', None):
+            labels = read_labels(labels, self.get_queryset().model, self.get_serializer())
+        return labels
+
+    def get_serializer(self, *args, **kwargs):
+        """
+        Build the serializer with the requested fields and relations.
+
+        Args:
+            args (tuple): The positional arguments of the serializer.
+            kwargs (dict): The keyword arguments of the serializer.
+
+        Returns:
+            Serializer: The serializer.
+        """
+        return super().get_serializer(*args, **getattr(self, 'sparse', {}), **kwargs)
+
+    def get_queryset(self):
+        """
+        Load what the requested fields and relations need.
+
+        Returns:
+            QuerySet: The queryset.
+        """
+        queryset = super().get_queryset()
+        if getattr(self, 'sparse', None):
+            queryset = sparse_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,18 @@
+// Appends the next slice of list items returned by a fragment endpoint.
+// The endpoint sends the URL of the slice after it in the X-Next-Page header.
+document.querySelectorAll('.load-more').forEach(function (button) {
+    button.addEventListener('click', function () {
+        var list = document.getElementById(button.dataset.list);
+        fetch(button.dataset.url, {credentials: 'same-origin'}).then(function (response) {
+            var nextPage = response.headers.get('X-Next-Page');
+            return response.text().then(function (html) {
+                list.insertAdjacentHTML('beforeend', html);
+                if (nextPage) {
+                    button.dataset.url = nextPage;
+                } else {
+                    button.remove();
+                }
+            });
+        });
+    });
+});
@@ -1,27 +1,64 @@
 """This module contains tests for the API."""
 
 import datetime
-
+import json
+import pstats
+import re
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import closing
+from decimal import Decimal
+from hashlib import blake2b
+from io import StringIO
+from itertools import permutations
+from pathlib import Path
+from unittest import skipIf
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import Client, RequestFactory, TestCase
+from django.core.management import CommandError, call_command
+from django.db import connection, router
+from django.db.transaction import TransactionManagementError
+from django.http import HttpResponse
+from django.test import (AsyncClient, Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.translation import gettext_lazy
 from rest_framework import status
 from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
 from main.models import Comment, Student, Task, TaskStudent
 from main.views import (comment_page, comments_page, main_page, student_page,
                         students_page, task_page, tasks_page)
 
+from . import versions
+from .authentication import TokenCache, token_cache
 from .forms import StudentForm
 from .models import max_length, validate_difficulty_range
-from .views import UserAdminPermission
+from .prometheus import DB_QUERIES, MetricsStore, metrics
+from .renderers import MSGPACK, OrjsonRenderer, msgpack, orjson
+from .replicas import STICKY_COOKIE, ReplicaRoutingMiddleware, copy_primary
+from .rows import ROW_PLANS, row_plan, sparse_plan
+from .similarity import (FACTORS, HASH_PRIME, OFFSETS, index_solutions,
+                         signature)
+from .views import (CURSOR, HTML_PAGE_SIZE, PAGE, CommentViewSet,
+                    StudentViewSet, TaskStudentViewSet, TaskViewSet,
+                    UserAdminPermission)
 
 API_V1_TASKS = '/api/v1/tasks/'
 API_V1_STUDENTS = '/api/v1/students/'
 API_V1_COMMENTS = '/api/v1/comments/'
+LEADERBOARD = '/api/v1/leaderboard/'
+API_V1_TASK_STUDENTS = '/api/v1/task_students/'
 REGISTER = '/register/'
 USERNAME = 'username'
 PASSWORD = 'password'
@@ -55,6 +92,31 @@ DATE_PUBLICATION = 'date_publication'
 TEXT_COMMENT = 'text_comment'
 ID = 'id'
 MAIN_PAGE = '/'
+CSRF_INPUT = re.compile(b'name="csrfmiddlewaretoken" value="[^"]*"')
+HAMMER_THREADS = 8
+HAMMER_READS = 1000
+HAMMER_KEYS = 100
+HAMMER_CACHE_SIZE = 50
+NICKNAME_LIMIT = 100
+STRICT_THRESHOLD = 0.99
+SLOW_QUERY_LOG = 'slow_queries.ndjson'
+CALLER = 'main/a.py:1'
+SEED_TASKS = 20
+SEED_STUDENTS = 30
+SEED_SOLUTIONS = 150
+SEED_COMMENTS = 40
+DAY = '2022-12-12'
+HOST_A = 'a.example'
+HOST_B = 'b.example'
+SCHEMA_OBJECTS = "SELECT count(*) FROM sqlite_master WHERE type IN ('index', 'trigger')"
+LONG_NICKNAME = 'x' * (NICKNAME_LIMIT + 1)
+# The lines a page view must add to the exposition of the metrics.
+EXPOSED_LINES = (
+    '# TYPE http_request_duration_seconds histogram',
+    'http_request_duration_seconds_bucket{view="tasks_page",le="+Inf"}',
+    'http_responses_total{view="tasks_page",status="200"}',
+    'http_response_size_bytes_count{view="tasks_page"}',
+)
 
 
 class TestTask(TestCase):
@@ -211,6 +273,102 @@ class TestTask(TestCase):
         self.assertEqual(response.data, {ERROR: 'User already exists'})
 
 
+class KeysetPaginationTest(TestCase):
+    """Test the keyset pagination of the API."""
+
+    def setUp(self):
+        """Set up comments sharing the same ordering value."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER)
+        self.client.force_authenticate(user=self.user)
+        task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.comments = Comment.objects.bulk_create(
+            Comment(task_id=task, student=student, text_comment=str(index), date_publication=TEST_DATA)
+            for index in range(5)
+        )
+
+    def walk(self, url, link):
+        """
+        Follow the pagination links from a URL.
+
+        Args:
+            url (str): The URL of the first page.
+            link (str): The name of the link to follow, 'next' or 'previous'.
+
+        Returns:
+            list: The ids of the pages, in the order they were read.
+        """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([row[ID] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_walk_forward_and_back(self):
+        """Test walk forward and back."""
+        pages = self.walk(f'{API_V1_COMMENTS}?page_size=2', 'next')
+        ids = sorted(str(comment.id) for comment in self.comments)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), ids)
+        last_page = self.client.get(f'{API_V1_COMMENTS}?page_size=2').data
+        while last_page['next']:
+            last_page = self.client.get(last_page['next']).data
+        backwards = self.walk(last_page['previous'], 'previous')
+        self.assertEqual(backwards, [ids[2:4], ids[:2]])
+
+    def test_invalid_cursor(self):
+        """Test invalid cursor."""
+        response = self.client.get(f'{API_V1_COMMENTS}?cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class LeaderboardTest(TestCase):
+    """Test the leaderboard endpoint."""
+
+    def setUp(self):
+        """Set up students with different ratings."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER)
+        self.client.force_authenticate(user=self.user)
+        self.other_user = User.objects.create(username=USER_FIRST)
+        self.easy = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        self.hard = Task.objects.create(name='Task 2', difficulty=5, user=self.user)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.other = Student.objects.create(nickname='Student 2', user=self.other_user)
+        TaskStudent.objects.create(task=self.easy, student=self.student, solution='Solution 1')
+        TaskStudent.objects.create(task=self.hard, student=self.student, solution='Solution 2')
+        TaskStudent.objects.create(task=self.hard, student=self.other, solution='Solution 3')
+
+    def test_average_order(self):
+        """Test average order."""
+        response = self.client.get(LEADERBOARD, {'top': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row[NICKNAME] for row in response.data['top']], ['Student 2'])
+        self.assertEqual(response.data['me']['rank'], 2)
+
+    def test_total_order(self):
+        """Test total order."""
+        response = self.client.get(LEADERBOARD, {'order': 'total'})
+        self.assertEqual([row['rank'] for row in response.data['top']], [1, 2])
+        self.assertEqual(response.data['me']['difficulty_sum'], 6)
+        self.assertEqual(response.data['me']['rank'], 1)
+
+    def test_refreshed_after_solution(self):
+        """Test refreshed after solution."""
+        self.client.get(LEADERBOARD)
+        TaskStudent.objects.filter(student=self.student, task=self.easy).delete()
+        response = self.client.get(LEADERBOARD)
+        self.assertEqual([row['rank'] for row in response.data['top']], [1, 1])
+
+    def test_invalid_order(self):
+        """Test invalid order."""
+        response = self.client.get(LEADERBOARD, {'order': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class StudentModelTest(TestCase):
     """Test Student model."""
 
@@ -274,6 +432,1270 @@ class StudentModelTest(TestCase):
         self.assertEqual(str(self.comment), f'Comment by Task 1 at {datetime.date.today()}')
 
 
+class StudentCountersTest(TestCase):
+    """Test the denormalized solve counters of Student."""
+
+    def setUp(self):
+        """Set up test data for the counters."""
+        self.user = User.objects.create(username=TEST_USER)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        self.task2 = Task.objects.create(name='Task 2', difficulty=4, user=self.user)
+        self.solution = TaskStudent.objects.create(student=self.student, task=self.task, solution='Solution 1')
+        TaskStudent.objects.create(student=self.student, task=self.task2, solution='Solution 2')
+
+    def assert_counters(self, solved_count, difficulty_sum, rating):
+        """
+        Assert the counters stored in the database.
+
+        Args:
+            solved_count (int): The expected number of solved tasks.
+            difficulty_sum (int): The expected total difficulty.
+            rating (float): The expected rating.
+        """
+        self.student.refresh_from_db()
+        self.assertEqual(
+            (self.student.solved_count, self.student.difficulty_sum, self.student.rating),
+            (solved_count, difficulty_sum, rating),
+        )
+
+    def test_counters_on_create(self):
+        """Test counters on create."""
+        self.assert_counters(2, 5, 5 / 2)
+
+    def test_counters_on_delete(self):
+        """Test counters on delete."""
+        self.solution.delete()
+        self.assert_counters(1, 4, 4)
+
+    def test_counters_on_task_delete(self):
+        """Test counters on task delete."""
+        self.task2.delete()
+        self.assert_counters(1, 1, 1)
+
+    def test_counters_on_difficulty_change(self):
+        """Test counters on difficulty change."""
+        self.task.difficulty = 5
+        self.task.save()
+        self.assert_counters(2, 9, 9 / 2)
+
+    def test_counters_on_student_change(self):
+        """Test counters on student change."""
+        other = Student.objects.create(nickname='Student 2', user=self.user)
+        self.solution.student = other
+        self.solution.save()
+        self.assert_counters(1, 4, 4)
+        other.refresh_from_db()
+        self.assertEqual((other.solved_count, other.rating), (1, 1))
+
+    def test_rebuild_ratings_command(self):
+        """Test rebuild ratings command."""
+        Student.objects.update(solved_count=0, difficulty_sum=0, rating=0)
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assert_counters(2, 5, 5 / 2)
+
+
+class BulkApiTest(TestCase):
+    """Test the bulk actions of the task and task-student endpoints."""
+
+    def setUp(self):
+        """Set up a user with a student and two tasks."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER)
+        self.other = User.objects.create(username=USER_LAST)
+        self.client.force_authenticate(user=self.user)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        self.task2 = Task.objects.create(name='Task 2', difficulty=4, user=self.user)
+
+    def solve(self, *tasks):
+        """
+        Submit solutions of the tasks in one bulk request.
+
+        Args:
+            tasks (Task): The solved tasks.
+
+        Returns:
+            Response: The response of the bulk create.
+        """
+        payload = [{TASK: task.id, STUDENT: self.student.id, 'solution': task.name} for task in tasks]
+        return self.client.post(API_V1_TASK_STUDENTS, payload, format='json')
+
+    def test_bulk_create_tasks(self):
+        """Test bulk create tasks."""
+        payload = [{NAME: f'Bulk {index}', DESCRIPTION: DISC, DIFFICULTY: index} for index in range(3)]
+        payload.append({NAME: 'Bulk 3', DESCRIPTION: DISC, DIFFICULTY: 9})
+        response = self.client.post(API_V1_TASKS, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(len(response.data['created']), 3)
+        self.assertEqual([error['index'] for error in response.data['errors']], [3])
+        self.assertEqual(Task.objects.filter(user=self.user, name__startswith='Bulk').count(), 3)
+
+    def test_bulk_create_solutions(self):
+        """Test bulk create solutions with collisions."""
+        response = self.solve(self.task, self.task2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.solve(self.task, self.task)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], [0, 1])
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.solved_count, self.student.rating), (2, 2.5))
+
+    def test_bulk_create_duplicates_in_payload(self):
+        """Test bulk create rejects a pair repeated in the payload."""
+        response = self.solve(self.task, self.task)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1])
+        self.assertEqual(TaskStudent.objects.count(), 1)
+
+    def test_bulk_update_tasks(self):
+        """Test bulk update tasks."""
+        self.solve(self.task, self.task2)
+        foreign = Task.objects.create(name='Task 3', user=self.other)
+        payload = [
+            {ID: self.task.id, DIFFICULTY: 5},
+            {ID: foreign.id, DIFFICULTY: 5},
+            {DIFFICULTY: 5},
+        ]
+        response = self.client.patch(API_V1_TASKS, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['updated'], [self.task.id])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.difficulty_sum, self.student.rating), (9, 4.5))
+
+    def test_bulk_update_solutions(self):
+        """Test bulk update solutions."""
+        self.solve(self.task)
+        solution = TaskStudent.objects.get()
+        payload = [{ID: solution.id, 'solution': 'Updated'}, {ID: solution.id, TASK: self.task2.id}]
+        response = self.client.patch(API_V1_TASK_STUDENTS, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['errors'][0]['errors'], {TASK: ['This field cannot be updated in bulk.']})
+        solution.refresh_from_db()
+        self.assertEqual((solution.solution, solution.task_id), ('Updated', self.task.id))
+
+    def test_bulk_delete(self):
+        """Test bulk delete of tasks and solutions."""
+        self.solve(self.task, self.task2)
+        solution = TaskStudent.objects.get(task=self.task)
+        response = self.client.delete(API_V1_TASK_STUDENTS, [str(solution.id), 'missing'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data['deleted'], [solution.id])
+        response = self.client.delete(API_V1_TASKS, [self.task2.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.solved_count, self.student.difficulty_sum), (0, 0))
+        self.assertFalse(Task.objects.filter(pk=self.task2.pk).exists())
+
+
+class ExportTest(TestCase):
+    """Test the streaming export of the solutions."""
+
+    def setUp(self):
+        """Set up two tasks solved by one student."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER)
+        self.client.force_authenticate(user=self.user)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        self.task2 = Task.objects.create(name='Task 2', difficulty=4, user=self.user)
+        TaskStudent.objects.create(student=self.student, task=self.task, solution='print("a, b")')
+        TaskStudent.objects.create(student=self.student, task=self.task2, solution='Решение')
+
+    def read(self, url):
+        """
+        Read a streamed export.
+
+        Args:
+            url (str): The URL of the export.
+
+        Returns:
+            list: The lines of the export.
+        """
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_csv(self):
+        """Test export csv."""
+        lines = self.read(f'{API_V1_TASK_STUDENTS}export/csv/')
+        self.assertEqual(lines[0], 'id,task,task_name,student,student_nickname,solution')
+        self.assertEqual(len(lines), 3)
+        self.assertIn('"print(""a, b"")"', ''.join(lines))
+
+    def test_export_ndjson_filtered(self):
+        """Test export ndjson filtered by task."""
+        lines = self.read(f'{API_V1_TASK_STUDENTS}export/ndjson/?task={self.task2.id}')
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual((row[TASK], row['solution']), (str(self.task2.id), 'Решение'))
+
+    def test_export_invalid_filter(self):
+        """Test export with an invalid filter."""
+        response = self.client.get(f'{API_V1_TASK_STUDENTS}export/csv/?student=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResponseCacheTest(TestCase):
+    """Test the versioned response cache of the API."""
+
+    def setUp(self):
+        """Set up a staff user with a task."""
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER, is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+
+    def assert_cache(self, url, outcome):
+        """
+        Request a URL and check whether it was served from the cache.
+
+        Args:
+            url (str): The URL.
+            outcome (str): The expected X-Cache header.
+
+        Returns:
+            Response: The response.
+        """
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], outcome)
+        return response
+
+    def test_hit_until_write(self):
+        """Test a list is cached until a task changes."""
+        self.assert_cache(API_V1_TASKS, 'miss')
+        self.assert_cache(API_V1_TASKS, 'hit')
+        Task.objects.create(name='Task 2', user=self.user)
+        response = self.assert_cache(API_V1_TASKS, 'miss')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_dependent_model_invalidates(self):
+        """Test a new solution invalidates the cached task and student."""
+        student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        url = f'{API_V1_STUDENTS}{student.id}/'
+        self.assert_cache(url, 'miss')
+        TaskStudent.objects.create(task=self.task, student=student, solution='Solution')
+        response = self.assert_cache(url, 'miss')
+        self.assertEqual(response.data['solved_count'], 1)
+
+    def test_stats(self):
+        """Test the hit and miss counters."""
+        self.assert_cache(API_V1_COMMENTS, 'miss')
+        self.assert_cache(API_V1_COMMENTS, 'hit')
+        response = self.client.get('/api/v1/cache-stats/')
+        self.assertEqual(response.data['main.comment'], {'hits': 1, 'misses': 1, 'ratio': 0.5})
+
+    def test_bumps_never_repeat(self):
+        """Test every bump writes a new version, even with the file-based backend."""
+        label = versions.label_of(Task)
+        with tempfile.TemporaryDirectory() as directory:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+            with override_settings(CACHES={'default': backend}):
+                seen = {versions.get_version(label)}
+                for _ in range(3):
+                    versions.bump(label)
+                    seen.add(versions.get_version(label))
+        self.assertEqual(len(seen), 4)
+
+    @override_settings(ALLOWED_HOSTS=[HOST_A, HOST_B])
+    def test_host_in_key(self):
+        """Test a page cached for one host is not served to another, since its links are absolute."""
+        Task.objects.create(name='Task 2', user=self.user)
+        url = f'{API_V1_TASKS}?page_size=1'
+        self.assertEqual(self.client.get(url, HTTP_HOST=HOST_A)['X-Cache'], 'miss')
+        response = self.client.get(url, HTTP_HOST=HOST_B)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertTrue(response.data['next'].startswith(f'http://{HOST_B}/'))
+        self.assertEqual(self.client.get(url, HTTP_HOST=HOST_B)['X-Cache'], 'hit')
+
+    def test_file_based_backend(self):
+        """Test the cache with the file-based backend."""
+        with tempfile.TemporaryDirectory() as directory:
+            backend = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory}
+            with override_settings(CACHES={'default': backend}):
+                self.assert_cache(API_V1_TASKS, 'miss')
+                self.assert_cache(API_V1_TASKS, 'hit')
+                self.task.save()
+                self.assert_cache(API_V1_TASKS, 'miss')
+
+
+class ConditionalGetTest(TestCase):
+    """Test the ETag and Last-Modified validators of the API and the entity pages."""
+
+    def setUp(self):
+        """Set up a user with a task."""
+        self.user = User.objects.create(username=TEST_USER)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        self.api = APIClient()
+        self.api.force_authenticate(user=self.user)
+        self.url = f'{API_V1_TASKS}{self.task.id}/'
+
+    def test_api_not_modified(self):
+        """Test the API answers 304 without queries while nothing changes."""
+        response = self.api.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            cached = self.api.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        cached = self.api.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_api_modified(self):
+        """Test the ETag changes with the data."""
+        etag = self.api.get(self.url)['ETag']
+        self.task.difficulty = 2
+        self.task.save()
+        response = self.api.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[DIFFICULTY], 2)
+
+    def test_page_not_modified(self):
+        """Test the task page answers 304 to the same user only."""
+        self.client.force_login(self.user)
+        url = reverse(TASK, args=[self.task.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.force_login(User.objects.create(username=USER_LAST))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_page_modified_by_comment(self):
+        """Test a new comment changes the ETag of the task page."""
+        self.client.force_login(self.user)
+        url = reverse(TASK, args=[self.task.id])
+        etag = self.client.get(url)['ETag']
+        student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        Comment.objects.create(task_id=self.task, student=student, text_comment=COMMENT_FIRST)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class TokenCacheTest(TestCase):
+    """Test the cached token authentication."""
+
+    def setUp(self):
+        """Set up a user with a token."""
+        token_cache.clear()
+        self.user = User.objects.create_user(username=TEST_USER, password=TEST_PASSWORD)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+
+    def get(self, token):
+        """
+        Request the leaderboard with a token.
+
+        Args:
+            token (Token): The token.
+
+        Returns:
+            Response: The response.
+        """
+        return self.client.get(LEADERBOARD, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_cached_credentials(self):
+        """Test the second request does not read the token."""
+        self.assertEqual(self.get(self.token).status_code, status.HTTP_200_OK)
+        queries = CaptureQueriesContext(connection)
+        with queries:
+            self.assertEqual(self.get(self.token).status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'authtoken_token' in query['sql']])
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_rotated_token(self):
+        """Test a rotated token is rejected at once."""
+        self.get(self.token)
+        self.token.delete()
+        rotated = Token.objects.create(user=self.user)
+        self.assertEqual(self.get(self.token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(rotated).status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user(self):
+        """Test the token of a deactivated user is rejected at once."""
+        self.get(self.token)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_lru_and_ttl(self):
+        """Test the least recently used and the expired tokens are evicted."""
+        lru = TokenCache(max_size=2, ttl=60)
+        for seeded in ('a', 'b'):
+            lru.set(seeded, (self.user, None), 1)
+        lru.get('a', 1)
+        lru.set('c', (self.user, None), 1)
+        cached = [lru.get(key, 1) for key in ('a', 'b', 'c')]
+        self.assertEqual([credentials is not None for credentials in cached], [True, False, True])
+        expired = TokenCache(ttl=0)
+        expired.set('a', (self.user, None), 1)
+        self.assertIsNone(expired.get('a', 1))
+
+    def hammer(self, lru, offset):
+        """
+        Read a token cache and fill in the misses, like a request thread.
+
+        Args:
+            lru (TokenCache): The cache.
+            offset (int): The first key of the thread.
+        """
+        for index in range(HAMMER_READS):
+            key = str((offset + index) % HAMMER_KEYS)
+            if lru.get(key, 1) is None:
+                lru.set(key, (self.user, None), 1)
+
+    def test_thread_safety(self):
+        """Test concurrent reads and writes keep the counters and the bound."""
+        lru = TokenCache(max_size=HAMMER_CACHE_SIZE, ttl=60)
+        threads = [threading.Thread(target=self.hammer, args=(lru, offset)) for offset in range(HAMMER_THREADS)]
+        for started in threads:
+            started.start()
+        for running in threads:
+            running.join()
+        stats = lru.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], HAMMER_THREADS * HAMMER_READS)
+        self.assertLessEqual(stats['size'], HAMMER_CACHE_SIZE)
+
+
+class SearchTest(TestCase):
+    """Test the full-text search over tasks, comments and solutions."""
+
+    def setUp(self):
+        """Set up tasks with a comment and a solution."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER)
+        self.client.force_authenticate(user=self.user)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.graph = Task.objects.create(name='Обход графа', description='Поиск в ширину', user=self.user)
+        self.tree = Task.objects.create(name='Деревья', description='Обход дерева и графа', user=self.user)
+        Comment.objects.create(task_id=self.tree, student=self.student, text_comment='Подсказка про граф')
+        TaskStudent.objects.create(task=self.graph, student=self.student, solution='def bfs(graph): pass')
+
+    def search(self, query, **query_params):
+        """
+        Search and return the kinds and the names or texts of the results.
+
+        Args:
+            query (str): The q parameter.
+            query_params (dict): The other query parameters.
+
+        Returns:
+            Response: The response.
+        """
+        return self.client.get('/api/v1/search/', {'q': query, **query_params})
+
+    def test_ranked_results(self):
+        """Test a word in the name outranks the same word in the description."""
+        found = self.search('ГРАФА').data['results']
+        self.assertEqual([hit['object'][NAME] for hit in found], ['Обход графа', 'Деревья'])
+
+    def test_kinds(self):
+        """Test comments and solutions are searched and the type parameter restricts the kinds."""
+        self.assertEqual([hit['type'] for hit in self.search('граф').data['results']], ['comment'])
+        found = self.search('graph', type='solution').data['results']
+        self.assertEqual(found[0]['object']['solution'], 'def bfs(graph): pass')
+        self.assertEqual(self.search('граф', type='task').data['results'], [])
+
+    def test_index_follows_writes(self):
+        """Test updates, deletes and bulk inserts reach the index."""
+        self.graph.description = 'Алгоритм Дейкстры'
+        self.graph.save()
+        self.assertEqual(len(self.search('Дейкстры').data['results']), 1)
+        self.assertEqual(len(self.search('ширину').data['results']), 0)
+        Task.objects.bulk_create([Task(name='Дейкстра', description='Кратчайший путь', user=self.user)])
+        self.assertEqual(len(self.search('кратчайший').data['results']), 1)
+        self.tree.delete()
+        self.assertEqual(len(self.search('дерева').data['results']), 0)
+
+    def test_renumbered_rowids(self):
+        """Test the index keeps finding, updating and deleting objects after their rowids change, as on VACUUM."""
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE main_task SET rowid = rowid + 1000')
+        self.assertEqual(len(self.search('графа', type='task').data['results']), 2)
+        self.graph.name = 'Алгоритм Дейкстры'
+        self.graph.save()
+        self.assertEqual(len(self.search('Дейкстры').data['results']), 1)
+        self.tree.delete()
+        self.assertEqual(self.search('графа', type='task').data['results'], [])
+
+    def test_pagination(self):
+        """Test the next links walk through every result once."""
+        tasks = [Task(name=f'Граф {index}', user=self.user) for index in range(5)]
+        Task.objects.bulk_create(tasks)
+        response = self.search('граф', type='task', page_size=2)
+        names = []
+        while True:
+            names.extend(hit['object'][NAME] for hit in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(names), 5)
+        self.assertEqual(len(set(names)), 5)
+
+    def test_invalid_input(self):
+        """Test queries without words, unknown kinds and broken cursors are rejected."""
+        self.assertEqual(self.search('"*(').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search('граф', type='user').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.search('граф', cursor='broken').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores lost triggers."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER main_task_fts_insert')
+        call_command('rebuild_search', stdout=StringIO())
+        Task.objects.create(name='Матрица', user=self.user)
+        self.assertEqual(len(self.search('матрица').data['results']), 1)
+
+
+class SimilarSolutionsTest(TestCase):
+    """Test the near-duplicate detection of solutions."""
+
+    original = '\n'.join((
+        'def solve(numbers):',
+        '    total = 0',
+        '    for number in numbers:',
+        '        total += number * number',
+        '    return total',
+    ))
+
+    def setUp(self):
+        """Set up a task with an original, a copied and an unrelated solution."""
+        self.client = APIClient()
+        self.user = User.objects.create(username=TEST_USER, is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, user=self.user)
+        nicknames = [f'Student {index}' for index in range(4)]
+        students = [Student.objects.create(nickname=nickname, user=self.user) for nickname in nicknames]
+        self.first = TaskStudent.objects.create(task=self.task, student=students[0], solution=self.original)
+        self.copy = TaskStudent.objects.create(
+            task=self.task, student=students[1], solution=f'{self.original}  # squares',
+        )
+        TaskStudent.objects.create(task=self.task, student=students[2], solution='print(sum(x ** 2 for x in input()))')
+        self.students = students
+
+    def similar(self, solution, **query_params):
+        """
+        Request the solutions similar to one.
+
+        Args:
+            solution (TaskStudent): The solution.
+            query_params (dict): The query parameters.
+
+        Returns:
+            Response: The response.
+        """
+        return self.client.get(f'{API_V1_TASK_STUDENTS}{solution.id}/similar/', query_params)
+
+    def test_similar_endpoint(self):
+        """Test a copy with an added comment is found and an unrelated solution is not."""
+        response = self.similar(self.first, threshold=0.5)
+        found = [match['solution'][ID] for match in response.data]
+        self.assertEqual(found, [str(self.copy.id)])
+        self.assertGreater(response.data[0]['similarity'], 0.5)
+        self.assertEqual(self.similar(self.first, threshold=2).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_signature_is_universal_hash(self):
+        """Test every value of a signature is the exact (a * x + b) mod p hash, without 64-bit wrap-around."""
+        shingle = blake2b(b'a b c', digest_size=4).digest()
+        hashed = int.from_bytes(shingle, 'little')
+        coefficients = zip(FACTORS.tolist(), OFFSETS.tolist())
+        expected = [(factor * hashed + offset) % HASH_PRIME for factor, offset in coefficients]
+        self.assertEqual(signature('A b c').tolist(), expected)
+
+    def test_index_is_incremental(self):
+        """Test saving a solution writes its signature and buckets with a fixed number of queries."""
+        solution = TaskStudent.objects.bulk_create(
+            [TaskStudent(task=self.task, student=self.students[3], solution=self.original)],
+        )[0]
+        queries = CaptureQueriesContext(connection)
+        with queries:
+            index_solutions([solution])
+        self.assertLessEqual(len([query for query in queries if 'solution' in query['sql']]), 3)
+        self.copy.solution = 'something else entirely'
+        self.copy.save()
+        found = [match['solution'][ID] for match in self.similar(self.first, threshold=0.5).data]
+        self.assertEqual(found, [str(solution.id)])
+
+    def test_bulk_create_indexes(self):
+        """Test solutions created through the bulk API are indexed."""
+        student = self.students[3]
+        payload = {TASK: str(self.task.id), STUDENT: str(student.id), 'solution': self.original}
+        response = self.client.post(API_V1_TASK_STUDENTS, [payload], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.similar(self.first, threshold=STRICT_THRESHOLD).data), 1)
+
+    def test_report_command(self):
+        """Test the report finds the copied pair and indexes bulk-inserted solutions on request."""
+        duplicate = TaskStudent(task=self.task, student=self.students[3], solution=self.original)
+        TaskStudent.objects.bulk_create([duplicate])
+        out = StringIO()
+        call_command('report_duplicates', '--reindex', 'missing', '--threshold', '0.9', stdout=out, stderr=StringIO())
+        rows = out.getvalue().splitlines()
+        self.assertEqual(rows[0], 'task,first_solution,first_student,second_solution,second_student,similarity')
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].endswith('1.000'))
+
+
+class MetricsTest(TestCase):
+    """Test the request metrics."""
+
+    def setUp(self):
+        """Set up a staff client with a token and some data."""
+        self.staff = User.objects.create(username=TEST_USER, is_staff=True)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.staff).key}')
+        Task.objects.create(name=TASK_FIRST, user=self.staff)
+
+    def test_metrics_of_views(self):
+        """Test the latency, the queries, the render time and the size of a page are exposed by view name."""
+        Client().get(reverse('tasks_page'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        for line in EXPOSED_LINES:
+            self.assertIn(line, text)
+        queries = re.search(r'http_request_db_queries_sum\{view="tasks_page"\} (\S+)', text)
+        self.assertGreater(float(queries.group(1)), 0)
+        rendered = re.search(r'http_request_template_duration_seconds_sum\{view="tasks_page"\} (\S+)', text)
+        self.assertGreater(float(rendered.group(1)), 0)
+
+    def test_staff_only(self):
+        """Test the metrics are hidden from other users."""
+        client = APIClient()
+        client.force_authenticate(User.objects.create(username='other'))
+        self.assertEqual(client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_processes_share_directory(self):
+        """Test a scrape adds up the files written by every process to METRICS_DIR."""
+        labels = (('view', 'elsewhere'),)
+        other = MetricsStore()
+        other.record(DB_QUERIES, labels, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            other.flush(directory, force=True)
+            with override_settings(METRICS_DIR=directory):
+                metrics.record(DB_QUERIES, labels, 1)
+                counters = metrics.collect()
+        self.assertEqual(counters['http_request_db_queries', labels][-1], 4)
+
+
+class ProfilingTest(TestCase):
+    """Test the on-demand profiling of requests."""
+
+    def setUp(self):
+        """Set up a staff user with a token and some data."""
+        self.staff = User.objects.create(username=TEST_USER, is_staff=True)
+        self.token = Token.objects.create(user=self.staff)
+        Task.objects.create(name=TASK_FIRST, user=self.staff)
+
+    def test_html_report(self):
+        """Test a staff user gets the call tree, the functions and the queries of a page."""
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(reverse('tasks_page'), {'profile': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(int(response['X-Profile-Queries']), 0)
+        page = response.content.decode()
+        self.assertIn('class="icicle"', page)
+        self.assertIn('main_task', page)
+
+    def test_pstats_download(self):
+        """Test a token client downloads stats that pstats can read."""
+        response = APIClient().get(
+            API_V1_STUDENTS, HTTP_AUTHORIZATION=f'Token {self.token.key}', HTTP_X_PROFILE='pstats',
+        )
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="student-list-'))
+        with tempfile.NamedTemporaryFile(suffix='.prof') as dump:
+            dump.write(response.content)
+            dump.flush()
+            stats = pstats.Stats(dump.name).stats
+        self.assertTrue(any(name == 'list' for _, _, name in stats))
+
+    def test_other_users_are_not_profiled(self):
+        """Test the flag of a user who is not staff is ignored."""
+        client = Client()
+        client.force_login(User.objects.create(username='other'))
+        response = client.get(reverse('tasks_page'), {'profile': 'html'})
+        self.assertNotIn('X-Profile-Queries', response)
+        self.assertIn('tasks', response.templates[0].name)
+
+
+class SlowQueryLogTest(TestCase):
+    """Test the slow query log and its summary."""
+
+    def setUp(self):
+        """Set up a user with a task."""
+        cache.clear()
+        self.user = User.objects.create(username=TEST_USER, is_staff=True)
+        self.task = Task.objects.create(name=TASK_FIRST, user=self.user)
+
+    def logged(self, url):
+        """
+        Request a URL with every query logged.
+
+        Args:
+            url (str): The URL.
+
+        Returns:
+            list: The entries of the log.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=SLOW_QUERY_LOG):
+            with self.assertLogs('main.slow_queries', 'WARNING') as logs:
+                client.get(url)
+                return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_disabled_by_default(self):
+        """Test no query is logged and the summary asks for the files without SLOW_QUERY_LOG."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=None):
+            with self.assertNoLogs('main.slow_queries', 'WARNING'):
+                client.get(f'{API_V1_TASKS}{self.task.id}/')
+            with self.assertRaisesMessage(CommandError, 'set SLOW_QUERY_LOG'):
+                call_command('summarize_slow_queries', stdout=StringIO())
+
+    def test_entries_name_view_and_caller(self):
+        """Test an entry has the SQL, the parameters, the view action and the calling line in main."""
+        entries = self.logged(f'{API_V1_TASKS}{self.task.id}/')
+        task_entries = [entry for entry in entries if entry['view'] == 'task-detail']
+        entry = next(entry for entry in task_entries if 'main_task' in entry['sql'])
+        self.assertEqual(entry['action'], 'retrieve')
+        self.assertIn(self.task.id.hex, entry['params'])
+        self.assertGreaterEqual(entry['duration_ms'], 0)
+        self.assertTrue(entry['stack'][-1].startswith('main/'))
+
+    def test_summary_groups_by_fingerprint(self):
+        """Test the summary adds up the queries differing only in their values."""
+        entries = [
+            {
+                'sql': 'SELECT * FROM t WHERE id IN (%s, %s)',  # noqa: WPS323
+                'duration_ms': 30, 'view': 'task', 'stack': [CALLER],
+            },
+            {
+                'sql': 'SELECT  *  FROM t WHERE id IN (%s)',  # noqa: WPS323
+                'duration_ms': 20, 'view': 'task', 'stack': [CALLER],
+            },
+            {'sql': "SELECT * FROM u WHERE name = 'x'", 'duration_ms': 40, 'view': 'student-list', 'action': 'list'},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'slow.ndjson'
+            path.write_text('\n'.join([*map(json.dumps, entries), 'not json', '']))
+            out = StringIO()
+            call_command('summarize_slow_queries', str(path), '--json', stdout=out, stderr=StringIO())
+        groups = json.loads(out.getvalue())
+        self.assertEqual([group['total_ms'] for group in groups], [50, 40])
+        self.assertEqual(groups[0]['fingerprint'], 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(groups[0]['caller'], CALLER)
+        self.assertEqual(groups[1]['views'], {'student-list.list': 1})
+
+
+def read_alias(request):
+    """
+    Report the database the reads of a request go to.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The alias of the tasks and the tokens as the body.
+    """
+    return HttpResponse(f'{router.db_for_read(Task)} {router.db_for_read(Token)}')
+
+
+def write_then_read(request):
+    """
+    Create a token, then report the database the reads of the request go to.
+
+    Args:
+        request (HttpRequest): The request object.
+
+    Returns:
+        HttpResponse: The alias of the tasks and the tokens as the body.
+    """
+    Token.objects.create(user=User.objects.create(username=TEST_USER))
+    return read_alias(request)
+
+
+@override_settings(REPLICA_DATABASES=['replica'], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    """Test the routing of reads between the primary and the replicas."""
+
+    def setUp(self):
+        """Set up the middleware around a view reporting the read database."""
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(read_alias)
+        cache.clear()
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test commands and the shell read from the primary."""
+        self.assertEqual(router.db_for_read(Task), 'default')
+        self.assertEqual(router.db_for_write(Task), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'main'))
+
+    def test_get_reads_replica(self):
+        """Test a GET reads from a replica, except for the tokens, and does not pin the client."""
+        response = self.middleware(self.factory.get('/'))
+        self.assertEqual(response.content, b'replica default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_write_pins_client(self):
+        """Test a POST pins the browser by a cookie and a token client by its header."""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        response = self.middleware(self.factory.post('/', **auth))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+        self.assertEqual(self.middleware(self.factory.get('/', **auth)).content, b'default default')
+        browser = self.factory.get('/')
+        browser.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(self.middleware(browser).content, b'default default')
+        self.assertEqual(self.middleware(self.factory.get('/')).content, b'replica default')
+
+    def test_write_in_get_switches_to_primary(self):
+        """Test the reads after a write in a GET request go to the primary."""
+        response = ReplicaRoutingMiddleware(write_then_read)(self.factory.get('/'))
+        self.assertEqual(response.content, b'default default')
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_copy_inside_transaction_fails(self):
+        """Test copying the primary inside a transaction fails instead of waiting for it forever."""
+        with self.assertRaises(TransactionManagementError):
+            copy_primary('unused.sqlite3')
+
+
+@override_settings(REPLICA_DATABASES=['default'], REPLICA_STICKY_SECONDS=5)
+class ReplicaCacheTest(TestCase):
+    """Test what is read from a replica is not cached under the versions of the primary."""
+
+    def setUp(self):
+        """Set up a writer and a reader authenticated by tokens; the replica is the test database itself."""
+        cache.clear()
+        token_cache.clear()
+        self.writer = self.token_client(User.objects.create(username=USER_FIRST, is_staff=True))
+        self.reader = self.token_client(User.objects.create(username=USER_LAST))
+
+    def token_client(self, user):
+        """
+        Build an API client authenticated by a token of a user.
+
+        Args:
+            user (User): The user.
+
+        Returns:
+            APIClient: The client.
+        """
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+        return client
+
+    def test_replica_reads_are_not_cached(self):
+        """Test a list read from a replica after a write is not cached and the writer then reads its write."""
+        response = self.writer.post(API_V1_TASKS, {NAME: TASK_FIRST, DESCRIPTION: DISC, DIFFICULTY: 1})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.reader.get(API_V1_TASKS)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertNotIn('ETag', response)
+        response = self.writer.get(API_V1_TASKS)
+        self.assertEqual(response['X-Cache'], 'miss')
+        self.assertIn('ETag', response)
+        self.assertEqual([task[NAME] for task in response.data['results']], [TASK_FIRST])
+        self.assertEqual(self.reader.get(API_V1_TASKS)['X-Cache'], 'hit')
+
+
+class ReplicaCopyTest(TransactionTestCase):
+    """Test the replica stand-in."""
+
+    def test_copy_primary(self):
+        """Test the copy holds the committed rows of the primary."""
+        Task.objects.create(name=TASK_FIRST, user=User.objects.create(username=TEST_USER))
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / 'replica.sqlite3')
+            copy_primary(path)
+            with closing(sqlite3.connect(path)) as copy:
+                names = copy.execute('SELECT name FROM main_task').fetchall()
+        self.assertEqual(names, [(TASK_FIRST,)])
+
+
+@override_settings(ROOT_URLCONF='django_project.urls_async')
+class AsyncViewsTest(TestCase):
+    """Test the async read-only views render what the sync views render."""
+
+    def setUp(self):
+        """Set up a task solved and commented by a student, and a token."""
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create(username=TEST_USER)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        TaskStudent.objects.create(task=self.task, student=self.student, solution='Solution')
+        self.comment = Comment.objects.create(task_id=self.task, student=self.student, text_comment=COMMENT_FIRST)
+        self.auth = {'Authorization': f'Token {Token.objects.create(user=self.user).key}'}
+        self.async_client = AsyncClient()
+
+    async def test_pages_match_sync(self):
+        """Test every async page renders the same HTML as its sync view."""
+        await self.async_client.aforce_login(self.user)
+        await self.client.aforce_login(self.user)
+        urls = (
+            reverse('tasks_page'),
+            reverse('students_page'),
+            reverse('comments_page'),
+            reverse(TASK, args=[self.task.id]),
+            reverse(STUDENT, args=[self.student.id]),
+            reverse(COMMENT, args=[self.comment.id]),
+        )
+        for url in urls:
+            with override_settings(ROOT_URLCONF='django_project.urls'):
+                expected = await sync_to_async(self.client.get)(url)
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(CSRF_INPUT.sub(b'', response.content), CSRF_INPUT.sub(b'', expected.content))
+
+    async def test_page_not_modified(self):
+        """Test an async entity page answers 304 to matching validators."""
+        await self.async_client.aforce_login(self.user)
+        url = reverse(TASK, args=[self.task.id])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_api_shares_the_response_cache(self):
+        """Test the async API returns the data cached by the sync API and caches its own misses."""
+        api = APIClient()
+        url = f'{API_V1_TASKS}{self.task.id}/'
+        with override_settings(ROOT_URLCONF='django_project.urls'):
+            expected = await sync_to_async(api.get)(url, HTTP_AUTHORIZATION=self.auth['Authorization'])
+        response = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(response['X-Cache'], 'hit')
+        self.assertEqual(response.content, expected.content)
+        response = await self.async_client.get(API_V1_TASKS, headers=self.auth)
+        self.assertEqual(response['X-Cache'], 'miss')
+        first = response.json()['results'][0]
+        self.assertEqual(first['students'], [str(self.student.id)])
+        response = await self.async_client.get(API_V1_TASKS, headers=self.auth)
+        self.assertEqual(response['X-Cache'], 'hit')
+
+    async def test_api_errors(self):
+        """Test the async API rejects missing credentials and unknown objects like the sync API."""
+        response = await self.async_client.get(API_V1_COMMENTS)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get(API_V1_COMMENTS, headers={'Authorization': 'Token wrong'})
+        self.assertEqual(response.json(), {'detail': 'Invalid token.'})
+        response = await self.async_client.get(f'{API_V1_STUDENTS}unknown/', headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(f'{API_V1_STUDENTS}?cursor=bad', headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_api_writes_use_sync_views(self):
+        """Test the writes on the async routes are handled by the viewsets."""
+        response = await self.async_client.post(
+            API_V1_TASKS, {NAME: 'Task 2', DESCRIPTION: DISC, DIFFICULTY: 2}, headers=self.auth,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = await self.async_client.get(API_V1_TASKS, headers=self.auth)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class SparseFieldsTest(TestCase):
+    """Test the fields and expand parameters of the API."""
+
+    def setUp(self):
+        """Set up a task solved by a student, and a token."""
+        cache.clear()
+        self.user = User.objects.create(username=TEST_USER)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, description=DISC, difficulty=1, user=self.user)
+        TaskStudent.objects.create(task=self.task, student=self.student, solution='Solution')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_fields(self):
+        """Test only the requested fields are rendered."""
+        response = self.client.get(API_V1_TASKS, {'fields': 'id,name,difficulty'})
+        task = {ID: str(self.task.id), NAME: TASK_FIRST, DIFFICULTY: 1}
+        self.assertEqual(response.json()['results'], [task])
+
+    def test_expand(self):
+        """Test expanded relations are rendered as flat objects along with the requested fields."""
+        url = f'{API_V1_TASKS}{self.task.id}/'
+        response = self.client.get(url, {'fields': NAME, 'expand': 'students,user'})
+        self.assertEqual(response.json(), {
+            NAME: TASK_FIRST,
+            USER: {ID: self.user.id, USERNAME: TEST_USER},
+            'students': [{
+                ID: str(self.student.id),
+                USER: TEST_USER,
+                NICKNAME: STUDENT_FIRST,
+                REGISTRATION_DATE: str(self.student.registration_date),
+                'solved_count': 1,
+                'difficulty_sum': 1,
+                'rating': 1.0,
+            }],
+        })
+
+    def test_unknown_names(self):
+        """Test unknown fields and relations are rejected."""
+        response = self.client.get(API_V1_TASKS, {'fields': 'id,secret', 'expand': 'comments'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {
+            'expand': ['Unknown relations: comments'], 'fields': ['Unknown fields: secret'],
+        })
+
+    def test_expanded_cache_follows_related_versions(self):
+        """Test a cached response with expanded students is refreshed when a student changes."""
+        query = {'fields': ID, 'expand': 'students'}
+        self.client.get(API_V1_TASKS, query)
+        Student.objects.filter(pk=self.student.pk).update(nickname='Renamed')
+        versions.bump(versions.label_of(Student))
+        task = self.client.get(API_V1_TASKS, query).json()['results'][0]
+        self.assertEqual(task['students'][0][NICKNAME], 'Renamed')
+
+    @override_settings(ROOT_URLCONF='django_project.urls_async')
+    async def test_async_matches_sync(self):
+        """Test the async API renders the same sparse and expanded objects as the sync API."""
+        auth = {'Authorization': f'Token {(await Token.objects.acreate(user=self.user)).key}'}
+        url = f'{API_V1_TASK_STUDENTS}?fields=solution&expand=task,student'
+        with override_settings(ROOT_URLCONF='django_project.urls'):
+            expected = await sync_to_async(self.client.get)(url)
+        await sync_to_async(cache.clear)()
+        response = await AsyncClient().get(url, headers=auth)
+        self.assertEqual(response.json(), expected.json())
+        response = await AsyncClient().get(f'{API_V1_TASKS}?fields=secret', headers=auth)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class RowListTest(TestCase):
+    """Test the lists rendered from values_list() rows match the lists rendered by the serializers."""
+
+    viewsets = (TaskViewSet, StudentViewSet, TaskStudentViewSet, CommentViewSet)
+    urls = (API_V1_TASKS, API_V1_STUDENTS, API_V1_TASK_STUDENTS, API_V1_COMMENTS)
+
+    def setUp(self):
+        """Set up tasks and students with equal ordering values, solutions and comments."""
+        self.user = User.objects.create(username=TEST_USER)
+        tasks = []
+        for difficulty in range(4):
+            tasks.append(Task.objects.create(name=TASK_FIRST, difficulty=difficulty, user=self.user))
+        students = []
+        for number in range(3):
+            students.append(Student.objects.create(nickname=f'Student {number}', user=self.user))
+        for index, task in enumerate(tasks):
+            for student in students[:index]:
+                TaskStudent.objects.create(task=task, student=student, solution=f'Solution {index}')
+            Comment.objects.create(task_id=task, student=students[0], text_comment=COMMENT_FIRST)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def walk(self, url):
+        """
+        Read every page of a list.
+
+        Args:
+            url (str): The URL of the first page.
+
+        Returns:
+            list: The bodies of the pages.
+        """
+        pages = []
+        while url:
+            response = self.client.get(url)
+            pages.append(response.content)
+            url = response.json()['next']
+        return pages
+
+    def assert_rows_match(self, viewset, url):
+        """
+        Assert every page of a list is the same rendered from rows and by the serializer.
+
+        Args:
+            viewset (type): The viewset of the list.
+            url (str): The URL of the first page.
+        """
+        self.assertIsNotNone(row_plan(viewset.serializer_class))
+        rows = self.walk(url)
+        with patch.object(viewset, 'row_list', new=False):
+            self.assertEqual(rows, self.walk(url))
+
+    def test_rows_match_serializers(self):
+        """Test every page of every list is the same byte for byte, with all and with sparse fields."""
+        for viewset, url in zip(self.viewsets, self.urls):
+            for query in ('?page_size=2', '?page_size=3&fields=id,user'):
+                with self.subTest(url=url, query=query):
+                    self.assert_rows_match(viewset, f'{url}{query}')
+
+    def test_field_orders_share_a_plan(self):
+        """Test every order of the requested fields shares the plan of the declared order."""
+        row_plan.cache_clear()
+        for fields in permutations((ID, NAME, DIFFICULTY)):
+            sparse_plan(TaskViewSet.serializer_class, {'fields': fields})
+        self.assertEqual(row_plan.cache_info().currsize, 1)
+        self.assertEqual(row_plan.cache_info().maxsize, ROW_PLANS)
+
+    @override_settings(ROOT_URLCONF='django_project.urls_async')
+    async def test_async_rows_match_serializers(self):
+        """Test the async lists rendered from rows match the sync lists rendered by the serializers."""
+        auth = {'Authorization': f'Token {(await Token.objects.acreate(user=self.user)).key}'}
+        for viewset, url in zip(self.viewsets, self.urls):
+            with patch.object(viewset, 'row_list', new=False):
+                with override_settings(ROOT_URLCONF='django_project.urls'):
+                    expected = await sync_to_async(self.client.get)(url)
+            response = await AsyncClient().get(url, headers=auth)
+            self.assertEqual(response.json(), expected.json())
+
+
+class RendererTest(TestCase):
+    """Test the orjson and MessagePack renderers and parsers."""
+
+    def setUp(self):
+        """Set up a superuser and a task with a non-ASCII name."""
+        cache.clear()
+        self.user = User.objects.create_superuser(username=TEST_USER, password=PASSWORD)
+        Task.objects.create(name='Задача', difficulty=1, user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_json_matches_drf(self):
+        """Test the JSON is the same the JSON renderer of DRF renders."""
+        response = self.client.get(API_V1_TASKS)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    @skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_converts_like_drf(self):
+        """Test orjson renders the values it does not handle natively the way the JSON renderer of DRF does."""
+        payload = {
+            'lazy': gettext_lazy('Задача'),
+            'amount': Decimal('1.5'),
+            1: uuid.UUID(int=1),
+            'day': datetime.date.fromisoformat(DAY),
+        }
+        self.assertEqual(OrjsonRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_json_parser(self):
+        """Test JSON bodies are parsed, and invalid ones rejected."""
+        body = json.dumps({NAME: TASK_FIRST, DESCRIPTION: DISC, DIFFICULTY: 2})
+        response = self.client.post(API_V1_TASKS, body, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Task.objects.filter(name=TASK_FIRST, difficulty=2).exists())
+        response = self.client.post(API_V1_TASKS, '{"name": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error'))
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        """Test MessagePack is rendered on request and parsed."""
+        response = self.client.get(API_V1_TASKS, HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response['Content-Type'], MSGPACK)
+        self.assertEqual(msgpack.unpackb(response.content), self.client.get(API_V1_TASKS).json())
+        body = msgpack.packb({NAME: TASK_FIRST, DESCRIPTION: DISC, DIFFICULTY: 2})
+        response = self.client.post(API_V1_TASKS, body, content_type=MSGPACK, HTTP_ACCEPT=MSGPACK)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(response.content)[NAME], TASK_FIRST)
+        response = self.client.post(API_V1_TASKS, b'\x93\x01', content_type=MSGPACK)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportUsersTest(TestCase):
+    """Test the import_users command."""
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_import_users(self):
+        """Test import users with invalid rows."""
+        User.objects.create(username='taken')
+        rows = [
+            'username,password,nickname',
+            'new1,Secret1!,Student 1',
+            'taken,Secret2!,Student 2',
+            'new1,Secret3!,Student 3',
+            'new2,,Student 4',
+            f'new3,Secret5!,{LONG_NICKNAME}',
+            'new4,Secret6!,Student 6',
+        ]
+        errors = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'users.csv'
+            path.write_text('\n'.join(rows))
+            call_command(
+                'import_users', str(path), '--batch-size', '2', '--workers', '2', stdout=StringIO(), stderr=errors,
+            )
+        self.assertEqual([line.split(':')[0] for line in errors.getvalue().splitlines()], [
+            'line 3', 'line 4', 'line 5', 'line 6',
+        ])
+        self.assertEqual(sorted(Student.objects.values_list(NICKNAME, flat=True)), ['Student 1', 'Student 6'])
+        self.assertTrue(User.objects.get(username='new4').check_password('Secret6!'))
+        self.assertEqual(Token.objects.filter(user__username__in=['new1', 'new4']).count(), 2)
+
+
+class SeedDataTest(TestCase):
+    """Test the seed_data command."""
+
+    options = (
+        '--users', '3',
+        '--tasks', str(SEED_TASKS),
+        '--students', str(SEED_STUDENTS),
+        '--solutions', str(SEED_SOLUTIONS),
+        '--comments', str(SEED_COMMENTS),
+    )
+
+    def seed(self, *options):
+        """
+        Run the command with the small counts.
+
+        Args:
+            options (tuple): More options.
+
+        Returns:
+            list: The ids of the solutions.
+        """
+        call_command('seed_data', *self.options, '--batch-size', '7', *options, stdout=StringIO())
+        return sorted(TaskStudent.objects.values_list('id', flat=True))
+
+    def test_seed_data(self):
+        """Test the counts, the skew and the counters of the generated rows."""
+        solutions = self.seed()
+        self.assertEqual(
+            [Task.objects.count(), Student.objects.count(), len(solutions), Comment.objects.count()],
+            [SEED_TASKS, SEED_STUDENTS, SEED_SOLUTIONS, SEED_COMMENTS],
+        )
+        counts = sorted(Student.objects.values_list('solved_count', flat=True), reverse=True)
+        self.assertEqual(sum(counts), SEED_SOLUTIONS)
+        self.assertEqual(counts[0], SEED_TASKS)
+        self.assertGreater(counts[0], counts[SEED_STUDENTS // 2] * 3)
+        student = Student.objects.filter(solved_count=counts[1]).first()
+        self.assertEqual(student.difficulty_sum, sum(student.tasks.values_list('difficulty', flat=True)))
+        self.assertEqual(student.rating, round(student.difficulty_sum / student.solved_count, 2))
+
+    def test_indexes_rebuilt(self):
+        """Test the indexes and the triggers dropped for the load are back and the search index is filled."""
+        with connection.cursor() as cursor:
+            cursor.execute(SCHEMA_OBJECTS)
+            schema = cursor.fetchone()[0]
+        self.seed()
+        word = TaskStudent.objects.first().solution.split()[0]
+        with connection.cursor() as seeded:
+            seeded.execute(SCHEMA_OBJECTS)
+            self.assertEqual(seeded.fetchone()[0], schema)
+            seeded.execute('SELECT count(*) FROM main_taskstudent_fts WHERE main_taskstudent_fts MATCH %s', [word])
+            self.assertGreater(seeded.fetchone()[0], 0)
+
+    def test_deterministic(self):
+        """Test the same seed generates the same rows and cannot be loaded twice."""
+        solutions = self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        User.objects.filter(username__startswith='seed0_').delete()
+        self.assertEqual(self.seed(), solutions)
+        self.assertNotEqual(self.seed('--seed', '1'), solutions)
+
+    def test_too_many_solutions(self):
+        """Test the solutions must fit the pairs of tasks and students."""
+        with self.assertRaises(CommandError):
+            call_command('seed_data', '--tasks', '2', '--students', '2', '--solutions', '5', stdout=StringIO())
+
+
 class UserRegistrationViewTest(TestCase):
     """Tests user registration view."""
 
@@ -534,6 +1956,81 @@ class ViewTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class HtmlPaginationTest(TestCase):
+    """Tests the seek pagination of the HTML lists."""
+
+    def setUp(self):
+        """Set up more tasks than fit on one page."""
+        self.user = User.objects.create(username=TEST_USER)
+        names = [f'Task {index:02}' for index in range(HTML_PAGE_SIZE + 5)]
+        Task.objects.bulk_create(Task(name=name, description=DISC, user=self.user) for name in names)
+
+    def test_first_page(self):
+        """Test first page."""
+        response = self.client.get(reverse('tasks_page'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'class="task-item"', count=HTML_PAGE_SIZE)
+        self.assertContains(response, reverse('tasks_fragment'))
+        self.assertIsNone(response.context[PAGE].previous_cursor)
+
+    def test_load_more_fragment(self):
+        """Test load more fragment."""
+        next_cursor = self.client.get(reverse('tasks_page')).context[PAGE].next_cursor
+        response = self.client.get(reverse('tasks_fragment'), {CURSOR: next_cursor})
+        self.assertContains(response, 'class="task-item"', count=5)
+        self.assertContains(response, 'Task 24')
+        self.assertNotContains(response, '<ul')
+        self.assertNotIn('X-Next-Page', response.headers)
+
+    def test_invalid_cursor(self):
+        """Test invalid cursor."""
+        response = self.client.get(reverse('comments_page'), {CURSOR: 'broken'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FragmentCacheTest(TestCase):
+    """Test the fragment cache of the task and student list items."""
+
+    def setUp(self):
+        """Set up a task solved by a student."""
+        cache.clear()
+        self.user = User.objects.create(username=TEST_USER)
+        self.student = Student.objects.create(nickname=STUDENT_FIRST, user=self.user)
+        self.task = Task.objects.create(name=TASK_FIRST, difficulty=1, user=self.user)
+        TaskStudent.objects.create(task=self.task, student=self.student, solution='Solution')
+
+    def test_warm_page_skips_prefetch(self):
+        """Test a warm page does not prefetch the relations of its items."""
+        self.client.get(reverse('tasks_page'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tasks_page'))
+        self.assertContains(response, STUDENT_FIRST)
+
+    def test_comment_rerenders_task(self):
+        """Test a new comment re-renders the item of its task."""
+        self.client.get(reverse('tasks_page'))
+        comment = Comment.objects.create(task_id=self.task, student=self.student, text_comment=COMMENT_FIRST)
+        self.assertContains(self.client.get(reverse('tasks_page')), reverse(COMMENT, args=[comment.id]))
+
+    def test_rename_rerenders_related_items(self):
+        """Test renaming a student or a task re-renders the items that show the name."""
+        self.client.get(reverse('tasks_page'))
+        self.client.get(reverse('students_page'))
+        self.student.nickname = 'Renamed student'
+        self.student.save()
+        self.task.name = 'Renamed task'
+        self.task.save()
+        self.assertContains(self.client.get(reverse('tasks_page')), 'Renamed student')
+        self.assertContains(self.client.get(reverse('students_page')), 'Renamed task')
+
+    def test_solution_rerenders_rating(self):
+        """Test a new solution re-renders the rating of the student."""
+        self.client.get(reverse('students_page'))
+        task = Task.objects.create(name='Task 2', difficulty=4, user=self.user)
+        TaskStudent.objects.create(task=task, student=self.student, solution='Solution')
+        self.assertContains(self.client.get(reverse('students_page')), 'Рейтинг: 2.5')
+
+
 class StudentViewTest(TestCase):
     """Tests student view."""
 
@@ -0,0 +1,206 @@
+"""This module checks that every page stays within its query budget on a large dataset."""
+
+from types import MappingProxyType
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from main.benchmarks import Regression, iter_routes, regressions, route_url
+from main.models import Comment, Student, Task, TaskStudent
+
+SEED_SIZE = 40
+SOLUTIONS_PER_STUDENT = 5
+COMMENTS_PER_TASK = 3
+THRESHOLD = 0.2
+
+# Maximum number of queries per route name, including session and token authentication.
+QUERY_BUDGETS = MappingProxyType({
+    'api-root': 1,
+    'leaderboard': 2,
+    'cache_stats': 1,
+    'metrics': 1,
+    'search': 5,
+    'task-list': 3,
+    'task-detail': 3,
+    'student-list': 3,
+    'student-detail': 3,
+    'taskstudent-list': 2,
+    'taskstudent-detail': 2,
+    'taskstudent-export': 2,
+    'taskstudent-similar': 4,
+    'comment-list': 2,
+    'comment-detail': 2,
+    'api_token_auth': 1,
+    'login': 1,
+    'logout': 4,
+    'register': 1,
+    'main_page': 2,
+    'tasks_page': 5,
+    'tasks_fragment': 5,
+    'create_task': 2,
+    'task': 5,
+    'delete_task': 15,
+    'put_task': 3,
+    'complete_task': 7,
+    'task_solutions': 4,
+    'students_page': 4,
+    'students_fragment': 4,
+    'student': 4,
+    'create_student': 2,
+    'delete_student': 15,
+    'put_student': 3,
+    'comments_page': 3,
+    'comments_fragment': 3,
+    'comment': 3,
+    'create_comment': 4,
+    'delete_comment': 4,
+    'put_comment': 5,
+})
+
+# Maximum number of queries of the API routes with sparse fields or expanded relations.
+SPARSE_BUDGETS = (
+    ('task-list', 'fields=id,name,difficulty', 2),
+    ('task-list', 'expand=students,user', 3),
+    ('task-detail', 'fields=id,name&expand=user', 2),
+    ('student-list', 'fields=id,nickname,rating', 2),
+    ('student-list', 'expand=tasks', 3),
+    ('taskstudent-list', 'expand=task,student', 2),
+    ('comment-list', 'fields=id,text_comment&expand=student', 2),
+)
+
+
+class QueryBudgetTest(TestCase):
+    """Test the number of queries executed by every page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Seed a dataset large enough to expose per-row queries."""
+        cls.user = User.objects.create_superuser(username='budget', password='budget')
+        cls.token = Token.objects.create(user=cls.user)
+        tasks = Task.objects.bulk_create(
+            Task(name=f'Task {index}', description='Description', difficulty=index % 6, user=cls.user)
+            for index in range(SEED_SIZE)
+        )
+        students = Student.objects.bulk_create(
+            Student(nickname=f'Student {index}', user=cls.user) for index in range(SEED_SIZE)
+        )
+        TaskStudent.objects.bulk_create(
+            TaskStudent(task=tasks[(index + shift) % SEED_SIZE], student=student, solution='Solution')
+            for index, student in enumerate(students)
+            for shift in range(SOLUTIONS_PER_STUDENT)
+        )
+        Comment.objects.bulk_create(
+            Comment(task_id=task, student=students[(index + shift) % SEED_SIZE], text_comment='Comment')
+            for index, task in enumerate(tasks)
+            for shift in range(COMMENTS_PER_TASK)
+        )
+        cls.url_kwargs = {
+            'task_id': tasks[0].id,
+            'student_id': students[0].id,
+            'comment_id': Comment.objects.first().id,
+            'export_format': 'csv',
+        }
+        cls.detail_pks = {
+            'task': tasks[0].id,
+            'student': students[0].id,
+            'taskstudent': TaskStudent.objects.first().id,
+            'comment': cls.url_kwargs['comment_id'],
+        }
+
+    def setUp(self):
+        """Set up the token authentication header."""
+        self.headers = {'Authorization': f'Token {self.token.key}'}
+
+    def resolve_url(self, pattern):
+        """
+        Build the URL of a pattern with ids of the seeded objects.
+
+        Args:
+            pattern (URLPattern): The URL pattern.
+
+        Returns:
+            str: The URL, or None for the format suffix variants of the API routes.
+        """
+        return route_url(pattern, self.url_kwargs, self.detail_pks)
+
+    def capture_queries(self, url):
+        """
+        Count the queries of a GET request, rolling back everything the request changed.
+
+        The client logs in again before every request, since some routes (logout) drop the session.
+        Streaming responses are read to the end, so the queries of their generators are counted too.
+
+        Args:
+            url (str): The URL to request.
+
+        Returns:
+            list: The SQL of the executed queries.
+        """
+        self.client.force_login(self.user)
+        queries = CaptureQueriesContext(connection)
+        with transaction.atomic():
+            with queries:
+                response = self.client.get(url, headers=self.headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        return [query['sql'] for query in queries]
+
+    def test_every_route_has_a_budget(self):
+        """Test every route has a budget."""
+        missing = {pattern.name for pattern in iter_routes()} - QUERY_BUDGETS.keys()
+        self.assertFalse(missing, f'Declare a query budget for {sorted(missing)}')
+
+    def test_routes_within_budget(self):
+        """Test routes within budget."""
+        for pattern in iter_routes():
+            url = self.resolve_url(pattern)
+            if url is None or pattern.name not in QUERY_BUDGETS:
+                continue
+            with self.subTest(route=pattern.name):
+                self.assertLessEqual(len(self.capture_queries(url)), QUERY_BUDGETS[pattern.name])
+
+    def test_sparse_fields_within_budget(self):
+        """Test the API routes with sparse fields and expanded relations do not query per row."""
+        for name, query, budget in SPARSE_BUDGETS:
+            kwargs = {}
+            if name.endswith('-detail'):
+                kwargs['pk'] = self.detail_pks[name.split('-')[0]]
+            url = reverse(name, kwargs=kwargs)
+            with self.subTest(route=name, query=query):
+                self.assertLessEqual(len(self.capture_queries(f'{url}?{query}')), budget)
+
+    def test_sparse_fields_skip_columns(self):
+        """Test a sparse task list reads only the requested columns, without joins or prefetches."""
+        queries = self.capture_queries(f'{reverse("task-list")}?fields=id,name,difficulty')
+        listing = [sql for sql in queries if 'main_task' in sql]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('description', listing[0])
+        self.assertNotIn('JOIN', listing[0])
+
+
+class BaselineComparisonTest(SimpleTestCase):
+    """Test the comparison of benchmark results with a baseline."""
+
+    def test_regressions(self):
+        """Test slower routes beyond both limits and routes with more queries are reported."""
+        baseline = {
+            'fast': {'p95': 1.0, 'queries': 2},
+            'slow': {'p95': 50.0, 'queries': 2},
+            'chatty': {'p95': 5.0, 'queries': 2},
+        }
+        routes = {
+            'fast': {'p95': 1.5, 'queries': 2},
+            'slow': {'p95': 70.0, 'queries': 2},
+            'chatty': {'p95': 5.0, 'queries': 3},
+            'new': {'p95': 100.0, 'queries': 9},
+        }
+        slow = (baseline['slow']['p95'], routes['slow']['p95'])
+        self.assertEqual(regressions(routes, baseline, threshold=THRESHOLD, min_delta=1.0), [
+            Regression('slow', 'p95', *slow),
+            Regression('chatty', 'queries', 2, 3),
+        ])
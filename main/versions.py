@@ -0,0 +1,141 @@
+"""
+This module contains the data versions of the application.
+
+Every tracked model, and every object shown in a cached template fragment, has a version in the Django cache
+that the signal handlers bump when a row is saved or deleted, along with the time of the change,
+which serves the Last-Modified headers.
+Cached data embeds the versions it was built from in its key, so invalidating it is a single write
+and a stale entry is never read again. A bump writes a random 128-bit value rather than incrementing,
+so two processes bumping at once never both write the same new version, even on backends whose incr()
+is a get and a set, like the file-based one. A missing version (evicted or never set) starts
+from the current time, so it never repeats an older version.
+"""
+
+from time import time, time_ns
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'version:'
+MODIFIED_PREFIX = 'modified:'
+
+
+def version_key(label):
+    """
+    Build the cache key of a version.
+
+    Args:
+        label (str): The name of the versioned data, e.g. the lowercase model label.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'{KEY_PREFIX}{label}'
+
+
+def label_of(model):
+    """
+    Return the version label of a model.
+
+    Args:
+        model (type): The model class.
+
+    Returns:
+        str: The lowercase model label.
+    """
+    return model._meta.label_lower  # noqa: WPS437
+
+
+def object_label(model, pk):
+    """
+    Return the version label of one object.
+
+    Args:
+        model (type): The model class.
+        pk (object): The primary key of the object.
+
+    Returns:
+        str: The model label followed by the primary key.
+    """
+    return f'{label_of(model)}:{pk}'
+
+
+def get_versions(labels):
+    """
+    Read several versions with one cache round trip.
+
+    Args:
+        labels (Iterable): The names of the versioned data.
+
+    Returns:
+        tuple: The versions in the order of the labels.
+    """
+    keys = [version_key(label) for label in labels]
+    found = cache.get_many(keys)
+    for missing in keys:
+        if missing not in found:
+            start = time_ns()
+            cache.add(missing, start, timeout=None)
+            found[missing] = cache.get(missing, start)
+    return tuple(found[key] for key in keys)
+
+
+def get_version(label):
+    """
+    Read one version.
+
+    Args:
+        label (str): The name of the versioned data.
+
+    Returns:
+        int: The version.
+    """
+    return get_versions([label])[0]
+
+
+def bump(*labels):
+    """
+    Replace versions with new unique values, making everything cached under the old versions unreachable.
+
+    Args:
+        labels (str): The names of the changed data.
+    """
+    cache.set_many({version_key(label): uuid4().int for label in labels}, timeout=None)
+    cache.set_many({f'{MODIFIED_PREFIX}{changed}': time() for changed in labels}, timeout=None)
+
+
+def last_modified(labels):
+    """
+    Read the time of the last change of any of the versioned data.
+
+    A missing stamp starts from the current time, like a missing version.
+
+    Args:
+        labels (Iterable): The names of the versioned data.
+
+    Returns:
+        float: The Unix time of the last change.
+    """
+    keys = [f'{MODIFIED_PREFIX}{label}' for label in labels]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            start = time()
+            cache.add(key, start, timeout=None)
+            found[key] = cache.get(key, start)
+    return max(found.values())
+
+
+def bump_on_commit(*labels):
+    """
+    Bump versions now and once more when the current transaction commits.
+
+    The second bump drops whatever another request cached from the old rows
+    between the write and the commit.
+
+    Args:
+        labels (str): The names of the changed data.
+    """
+    bump(*labels)
+    transaction.on_commit(lambda: bump(*labels))
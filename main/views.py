@@ -7,27 +7,61 @@ This response can be the HTML contents of a document, a redirect,
 a 404 error, an XML document, an image... or really anything, depending on the function.
 """
 
+from uuid import UUID
+
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.http import urlencode
 from rest_framework import permissions, status, viewsets
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from .authentication import token_cache
+from .bulk import NOT_FOUND, BulkModelMixin
+from .caching import CachedResponseMixin, cache_stats
+from .conditional import page_condition
+from .exports import export_solutions
 from .forms import CommentForm, StudentForm, TaskForm, TaskStudentForm
+from .fragments import STUDENT_ITEM, TASK_ITEM, cache_items
+from .leaderboard import AVERAGE, ORDERS, leaderboard
 from .models import Comment, Student, Task, TaskStudent
-from .serializers import (CommentSerializer, StudentSerializer, TaskSerializer,
+from .pagination import INVALID_CURSOR, Keyset, KeysetPagination
+from .prometheus import CONTENT_TYPE, exposition, metrics
+from .rows import RowListMixin
+from .search import KINDS, NO_WORDS, search
+from .serializers import (BulkTaskStudentSerializer, CommentSerializer,
+                          StudentSerializer, TaskSerializer,
                           TaskStudentSerializer)
+from .similarity import DEFAULT_THRESHOLD, index_solutions, similar_solutions
+from .sparse import SparseViewMixin
 
 ERROR = 'error'
 TITLE = 'title'
 TASK = 'task'
 STUDENT = 'student'
 COMMENT = 'comment'
+USER = 'user'
+STUDENTS = 'students'
+TASKS = 'tasks'
+ID = 'id'
+TASK_ID = 'task_id'
+SOLUTION = 'solution'
 FORM = 'form'
 POST = 'POST'
+CURSOR = 'cursor'
+PAGE = 'page'
+HTML_PAGE_SIZE = 20
+LEADERBOARD_TOP = 10
+LEADERBOARD_MAX_TOP = 100
+NOT_UNIQUE = 'The fields task, student must make a unique set.'
 
 
 class UserAdminPermission(permissions.BasePermission):
@@ -65,12 +99,21 @@ class UserAdminPermission(permissions.BasePermission):
         return request.user.is_staff or object_to_check.user == request.user
 
 
-class TaskViewSet(viewsets.ModelViewSet):
-    """API endpoint that allows tasks to be viewed or edited."""
+class ApiReadMixin(SparseViewMixin, CachedResponseMixin, RowListMixin):
+    """The sparse fieldsets, the cached responses and the lists rendered from rows of the API viewsets."""
+
 
-    queryset = Task.objects.all()
+class TaskViewSet(ApiReadMixin, BulkModelMixin, viewsets.ModelViewSet):
+    """API endpoint that allows tasks to be viewed or edited, one by one or in bulk."""
+
+    queryset = Task.objects.select_related(USER).prefetch_related(
+        Prefetch(STUDENTS, queryset=Student.objects.only(ID)),
+    )
     serializer_class = TaskSerializer
     permission_classes = [UserAdminPermission]
+    cache_models = (TaskStudent, User)
+    bulk_serializer_class = TaskSerializer
+    bulk_update_fields = ('name', 'description', 'difficulty')
 
     def perform_create(self, serializer):
         """
@@ -81,13 +124,40 @@ class TaskViewSet(viewsets.ModelViewSet):
         """
         serializer.save(user=self.request.user)
 
+    def build_instance(self, validated):
+        """
+        Build an unsaved task of the current user from validated data.
+
+        Args:
+            validated (dict): The validated data.
+
+        Returns:
+            Task: The task.
+        """
+        return Task(user=self.request.user, **validated)
+
+    def touched_students(self, instances):
+        """
+        Return the ids of the students who solved the tasks.
+
+        Args:
+            instances (list): The written tasks.
 
-class StudentViewSet(viewsets.ModelViewSet):
+        Returns:
+            QuerySet: The student ids.
+        """
+        return TaskStudent.objects.filter(task__in=instances).values_list('student_id', flat=True).distinct()
+
+
+class StudentViewSet(ApiReadMixin, viewsets.ModelViewSet):
     """API endpoint that allows students to be viewed or edited."""
 
-    queryset = Student.objects.all()
+    queryset = Student.objects.select_related(USER).prefetch_related(
+        Prefetch(TASKS, queryset=Task.objects.only(ID)),
+    )
     serializer_class = StudentSerializer
     permission_classes = [UserAdminPermission]
+    cache_models = (Task, TaskStudent, User)
 
     def perform_create(self, serializer):
         """
@@ -99,12 +169,15 @@ class StudentViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class TaskStudentViewSet(viewsets.ModelViewSet):
-    """API endpoint that allows task-student associations to be viewed or edited."""
+class TaskStudentViewSet(ApiReadMixin, BulkModelMixin, viewsets.ModelViewSet):
+    """API endpoint that allows task-student associations to be viewed or edited, one by one or in bulk."""
 
     queryset = TaskStudent.objects.all()
     serializer_class = TaskStudentSerializer
     permission_classes = [UserAdminPermission]
+    bulk_serializer_class = BulkTaskStudentSerializer
+    bulk_update_fields = (SOLUTION,)
+    owner_field = 'student__user_id'
 
     def perform_create(self, serializer):
         """
@@ -115,8 +188,114 @@ class TaskStudentViewSet(viewsets.ModelViewSet):
         """
         serializer.save()
 
+    def validate_batch(self, valid, outcome):
+        """
+        Check the tasks, the students and the uniqueness of the pairs of a batch with three queries.
+
+        Args:
+            valid (dict): The validated data by the index of the item.
+            outcome (BulkResult): The result to record the errors in.
+
+        Returns:
+            dict: The data of the new associations.
+        """
+        tasks = set(
+            Task.objects.filter(pk__in=[validated[TASK] for validated in valid.values()]).values_list('pk', flat=True),
+        )
+        students = set(
+            Student.objects.filter(
+                pk__in=[validated[STUDENT] for validated in valid.values()],
+            ).values_list('pk', flat=True),
+        )
+        taken = set(
+            TaskStudent.objects.filter(task__in=tasks, student__in=students).values_list(TASK_ID, 'student_id'),
+        )
+        associations = {}
+        for index, validated in valid.items():
+            pair = (validated[TASK], validated[STUDENT])
+            if pair[0] not in tasks:
+                outcome.fail(index, {TASK: [NOT_FOUND]})
+            elif pair[1] not in students:
+                outcome.fail(index, {STUDENT: [NOT_FOUND]})
+            elif pair in taken:
+                outcome.fail(index, {'non_field_errors': [NOT_UNIQUE]})
+            else:
+                taken.add(pair)
+                associations[index] = {TASK_ID: pair[0], 'student_id': pair[1], SOLUTION: validated[SOLUTION]}
+        return associations
+
+    def touched_students(self, instances):
+        """
+        Return the ids of the students of the associations.
+
+        Args:
+            instances (list): The written associations.
+
+        Returns:
+            set: The student ids.
+        """
+        return {instance.student_id for instance in instances}
 
-class CommentViewSet(viewsets.ModelViewSet):
+    def written(self, instances):
+        """
+        Index the signatures of the written solutions.
+
+        Args:
+            instances (list): The created or updated associations.
+        """
+        index_solutions(instances)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        """
+        Return the solutions of the same task that are near-duplicates of this one, most similar first.
+
+        Args:
+            request (Request): The request object.
+            pk (str): The id of the association.
+
+        Returns:
+            Response: The estimated similarity and the data of every similar solution.
+        """
+        try:
+            threshold = float(request.query_params.get('threshold', DEFAULT_THRESHOLD))
+        except ValueError:
+            threshold = None
+        if threshold is None or threshold <= 0 or threshold > 1:
+            return Response({ERROR: 'Threshold must be a number from 0 to 1'}, status=status.HTTP_400_BAD_REQUEST)
+        matches = similar_solutions(self.get_object(), threshold)
+        solutions = TaskStudent.objects.in_bulk([match.solution_id for match in matches])
+        return Response([
+            {'similarity': match.similarity, SOLUTION: TaskStudentSerializer(solutions[match.solution_id]).data}
+            for match in matches
+            if match.solution_id in solutions
+        ])
+
+    @action(detail=False, url_path='export/(?P<export_format>csv|ndjson)')
+    def export(self, request, export_format):
+        """
+        Stream all solutions as CSV or NDJSON, optionally only of the task or the student given in the query.
+
+        Args:
+            request (Request): The request object.
+            export_format (str): The format of the export, csv or ndjson.
+
+        Returns:
+            StreamingHttpResponse: The export, or a Response with the error if a filter is not a valid id.
+        """
+        filters = {}
+        for name in (TASK, STUDENT):
+            raw_value = request.query_params.get(name)
+            if raw_value is None:
+                continue
+            try:
+                filters[f'{name}_id'] = UUID(raw_value)
+            except ValueError:
+                return Response({ERROR: f'{name.capitalize()} must be a valid id'}, status=status.HTTP_400_BAD_REQUEST)
+        return export_solutions(export_format, **filters)
+
+
+class CommentViewSet(ApiReadMixin, viewsets.ModelViewSet):
     """API endpoint that allows comments to be viewed or edited."""
 
     queryset = Comment.objects.all()
@@ -134,6 +313,132 @@ class CommentViewSet(viewsets.ModelViewSet):
         serializer.save(student=student)
 
 
+class LeaderboardView(APIView):
+    """API endpoint that ranks students by the average and the total difficulty of the solved tasks."""
+
+    def get(self, request):
+        """
+        Return the top of the leaderboard and the rank of the current user's student.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The top students and the user's rank.
+        """
+        order = request.query_params.get('order', AVERAGE)
+        if order not in ORDERS:
+            return Response({ERROR: f'Order must be one of {", ".join(ORDERS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top = int(request.query_params.get('top', LEADERBOARD_TOP))
+        except ValueError:
+            return Response({ERROR: 'Top must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        top = min(max(top, 1), LEADERBOARD_MAX_TOP)
+        return Response(leaderboard(order, top, request.user.id))
+
+
+class CacheStatsView(APIView):
+    """API endpoint that shows the hit and miss counters of the API response cache and the token cache to staff."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Return the cache counters.
+
+        The token cache is per process, so its counters are those of the process serving the request.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The hits, the misses and the hit ratio by model, and of the token cache.
+        """
+        return Response({**cache_stats(), 'token_auth': token_cache.stats()})
+
+
+class MetricsView(APIView):
+    """Endpoint that shows the request metrics to staff in the Prometheus text format."""
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Return the request metrics.
+
+        Without METRICS_DIR the metrics are those of the process serving the request.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            HttpResponse: The exposition.
+        """
+        return HttpResponse(exposition(metrics.collect()), content_type=CONTENT_TYPE)
+
+
+class SearchView(APIView):
+    """API endpoint that finds tasks, comments and solutions by the words of their text, best matches first."""
+
+    sources = {
+        'task': (TaskViewSet.queryset, TaskSerializer),
+        'comment': (CommentViewSet.queryset, CommentSerializer),
+        SOLUTION: (TaskStudentViewSet.queryset, TaskStudentSerializer),
+    }
+
+    def get(self, request):
+        """
+        Return a page of the objects containing every word of the q parameter.
+
+        The type parameter restricts the search to some of the kinds, separated by commas.
+
+        Args:
+            request (Request): The request object.
+
+        Returns:
+            Response: The kind, the BM25 score and the data of every found object, and the link of the next page.
+
+        Raises:
+            NotFound: If the cursor is malformed.
+        """
+        kinds = request.query_params.get('type')
+        kinds = kinds.split(',') if kinds else KINDS
+        if set(kinds) - set(KINDS):
+            return Response({ERROR: f'Type must be one of {", ".join(KINDS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        size = KeysetPagination().get_page_size(request)
+        try:
+            page = search(request.query_params.get('q', ''), kinds, request.query_params.get(CURSOR), size)
+        except ValueError as error:
+            if str(error) == NO_WORDS:
+                return Response({ERROR: NO_WORDS}, status=status.HTTP_400_BAD_REQUEST)
+            raise NotFound(INVALID_CURSOR)
+        next_link = None
+        if page.next_cursor:
+            next_link = replace_query_param(request.build_absolute_uri(), CURSOR, page.next_cursor)
+        return Response({'next': next_link, 'results': self.serialize_hits(page.hits)})
+
+    def serialize_hits(self, hits):
+        """
+        Serialize the objects of the hits that still exist, in the order of the hits.
+
+        Args:
+            hits (list): The hits of the page.
+
+        Returns:
+            list: The kind, the BM25 score and the data of every object.
+        """
+        instances = {}
+        for kind, (queryset, _) in self.sources.items():
+            instances[kind] = queryset.in_bulk([UUID(hit.pk) for hit in hits if hit.kind == kind])
+        serialized = []
+        for hit in hits:
+            instance = instances[hit.kind].get(UUID(hit.pk))
+            if instance is not None:
+                serializer = self.sources[hit.kind][1](instance)
+                serialized.append({'type': hit.kind, 'score': hit.score, 'object': serializer.data})
+        return serialized
+
+
 class UserRegistrationView(APIView):
     """API endpoint that allows users to register."""
 
@@ -249,7 +554,130 @@ def main_page(request):
         'Регистрация': 'register',
         'Получить токен': 'api_token',
     }
-    return render(request, 'main.html', context={'page': pages, TITLE: 'Главная страница', 'user': request.user})
+    return render(request, 'main.html', context={'page': pages, TITLE: 'Главная страница', USER: request.user})
+
+
+def list_tasks():
+    """
+    Build the queryset of the tasks list.
+
+    Returns:
+        QuerySet: The tasks with their users.
+    """
+    return Task.objects.select_related(USER)
+
+
+def task_item_lookups():
+    """
+    Build the relations a task item renders.
+
+    Returns:
+        tuple: The comment ids and the solvers of the task.
+    """
+    return (
+        Prefetch('related_comments', queryset=Comment.objects.only(ID, TASK_ID)),
+        Prefetch(STUDENTS, queryset=Student.objects.only(ID, 'nickname')),
+    )
+
+
+def prepare_tasks(tasks):
+    """
+    Prepare the task items for rendering, prefetching the comment ids and the solvers of the uncached ones.
+
+    Args:
+        tasks (list): The tasks of the page.
+
+    Returns:
+        list: The same tasks.
+    """
+    return cache_items(tasks, TASK_ITEM, *task_item_lookups())
+
+
+def list_students():
+    """
+    Build the queryset of the students list.
+
+    Returns:
+        QuerySet: The students with their users.
+    """
+    return Student.objects.select_related(USER)
+
+
+def student_item_lookups():
+    """
+    Build the relations a student item renders.
+
+    Returns:
+        tuple: The solved tasks of the student.
+    """
+    return (Prefetch(TASKS, queryset=Task.objects.only(ID, 'name')),)
+
+
+def prepare_students(students):
+    """
+    Prepare the student items for rendering, prefetching the solved tasks of the uncached ones.
+
+    Args:
+        students (list): The students of the page.
+
+    Returns:
+        list: The same students.
+    """
+    return cache_items(students, STUDENT_ITEM, *student_item_lookups())
+
+
+def list_comments():
+    """
+    Build the queryset of the comments list with everything its items render.
+
+    Returns:
+        QuerySet: The comments with their tasks and students.
+    """
+    return Comment.objects.select_related(TASK_ID, 'student')
+
+
+def paginate_list(request, queryset):
+    """
+    Fetch the page of a list selected by the cursor query parameter.
+
+    Args:
+        request (Request): The request object.
+        queryset (QuerySet): The list to paginate.
+
+    Returns:
+        Page: The page.
+
+    Raises:
+        Http404: If the cursor is malformed.
+    """
+    try:
+        return Keyset(queryset.model).paginate(queryset, request.GET.get(CURSOR), HTML_PAGE_SIZE)
+    except ValueError:
+        raise Http404(INVALID_CURSOR)
+
+
+def render_fragment(request, template_name, items_name, queryset, prepare=None):
+    """
+    Render the next slice of list items without the page around them.
+
+    The URL of the slice after it is sent in the X-Next-Page header.
+
+    Args:
+        request (Request): The request object.
+        template_name (str): The template of the list items.
+        items_name (str): The context name of the items.
+        queryset (QuerySet): The list to paginate.
+        prepare (callable, optional): Prepares the items of the slice for rendering.
+
+    Returns:
+        HttpResponse: The list items.
+    """
+    page = paginate_list(request, queryset)
+    listed = prepare(page.rows) if prepare else page.rows
+    response = render(request, template_name, context={items_name: listed, 'continued': True})
+    if page.next_cursor:
+        response['X-Next-Page'] = f'{request.path}?{urlencode({CURSOR: page.next_cursor})}'
+    return response
 
 
 def tasks_page(request):
@@ -262,10 +690,25 @@ def tasks_page(request):
     Returns:
         HttpResponse: The tasks page.
     """
-    context = {'tasks': Task.objects.all(), TITLE: 'Задачи'}
+    page = paginate_list(request, list_tasks())
+    context = {TASKS: prepare_tasks(page.rows), PAGE: page, TITLE: 'Задачи'}
     return render(request, 'tasks.html', context=context)
 
 
+def tasks_fragment(request):
+    """
+    Render the next slice of the tasks list.
+
+    Args:
+        request (Request): The request object.
+
+    Returns:
+        HttpResponse: The task list items.
+    """
+    return render_fragment(request, 'fragments/task_items.html', TASKS, list_tasks(), prepare_tasks)
+
+
+@page_condition(Task, User, TaskStudent, Student, Comment)
 def task_page(request, task_id):
     """
     Render the task page.
@@ -277,7 +720,7 @@ def task_page(request, task_id):
     Returns:
         HttpResponse: The task page.
     """
-    context = {TASK: Task.objects.get(id=task_id), TITLE: 'Задача'}
+    context = {TASK: Task.objects.select_related(USER).get(id=task_id), TITLE: 'Задача'}
     return render(request, 'entities/task.html', context=context)
 
 
@@ -291,10 +734,25 @@ def students_page(request):
     Returns:
         HttpResponse: The students page.
     """
-    context = {'students': Student.objects.all(), TITLE: 'Студенты'}
+    page = paginate_list(request, list_students())
+    context = {STUDENTS: prepare_students(page.rows), PAGE: page, TITLE: 'Студенты'}
     return render(request, 'students.html', context=context)
 
 
+def students_fragment(request):
+    """
+    Render the next slice of the students list.
+
+    Args:
+        request (Request): The request object.
+
+    Returns:
+        HttpResponse: The student list items.
+    """
+    return render_fragment(request, 'fragments/student_items.html', STUDENTS, list_students(), prepare_students)
+
+
+@page_condition(Student, User, TaskStudent, Task)
 def student_page(request, student_id):
     """
     Render the student page.
@@ -306,7 +764,7 @@ def student_page(request, student_id):
     Returns:
         HttpResponse: The student page.
     """
-    context = {STUDENT: Student.objects.get(id=student_id), TITLE: 'Студент'}
+    context = {STUDENT: Student.objects.select_related(USER).get(id=student_id), TITLE: 'Студент'}
     return render(request, 'entities/student.html', context=context)
 
 
@@ -320,10 +778,25 @@ def comments_page(request):
     Returns:
         HttpResponse: The comments page.
     """
-    context = {'comments': Comment.objects.all(), TITLE: 'Комментарии'}
+    page = paginate_list(request, list_comments())
+    context = {'comments': page.rows, PAGE: page, TITLE: 'Комментарии'}
     return render(request, 'comments.html', context=context)
 
 
+def comments_fragment(request):
+    """
+    Render the next slice of the comments list.
+
+    Args:
+        request (Request): The request object.
+
+    Returns:
+        HttpResponse: The comment list items.
+    """
+    return render_fragment(request, 'fragments/comment_items.html', 'comments', list_comments())
+
+
+@page_condition(Comment, User, Task, Student)
 def comment_page(request, comment_id):
     """
     Render the comment page.
@@ -335,7 +808,8 @@ def comment_page(request, comment_id):
     Returns:
         HttpResponse: The comment page.
     """
-    context = {COMMENT: Comment.objects.get(id=comment_id), TITLE: 'Комментарий'}
+    comment = Comment.objects.select_related(TASK_ID, 'student__user').get(id=comment_id)
+    context = {COMMENT: comment, TITLE: 'Комментарий'}
     return render(request, 'entities/comment.html', context=context)
 
 
@@ -389,7 +863,7 @@ def handle_post_requests(request, form, task, has_solve):
         if students:
             student = students[0]
             task_student.student = student
-            task_student.solution = form.cleaned_data['solution']
+            task_student.solution = form.cleaned_data[SOLUTION]
             task_student.save()
             return redirect(TASK, task_id=task.id)
         else:
@@ -466,9 +940,9 @@ def complete_task(request, task_id):
     tasks = Task.objects.all()
     context = {
         FORM: form,
-        'students': students,
-        'tasks': tasks,
-        'task_id': task_id,
+        STUDENTS: students,
+        TASKS: tasks,
+        TASK_ID: task_id,
         TITLE: 'Завершить задачу',
         TASK: task,
         'has_solve': has_solve,
@@ -488,7 +962,7 @@ def task_solutions(request, task_id):
         HttpResponse: The task solutions page.
     """
     task = get_object_or_404(Task, id=task_id)
-    solutions = TaskStudent.objects.filter(task=task)
+    solutions = TaskStudent.objects.filter(task=task).select_related('student')
     return render(request, 'task_solutions.html', {'solutions': solutions})
 
 
@@ -554,7 +1028,7 @@ def create_comment(request, task_id):
     task = get_object_or_404(Task, id=task_id)
     if request.user.is_authenticated and request.method == POST:
         post_data = request.POST.copy()
-        post_data.update({'task_id': task.id})
+        post_data.update({TASK_ID: task.id})
         form = CommentForm(post_data)
         if form.is_valid():
             form.save()
@@ -568,7 +1042,7 @@ def create_comment(request, task_id):
     if request.user.is_authenticated:
         students = Student.objects.filter(user=request.user)
     tasks = Task.objects.all()
-    context = {FORM: form, TASK: task, 'students': students, 'tasks': tasks, TITLE: 'Создать комментарий'}
+    context = {FORM: form, TASK: task, STUDENTS: students, TASKS: tasks, TITLE: 'Создать комментарий'}
     return render(request, 'forms/create_comment.html', context)
 
 